@@ -0,0 +1,229 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from django.conf import settings
+from .transcode import cheaper_profile
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 'high'
+PRIORITY_NORMAL = 'normal'
+PRIORITY_LOW = 'low'
+PRIORITIES = {PRIORITY_HIGH: 0, PRIORITY_NORMAL: 1, PRIORITY_LOW: 2}
+
+# How often queued starts re-check CPU and memory headroom (seconds)
+RECHECK_INTERVAL = 2.0
+
+
+class AdmissionRejected(Exception):
+    """A stream could not be admitted: the queue is full or the wait timed out"""
+
+
+class AdmissionCancelled(AdmissionRejected):
+    """A queued start was withdrawn because its viewers left"""
+
+
+def memory_available() -> Optional[int]:
+    """MemAvailable from /proc/meminfo in bytes, or None where unavailable"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def cpu_load() -> float:
+    """1-minute load average per core"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        return 0.0
+
+
+class _Waiter:
+    def __init__(self, stream_id, profile, priority, on_position):
+        self.stream_id = stream_id
+        self.profile = profile
+        self.priority = priority
+        self.on_position = on_position
+        self.position = None
+        self.cancelled = False
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class AdmissionController:
+    """Caps the FFmpeg work this worker runs.
+
+    Each stream reserves its profile's cost (in 720p25 encodes) against
+    MAX_TRANSCODE_SLOTS, and nothing is admitted while load or free memory
+    is past its threshold. A start that does not fit first sheds to a
+    cheaper profile; if even the cheapest does not fit it waits in a
+    priority queue, and the caller hears its queue position as it changes.
+    """
+
+    def __init__(self):
+        self.max_slots = settings.MAX_TRANSCODE_SLOTS
+        self.max_load = settings.ADMISSION_MAX_LOAD
+        self.min_memory = settings.ADMISSION_MIN_MEMORY_MB * 1024 * 1024
+        self.max_queue = settings.ADMISSION_MAX_QUEUE
+        self.queue_timeout = settings.ADMISSION_QUEUE_TIMEOUT
+        self.running: Dict[str, float] = {}  # stream_id: reserved cost
+        self._queue: List[tuple] = []  # heap of (priority, arrival, waiter)
+        self._waiters: Dict[str, _Waiter] = {}
+        self._arrivals = itertools.count()
+        self.downgraded = 0
+        self.queued = 0
+        self.rejected = 0
+
+    @property
+    def used(self) -> float:
+        return sum(self.running.values())
+
+    def pressure(self) -> Optional[str]:
+        """Why the machine cannot take more work right now, or None"""
+        load = cpu_load()
+        if load > self.max_load:
+            return f"CPU load {load:.2f} per core"
+        available = memory_available()
+        if available is not None and available < self.min_memory:
+            return f"{available // (1024 * 1024)} MB memory available"
+        return None
+
+    def _fit(self, profile):
+        """The requested profile, or the most expensive cheaper one that fits now"""
+        if self.pressure() is not None:
+            return None
+        candidate = profile
+        while candidate is not None:
+            if self.used + candidate.cost <= self.max_slots:
+                return candidate
+            candidate = cheaper_profile(candidate)
+        return None
+
+    def try_admit(self, stream_id: str, profile):
+        """Reserve capacity without waiting; returns the profile to run, or None.
+
+        Nothing bypasses the queue: while starts are waiting, new ones queue
+        behind them by priority.
+        """
+        if self._queue:
+            return None
+        admitted = self._fit(profile)
+        if admitted is not None:
+            self._reserve(stream_id, profile, admitted)
+        return admitted
+
+    async def wait(self, stream_id: str, profile, priority: str = PRIORITY_NORMAL,
+                   on_position: Optional[Callable[[int], Awaitable[None]]] = None):
+        """Queue a start until it fits; returns the profile to run or raises AdmissionRejected"""
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("Transcoder queue is full")
+        waiter = _Waiter(stream_id, profile, PRIORITIES[priority], on_position)
+        heapq.heappush(self._queue, (waiter.priority, next(self._arrivals), waiter))
+        self._waiters[stream_id] = waiter
+        self.queued += 1
+        logger.info(f"Queued {stream_id} for transcoder capacity ({priority} priority)")
+
+        deadline = time.monotonic() + self.queue_timeout
+        try:
+            self._dispatch()
+            while not waiter.future.done():
+                if time.monotonic() >= deadline:
+                    self.rejected += 1
+                    raise AdmissionRejected("Timed out waiting for transcoder capacity")
+                await asyncio.wait({waiter.future}, timeout=RECHECK_INTERVAL)
+                self._dispatch()
+            if waiter.cancelled:
+                raise AdmissionCancelled("Cancelled")
+            return waiter.future.result()
+        except BaseException:
+            # Admitted just before the caller gave up (e.g. its task was
+            # cancelled); nobody will launch it, so free the reservation
+            if waiter.future.done() and not waiter.cancelled:
+                self.release(stream_id)
+            raise
+        finally:
+            self._remove(waiter)
+
+    def is_waiting(self, stream_id: str) -> bool:
+        return stream_id in self._waiters
+
+    def cancel(self, stream_id: str) -> bool:
+        """Withdraw a queued start (its viewers left); True if one was queued"""
+        waiter = self._waiters.get(stream_id)
+        if waiter is None:
+            return False
+        waiter.cancelled = True
+        if waiter.future.done():
+            self.running.pop(stream_id, None)  # Admitted but not launched yet
+        waiter.future.cancel()
+        self._remove(waiter)
+        return True
+
+    def resize(self, stream_id: str, profile):
+        """A running stream switched profile; adjust its reservation"""
+        if stream_id in self.running:
+            self.running[stream_id] = profile.cost
+            self._dispatch()
+
+    def release(self, stream_id: str):
+        if self.running.pop(stream_id, None) is not None:
+            self._dispatch()
+
+    def _reserve(self, stream_id, requested, admitted):
+        self.running[stream_id] = admitted.cost
+        if admitted is not requested:
+            self.downgraded += 1
+            logger.warning(f"Admitted {stream_id} as '{admitted.name}' instead of '{requested.name}' to fit capacity")
+
+    def _remove(self, waiter):
+        if self._waiters.get(waiter.stream_id) is waiter:
+            del self._waiters[waiter.stream_id]
+            self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+            heapq.heapify(self._queue)
+            self._report_positions()
+
+    def _dispatch(self):
+        """Admit queued starts in priority order while they fit"""
+        for entry in sorted(self._queue):
+            waiter = entry[2]
+            if waiter.future.done():
+                continue
+            admitted = self._fit(waiter.profile)
+            if admitted is None:
+                break  # Keep priority order: nobody jumps a waiter that doesn't fit
+            self._reserve(waiter.stream_id, waiter.profile, admitted)
+            waiter.future.set_result(admitted)
+        self._report_positions()
+
+    def _report_positions(self):
+        position = 0
+        for _, _, waiter in sorted(self._queue):
+            if waiter.future.done():
+                continue
+            position += 1
+            if waiter.position != position and waiter.on_position is not None:
+                asyncio.create_task(waiter.on_position(position))
+            waiter.position = position
+
+    def stats(self) -> dict:
+        return {
+            'slots_used': round(self.used, 2),
+            'max_slots': self.max_slots,
+            'queue_length': len(self._waiters),
+            'pressure': self.pressure(),
+            'downgraded': self.downgraded,
+            'queued': self.queued,
+            'rejected': self.rejected,
+        }
+
+
+admission = AdmissionController()
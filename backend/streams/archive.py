@@ -0,0 +1,456 @@
+import asyncio
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+from django.conf import settings
+from .redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+# Streams to record, kept in Redis so any worker that owns one records it
+RECORDINGS_KEY = 'recordings'
+DEFAULT_TRACK = 'default'  # Directory of single-output streams; ABR renditions use their name
+REFRESH_INTERVAL = 5  # Seconds between reads of the recordings set
+MAX_PENDING = 32  # Segments queued per track before the oldest is dropped
+
+# One fixed-size record per segment: wall clock start (ms), first PTS (90 kHz, -1 if
+# unknown), byte offset and size in the chunk's data file, duration (ms), flags
+INDEX_RECORD = struct.Struct('<qqQIII')
+FLAG_DISCONTINUITY = 1
+
+TS_PACKET_SIZE = 188
+PTS_SCAN_PACKETS = 1024
+
+
+class ArchivedSegment(NamedTuple):
+    chunk: int  # Start of the chunk (ms), which names its files
+    start_ms: int
+    pts: int
+    offset: int
+    size: int
+    duration_ms: int
+    flags: int
+
+    @property
+    def end_ms(self) -> int:
+        return self.start_ms + self.duration_ms
+
+
+def is_safe_name(name: Optional[str]) -> bool:
+    """True for a stream id or rendition that names one directory under RECORDINGS_DIR"""
+    return bool(name) and name not in ('.', '..') and os.path.basename(name) == name
+
+
+def chunk_name(chunk: int, extension: str) -> str:
+    # Zero-padded so names sort by time
+    return f"{chunk:013d}{extension}"
+
+
+def first_pts(data: bytes) -> int:
+    """PTS of the first video PES packet in an MPEG-TS segment (any PES if none), or -1"""
+    found = -1
+    end = min(len(data), PTS_SCAN_PACKETS * TS_PACKET_SIZE) - TS_PACKET_SIZE
+    for offset in range(0, end + 1, TS_PACKET_SIZE):
+        if data[offset] != 0x47:
+            break
+        if not data[offset + 1] & 0x40:
+            continue  # Not the start of a PES packet or table
+        adaptation = (data[offset + 3] >> 4) & 3
+        start = offset + 4
+        if adaptation & 2:
+            start += 1 + data[offset + 4]
+        if start + 14 > offset + TS_PACKET_SIZE:
+            continue
+        if not adaptation & 1 or data[start:start + 3] != b'\x00\x00\x01' or not data[start + 7] & 0x80:
+            continue
+        p = data[start + 9:start + 14]
+        pts = ((p[0] >> 1) & 7) << 30 | p[1] << 22 | (p[2] >> 1) << 15 | p[3] << 7 | p[4] >> 1
+        if 0xe0 <= data[start + 3] <= 0xef:
+            return pts
+        if found < 0:
+            found = pts
+    return found
+
+
+def render_playlist(segments: List[ArchivedSegment], ended: bool) -> str:
+    """Playlist of archived segments as byte ranges of their chunks: VOD once ``ended``, else EVENT"""
+    target = max((math.ceil(s.duration_ms / 1000) for s in segments), default=settings.HLS_SEGMENT_DURATION)
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:4',  # EXT-X-BYTERANGE
+        f'#EXT-X-TARGETDURATION:{target}',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+        f"#EXT-X-PLAYLIST-TYPE:{'VOD' if ended else 'EVENT'}",
+    ]
+    for i, segment in enumerate(segments):
+        if i == 0 or segment.flags & FLAG_DISCONTINUITY:
+            if i > 0:
+                lines.append('#EXT-X-DISCONTINUITY')
+            # Lets players seek by wall clock and show when footage was shot
+            started = datetime.fromtimestamp(segment.start_ms / 1000, timezone.utc)
+            lines.append(f"#EXT-X-PROGRAM-DATE-TIME:{started.isoformat(timespec='milliseconds')}")
+        lines.append(f'#EXTINF:{segment.duration_ms / 1000:.3f},')
+        lines.append(f'#EXT-X-BYTERANGE:{segment.size}@{segment.offset}')
+        lines.append(chunk_name(segment.chunk, '.ts'))
+    if ended:
+        lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+class _ChunkIndex:
+    """A chunk's index file, memory-mapped for bisecting by start time"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self.count = size // INDEX_RECORD.size  # A record being appended is not visible yet
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._map is not None:
+            self._map.close()
+
+    def record(self, chunk: int, i: int) -> ArchivedSegment:
+        return ArchivedSegment(chunk, *INDEX_RECORD.unpack_from(self._map, i * INDEX_RECORD.size))
+
+    def start_ms(self, i: int) -> int:
+        return INDEX_RECORD.unpack_from(self._map, i * INDEX_RECORD.size)[0]
+
+    def find(self, at_ms: int) -> int:
+        """Index of the last segment starting at or before ``at_ms`` (0 if none)"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.start_ms(mid) <= at_ms:
+                lo = mid + 1
+            else:
+                hi = mid
+        return max(lo - 1, 0)
+
+
+class _ChunkWriter:
+    """Appends segments to one chunk: data first, then its index record"""
+
+    def __init__(self, directory: str, chunk: int):
+        os.makedirs(directory, exist_ok=True)
+        self.chunk = chunk
+        self._data = open(os.path.join(directory, chunk_name(chunk, '.ts')), 'ab', buffering=0)
+        self._index = open(os.path.join(directory, chunk_name(chunk, '.idx')), 'ab', buffering=0)
+        self.offset = self._data.tell()
+
+    def append(self, data: bytes, start_ms: int, pts: int, duration_ms: int, flags: int):
+        self._data.write(data)
+        self._index.write(INDEX_RECORD.pack(start_ms, pts, self.offset, len(data), duration_ms, flags))
+        self.offset += len(data)
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+
+class _Track:
+    """Recording state of one stream rendition; touched by one writer thread at a time"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.writer: Optional[_ChunkWriter] = None
+        self.pending: Deque[Optional[tuple]] = deque()  # None closes the writer
+        self.task: Optional[asyncio.Task] = None
+        self.last: Optional[Tuple[int, int, int]] = None  # (sequence, end_ms, pts) of the last segment
+
+
+class SegmentArchive:
+    """Time-indexed recording of selected streams, for rewind and export.
+
+    Each recorded stream rendition is a directory of chunks.
+    ``<start>.ts`` holds segments back to back, and ``<start>.idx`` holds
+    one fixed-size INDEX_RECORD per segment. Chunk names and records are
+    both in time order. A seek is therefore a bisect over the chunk names,
+    then one over the chunk's memory-mapped index, however many days are
+    kept. Playlists address segments as byte ranges of the chunk files.
+
+    Writes and retention cleanup run in threads, so disk latency never
+    stalls the event loop. Each cleanup pass removes at most
+    RECORDING_CLEANUP_BATCH chunks.
+    """
+
+    def __init__(self):
+        self.root = settings.RECORDINGS_DIR
+        self.retention = settings.RECORDING_RETENTION_HOURS * 3600
+        self.chunk_seconds = settings.RECORDING_CHUNK_SECONDS
+        self.recording: Set[str] = set()
+        self._tracks: Dict[Tuple[str, Optional[str]], _Track] = {}
+        self._task = None
+        self.segments_written = 0
+        self.bytes_written = 0
+        self.dropped = 0
+        self.chunks_removed = 0
+        self.bytes_removed = 0
+
+    def ensure_started(self):
+        """Start the recordings refresh and retention cleanup on the running loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._maintain())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def track_dir(self, stream_id: str, rendition: Optional[str] = None) -> str:
+        return os.path.join(self.root, stream_id, rendition or DEFAULT_TRACK)
+
+    async def start_recording(self, stream_id: str):
+        self.ensure_started()
+        self.recording.add(stream_id)
+        await redis_service.get_redis().sadd(RECORDINGS_KEY, stream_id)
+
+    async def is_recording(self, stream_id: str) -> bool:
+        return bool(await redis_service.get_redis().sismember(RECORDINGS_KEY, stream_id))
+
+    async def stop_recording(self, stream_id: str):
+        self.recording.discard(stream_id)
+        self.close(stream_id)
+        await redis_service.get_redis().srem(RECORDINGS_KEY, stream_id)
+
+    def append(self, stream_id: str, rendition: Optional[str], sequence: int, duration: float, data: bytes,
+               finalized_at: float):
+        """Archive a finalized segment if the stream is being recorded; the write happens in the background"""
+        if stream_id not in self.recording:
+            return
+        key = (stream_id, rendition)
+        track = self._tracks.get(key)
+        if track is None:
+            track = self._tracks[key] = _Track(self.track_dir(stream_id, rendition))
+        if len(track.pending) >= MAX_PENDING:
+            track.pending.popleft()
+            self.dropped += 1
+            logger.warning(f"Archive of {stream_id} is behind; dropped a segment")
+        track.pending.append((sequence, duration, data, finalized_at))
+        if track.task is None:
+            track.task = asyncio.create_task(self._drain(key, track))
+
+    def close(self, stream_id: str):
+        """The stream stopped here; finish its open chunks"""
+        for key, track in list(self._tracks.items()):
+            if key[0] == stream_id:
+                track.pending.append(None)
+                if track.task is None:
+                    track.task = asyncio.create_task(self._drain(key, track))
+
+    async def _drain(self, key, track: _Track):
+        try:
+            while track.pending:
+                item = track.pending.popleft()
+                if item is None:
+                    await asyncio.to_thread(self._close_track, track)
+                    if not track.pending and self._tracks.get(key) is track:
+                        del self._tracks[key]
+                    continue
+                await asyncio.to_thread(self._write, track, *item)
+        except Exception as e:
+            logger.error(f"Could not archive segment of {key[0]}: {e}")
+        finally:
+            track.task = None
+
+    def _write(self, track: _Track, sequence: int, duration: float, data: bytes, finalized_at: float):
+        duration_ms = int(duration * 1000)
+        start_ms = int(finalized_at * 1000) - duration_ms
+        pts = first_pts(data)
+        flags = FLAG_DISCONTINUITY
+        if track.last is not None:
+            last_sequence, last_end, last_pts = track.last
+            start_ms = max(start_ms, last_end)  # Keeps records in time order despite jitter
+            pts_step = pts - last_pts
+            if sequence == last_sequence + 1 and (pts < 0 or last_pts < 0 or 0 < pts_step < 4 * duration * 90000):
+                flags = 0
+        if track.writer is not None and start_ms - track.writer.chunk >= self.chunk_seconds * 1000:
+            self._close_track(track, keep_last=True)
+        if track.writer is None:
+            track.writer = _ChunkWriter(track.directory, start_ms)
+        track.writer.append(data, start_ms, pts, duration_ms, flags)
+        track.last = (sequence, start_ms + duration_ms, pts)
+        self.segments_written += 1
+        self.bytes_written += len(data)
+
+    @staticmethod
+    def _close_track(track: _Track, keep_last: bool = False):
+        if track.writer is not None:
+            track.writer.close()
+            track.writer = None
+        if not keep_last:
+            track.last = None  # Whatever comes next starts after a discontinuity
+
+    @staticmethod
+    def chunks(directory: str) -> List[int]:
+        try:
+            names = os.listdir(directory)
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+        return sorted(int(name[:-4]) for name in names if name.endswith('.idx') and name[:-4].isdigit())
+
+    def tracks(self, stream_id: str) -> List[Optional[str]]:
+        """Renditions with footage; None for a single-output stream"""
+        try:
+            names = sorted(os.listdir(os.path.join(self.root, stream_id)))
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+        return [None if name == DEFAULT_TRACK else name for name in names]
+
+    def segments(self, stream_id: str, rendition: Optional[str], start_ms: int, end_ms: Optional[int],
+                 limit: int) -> List[ArchivedSegment]:
+        """Archived segments overlapping [start_ms, end_ms), at most ``limit``"""
+        directory = self.track_dir(stream_id, rendition)
+        chunks = self.chunks(directory)
+        first = max(bisect_right(chunks, start_ms) - 1, 0)
+        found = []
+        for chunk in chunks[first:]:
+            if end_ms is not None and chunk >= end_ms:
+                break
+            try:
+                index = _ChunkIndex(os.path.join(directory, chunk_name(chunk, '.idx')))
+            except FileNotFoundError:
+                continue  # Removed by retention meanwhile
+            with index:
+                for i in range(index.find(start_ms) if index.count else 0, index.count):
+                    segment = index.record(chunk, i)
+                    if end_ms is not None and segment.start_ms >= end_ms:
+                        return found
+                    if segment.end_ms <= start_ms:
+                        continue
+                    found.append(segment)
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def locate(self, stream_id: str, rendition: Optional[str], at_ms: int) -> Optional[ArchivedSegment]:
+        """The segment playing at ``at_ms``, or the first one after it"""
+        found = self.segments(stream_id, rendition, at_ms, None, 1)
+        return found[0] if found else None
+
+    def extent(self, stream_id: str, rendition: Optional[str] = None) -> Optional[Tuple[int, int]]:
+        """(start, end) in ms of a rendition's footage, reading two index records"""
+        directory = self.track_dir(stream_id, rendition)
+        chunks = self.chunks(directory)
+        if not chunks:
+            return None
+        first = self.segments(stream_id, rendition, 0, None, 1)
+        try:
+            with _ChunkIndex(os.path.join(directory, chunk_name(chunks[-1], '.idx'))) as index:
+                last = index.record(chunks[-1], index.count - 1) if index.count else None
+        except FileNotFoundError:
+            last = None
+        if not first or last is None:
+            return None
+        return first[0].start_ms, last.end_ms
+
+    def chunk_path(self, stream_id: str, rendition: Optional[str], name: str) -> Optional[str]:
+        """Data file of a chunk, or None for names that aren't one"""
+        stem, extension = os.path.splitext(name)
+        if extension != '.ts' or not stem.isdigit() or not is_safe_name(stream_id):
+            return None
+        if rendition is not None and not is_safe_name(rendition):
+            return None
+        return os.path.join(self.track_dir(stream_id, rendition), name)
+
+    async def _maintain(self):
+        """Follow the recordings set and expire old chunks, a bounded batch per pass"""
+        last_cleanup = 0.0
+        while True:
+            try:
+                members = await redis_service.get_redis().smembers(RECORDINGS_KEY)
+                self.recording = {m.decode() for m in members}
+                for stream_id in {key[0] for key in self._tracks} - self.recording:
+                    self.close(stream_id)
+
+                if time.monotonic() - last_cleanup >= settings.RECORDING_CLEANUP_INTERVAL:
+                    last_cleanup = time.monotonic()
+                    cutoff_ms = int((time.time() - self.retention) * 1000)
+                    open_chunks = {
+                        (track.directory, track.writer.chunk)
+                        for track in self._tracks.values() if track.writer is not None
+                    }
+                    removed = await asyncio.to_thread(
+                        self._expire, cutoff_ms, settings.RECORDING_CLEANUP_BATCH, open_chunks
+                    )
+                    if removed >= settings.RECORDING_CLEANUP_BATCH:
+                        last_cleanup = 0.0  # More to do; continue on the next pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Archive maintenance failed: {e}")
+            await asyncio.sleep(REFRESH_INTERVAL)
+
+    def _expire(self, cutoff_ms: int, limit: int, open_chunks: Set[Tuple[str, int]]) -> int:
+        """Remove up to ``limit`` chunks whose footage all ended before ``cutoff_ms``"""
+        removed = 0
+        try:
+            stream_ids = os.listdir(self.root)
+        except FileNotFoundError:
+            return 0
+        open_dirs = {directory for directory, _ in open_chunks}
+        for stream_id in stream_ids:
+            stream_dir = os.path.join(self.root, stream_id)
+            try:
+                tracks = os.listdir(stream_dir)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for track in tracks:
+                directory = os.path.join(stream_dir, track)
+                chunks = self.chunks(directory)
+                for i, chunk in enumerate(chunks):
+                    if (directory, chunk) in open_chunks:
+                        break
+                    index_path = os.path.join(directory, chunk_name(chunk, '.idx'))
+                    data_path = os.path.join(directory, chunk_name(chunk, '.ts'))
+                    try:
+                        # A chunk ends where the next begins; the last one at its final write
+                        ended_ms = chunks[i + 1] if i + 1 < len(chunks) else os.stat(index_path).st_mtime * 1000
+                        if ended_ms > cutoff_ms:
+                            break
+                        size = os.stat(data_path).st_size
+                        os.unlink(index_path)  # Index first, so readers never find a record without data
+                        os.unlink(data_path)
+                    except FileNotFoundError:
+                        continue
+                    removed += 1
+                    self.chunks_removed += 1
+                    self.bytes_removed += size
+                    if removed >= limit:
+                        return removed
+                if directory not in open_dirs:
+                    self._remove_empty(directory)
+            self._remove_empty(stream_dir)
+        return removed
+
+    @staticmethod
+    def _remove_empty(directory: str):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass  # Not empty, or a writer is recreating it
+
+    def stats(self) -> dict:
+        return {
+            'recording': len(self.recording),
+            'tracks_open': sum(1 for track in self._tracks.values() if track.writer is not None),
+            'pending': sum(len(track.pending) for track in self._tracks.values()),
+            'segments_written': self.segments_written,
+            'bytes_written': self.bytes_written,
+            'dropped': self.dropped,
+            'chunks_removed': self.chunks_removed,
+            'bytes_removed': self.bytes_removed
+        }
+
+
+archive = SegmentArchive()
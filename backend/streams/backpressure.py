@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+from django.conf import settings
+from .metrics import VIEWER_SEND_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Escalation steps returned by ViewerOutbox.put
+SLOW_SKIP = 'skip'
+SLOW_DOWNGRADE = 'downgrade'
+SLOW_DISCONNECT = 'disconnect'
+
+# WebSocket close code for viewers dropped as too slow
+CLOSE_TOO_SLOW = 4008
+
+
+class ViewerOutbox:
+    """Bounded send queue for one WebSocket viewer.
+
+    Channel-layer handlers only enqueue, so a viewer whose socket drains
+    slowly never stalls its consumer's receive loop (which would overflow
+    the channel layer's per-channel capacity). Queued items are events;
+    segment bytes are fetched and encoded just before sending, and are shared
+    through the frame cache, so a backed-up viewer holds references, not copies.
+
+    When more than ``depth`` media items are pending, the stale ones are
+    dropped so the viewer skips to the latest segment; LL-HLS parts are then
+    dropped until the next independent (keyframe) part. Repeated overflows
+    within ``window`` seconds escalate to a rendition downgrade, then to a
+    disconnect.
+    """
+
+    def __init__(self, send: Callable[[dict], Awaitable[None]], depth: Optional[int] = None):
+        self._send = send
+        self.depth = depth or settings.VIEWER_QUEUE_DEPTH
+        self.window = settings.VIEWER_SLOW_WINDOW
+        self.downgrade_after = settings.VIEWER_DOWNGRADE_AFTER
+        self.disconnect_after = settings.VIEWER_DISCONNECT_AFTER
+        self._queue = deque()  # (event, droppable, monotonic enqueue time)
+        self._media = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._overflows = deque()  # monotonic timestamps within the window
+        self._awaiting_keyframe = set()  # stream ids
+        self.sent = 0
+        self.dropped = 0
+        self.overflows = 0
+        self.max_depth = 0
+        self.send_latency = 0.0  # Of the last media item, seconds
+
+    def put(self, event: dict, droppable: bool = True) -> Optional[str]:
+        """Queue an event; returns the slow-consumer step taken, if any"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._drain())
+
+        action = None
+        if droppable and self._media >= self.depth:
+            action = self._overflow()
+
+        stream_id = event.get('stream_id')
+        if droppable and stream_id in self._awaiting_keyframe:
+            if not event.get('independent', True):
+                self.dropped += 1
+                return action
+            self._awaiting_keyframe.discard(stream_id)
+
+        self._queue.append((event, droppable, time.monotonic()))
+        if droppable:
+            self._media += 1
+            self.max_depth = max(self.max_depth, self._media)
+        self._wakeup.set()
+        return action
+
+    def _overflow(self) -> str:
+        """Drop every queued media item so the next one sent is the newest"""
+        kept = deque()
+        for entry in self._queue:
+            event, droppable, _ = entry
+            if droppable:
+                self.dropped += 1
+                if 'part' in event:
+                    self._awaiting_keyframe.add(event.get('stream_id'))
+            else:
+                kept.append(entry)
+        self._queue = kept
+        self._media = 0
+        self.overflows += 1
+
+        now = time.monotonic()
+        self._overflows.append(now)
+        while self._overflows and self._overflows[0] < now - self.window:
+            self._overflows.popleft()
+        if len(self._overflows) >= self.disconnect_after:
+            return SLOW_DISCONNECT
+        if len(self._overflows) >= self.downgrade_after:
+            return SLOW_DOWNGRADE
+        return SLOW_SKIP
+
+    async def _drain(self):
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            event, droppable, queued_at = self._queue.popleft()
+            if droppable:
+                self._media -= 1
+            try:
+                await self._send(event)
+                self.sent += 1
+                if droppable:
+                    self.send_latency = time.monotonic() - queued_at
+                    VIEWER_SEND_LATENCY.observe(self.send_latency)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Failed to send {event.get('type')} for {event.get('stream_id')}: {e}")
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._queue.clear()
+        self._media = 0
+
+    def stats(self) -> dict:
+        return {
+            'queue_depth': self._media,
+            'max_queue_depth': self.max_depth,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'overflows': self.overflows,
+            'send_latency_ms': round(self.send_latency * 1000, 1),
+        }
+
+
+# user_id: outbox of every viewer connected to this worker, for /api/viewers/
+viewer_outboxes: Dict[str, ViewerOutbox] = {}
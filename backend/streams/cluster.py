@@ -0,0 +1,436 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from django.conf import settings
+from .redis_service import redis_service
+from .placement import HashRing, cpu_headroom
+from .models import DESIRED_RUNNING
+
+logger = logging.getLogger(__name__)
+
+WORKERS_KEY = 'cluster_workers'    # zset: worker_id -> last heartbeat (epoch seconds)
+STREAMS_KEY = 'cluster_streams'    # set of stream ids known to the cluster
+NODES_KEY = 'cluster_nodes'        # hash: transcoder worker_id -> reported CPU headroom
+
+# Renew each lease only if we still hold it; returns one result per key
+RENEW_SCRIPT = """
+local renewed = {}
+for i, key in ipairs(KEYS) do
+    if redis.call('get', key) == ARGV[1] then
+        renewed[i] = redis.call('pexpire', key, ARGV[2])
+    else
+        renewed[i] = 0
+    end
+end
+return renewed
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+# Drop registry entries that are still stale when the script runs, so a stream a
+# viewer re-joined on another worker in the meantime keeps its entry
+UNLINK_STALE_SCRIPT = """
+local removed = 0
+for _, stream_id in ipairs(ARGV) do
+    if redis.call('hget', 'stream:' .. stream_id, 'desired') ~= 'running'
+            and redis.call('hlen', 'stream_viewers:' .. stream_id) == 0
+            and redis.call('exists', 'stream_owner:' .. stream_id) == 0 then
+        redis.call('unlink', 'stream:' .. stream_id, 'stream_viewers:' .. stream_id, 'stream_group:' .. stream_id)
+        redis.call('srem', KEYS[1], stream_id)
+        removed = removed + 1
+    end
+end
+return removed
+"""
+
+# Stream ids per UNLINK_STALE_SCRIPT call, so one call never blocks Redis for long
+UNLINK_BATCH = 500
+
+# Keys of the pre-cluster registry
+LEGACY_KEYS = ('active_streams', 'running_streams')
+
+
+def owner_key(stream_id: str) -> str:
+    return f"stream_owner:{stream_id}"
+
+
+def viewers_key(stream_id: str) -> str:
+    return f"stream_viewers:{stream_id}"
+
+
+def assign_channel(worker_id: str) -> str:
+    return f"cluster_assign:{worker_id}"
+
+
+class ClusterCoordinator:
+    """Cluster-wide stream ownership so exactly one worker transcodes a camera.
+
+    The owner holds ``stream_owner:<id>`` (SET NX PX) and renews it from a
+    heartbeat. Viewer counts are kept per worker in ``stream_viewers:<id>``
+    so a dead worker's viewers can be discounted.
+
+    Streams are placed on transcoder workers by a consistent-hash ring
+    weighted by each worker's reported CPU headroom. The worker that receives
+    ``add_stream`` asks the chosen node over pub/sub; streams with viewers,
+    or still desired running, but no owner (the owner died) are claimed by
+    their ring node on its next heartbeat. Running streams stay put when
+    nodes join.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease_ms = settings.CLUSTER_LEASE_MS
+        self.transcoder = settings.CLUSTER_ROLE != 'frontend'
+        self.owned: Set[str] = set()
+        self.pinned: Set[str] = set()   # claimed by their ring node even without viewers
+        self.ring = HashRing()
+        self.on_acquired: Optional[Callable[[str], Awaitable[None]]] = None
+        self.on_lost: Optional[Callable[[str], Awaitable[None]]] = None
+        self.on_idle: Optional[Callable[[str], Awaitable[None]]] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._restore: Optional[asyncio.Task] = None
+        self._claiming: Set[str] = set()
+
+    def ensure_started(self):
+        """Start the heartbeat (and, on transcoders, the assignment listener) on the running loop"""
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        if self.transcoder and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Stop heartbeating, leave the ring and hand every lease back"""
+        for task in (self._heartbeat, self._listener):
+            if task is not None:
+                task.cancel()
+        self._heartbeat = self._listener = None
+        for stream_id in list(self.owned):
+            await self.release(stream_id)
+        async with redis_service.get_redis().pipeline(transaction=False) as pipe:
+            pipe.zrem(WORKERS_KEY, self.worker_id)
+            pipe.hdel(NODES_KEY, self.worker_id)
+            await pipe.execute()
+
+    # Ownership
+
+    async def place(self, stream_id: str, local: bool = False) -> bool:
+        """Route a stream to its ring node; True when that is this worker and it now owns it.
+
+        When another node is chosen it is asked to claim the stream, and this
+        worker only relays. ``local`` keeps an unowned stream on this worker
+        when it transcodes, for LL-HLS, which only its owner serves over HTTP.
+        The stream must already be in the registry.
+        """
+        self.ensure_started()
+        owner = await self.owner(stream_id)
+        if owner is not None:
+            if owner == self.worker_id:
+                self.owned.add(stream_id)
+            return owner == self.worker_id
+        if not self.ring:
+            await self.refresh_ring()
+        node = self.ring.node_for(stream_id)
+        if node == self.worker_id or ((node is None or local) and self.transcoder):
+            return await self.acquire(stream_id)
+        if node is not None:
+            await redis_service.get_redis().publish(assign_channel(node), stream_id)
+        else:
+            logger.warning(f"No transcoder nodes available for {stream_id}")
+        return False
+
+    async def claim(self, stream_id: str) -> bool:
+        """Take ownership of a stream placed on this worker and start it.
+
+        Concurrent claims (assignment, orphan sweep, restore) start it once;
+        returns True for the one that did.
+        """
+        if stream_id in self.owned or stream_id in self._claiming:
+            return False
+        self._claiming.add(stream_id)
+        try:
+            if not await self.acquire(stream_id):
+                return False
+            if self.on_acquired:
+                await self.on_acquired(stream_id)
+            return True
+        finally:
+            self._claiming.discard(stream_id)
+
+    async def acquire(self, stream_id: str) -> bool:
+        """Become the stream's owner unless another live worker already is"""
+        self.ensure_started()
+        client = redis_service.get_redis()
+        if await client.set(owner_key(stream_id), self.worker_id, nx=True, px=self.lease_ms):
+            self.owned.add(stream_id)
+            return True
+        owner = await client.get(owner_key(stream_id))
+        if owner is not None and owner.decode() == self.worker_id:
+            self.owned.add(stream_id)
+            return True
+        return False
+
+    async def release(self, stream_id: str):
+        self.owned.discard(stream_id)
+        release = redis_service.get_redis().register_script(RELEASE_SCRIPT)
+        await release(keys=[owner_key(stream_id)], args=[self.worker_id])
+
+    def is_owner(self, stream_id: str) -> bool:
+        return stream_id in self.owned
+
+    async def owner(self, stream_id: str) -> Optional[str]:
+        owner = await redis_service.get_redis().get(owner_key(stream_id))
+        return owner.decode() if owner is not None else None
+
+    # Recovery
+
+    def restore_once(self) -> asyncio.Task:
+        """Run restore() once per process; later callers share the same task"""
+        if self._restore is None:
+            self._restore = asyncio.create_task(self.restore())
+            self._restore.add_done_callback(self._restore_done)
+        return self._restore
+
+    def _restore_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Registry restore failed: {task.exception()}")
+            self._restore = None  # Retry on the next caller
+
+    async def restore(self) -> Dict:
+        """Reconcile the Redis registry after a restart.
+
+        Unowned streams that were still desired running (they had viewers when
+        their worker went away) are placed again, so they are warm by the time
+        viewers reconnect; any that nobody rejoins linger out as usual. Stopped
+        entries are unlinked in batches.
+        """
+        start = time.perf_counter()
+        client = redis_service.get_redis()
+        stream_ids = sorted(s.decode() for s in await client.smembers(STREAMS_KEY))
+        async with client.pipeline(transaction=False) as pipe:
+            for stream_id in stream_ids:
+                pipe.hmget(f"stream:{stream_id}", 'url', 'desired')
+                pipe.exists(owner_key(stream_id))
+            results = await pipe.execute()
+
+        warm, stale = [], []
+        for index, stream_id in enumerate(stream_ids):
+            (url, desired), has_owner = results[index * 2:index * 2 + 2]
+            if has_owner:
+                continue
+            if url is not None and desired is not None and desired.decode() == DESIRED_RUNNING:
+                warm.append(stream_id)
+            else:
+                stale.append(stream_id)
+
+        # Register, drop the previous incarnation's viewer counts and build the ring first
+        await self.heartbeat(claim_orphans=False)
+        self.ensure_started()
+
+        unlinked = 0
+        unlink = client.register_script(UNLINK_STALE_SCRIPT)
+        await client.unlink(*LEGACY_KEYS)
+        for i in range(0, len(stale), UNLINK_BATCH):
+            unlinked += await unlink(keys=[STREAMS_KEY], args=stale[i:i + UNLINK_BATCH])
+
+        placed = await asyncio.gather(*(self._rewarm(stream_id) for stream_id in warm), return_exceptions=True)
+
+        summary = {
+            'restored': sum(1 for node in placed if node == self.worker_id),
+            'placed_elsewhere': sum(1 for node in placed if isinstance(node, str) and node != self.worker_id),
+            'unlinked': unlinked,
+            'seconds': round(time.perf_counter() - start, 3),
+        }
+        logger.info(f"Registry restored: {summary}")
+        return summary
+
+    async def _rewarm(self, stream_id: str) -> Optional[str]:
+        """Start a restored stream on its ring node; returns the node it went to"""
+        node = self.ring.node_for(stream_id)
+        if node == self.worker_id or ((node is None or local) and self.transcoder):
+            return self.worker_id if await self.claim(stream_id) else None
+        if node is not None:
+            await redis_service.get_redis().publish(assign_channel(node), stream_id)
+        return node
+
+    # Viewer reference counts
+
+    async def set_local_viewers(self, stream_id: str, count: int) -> int:
+        """Publish this worker's viewer count for a stream; returns the cluster-wide count"""
+        async with redis_service.get_redis().pipeline(transaction=False) as pipe:
+            index = self.queue_local_viewers(pipe, stream_id, count)
+            results = await pipe.execute()
+        return sum(int(c) for c in results[index])
+
+    def queue_local_viewers(self, pipe, stream_id: str, count: int) -> int:
+        """Queue set_local_viewers on a caller's pipeline; returns the index of the
+        result holding the per-worker counts"""
+        if count > 0:
+            pipe.hset(viewers_key(stream_id), self.worker_id, count)
+        else:
+            pipe.hdel(viewers_key(stream_id), self.worker_id)
+        pipe.hvals(viewers_key(stream_id))
+        return len(pipe) - 1
+
+    async def viewer_count(self, stream_id: str) -> int:
+        return sum(int(c) for c in await redis_service.get_redis().hvals(viewers_key(stream_id)))
+
+    # Registry
+
+    async def stream_ids(self) -> List[str]:
+        """IDs of every stream known to the cluster"""
+        stream_ids = await redis_service.get_redis().smembers(STREAMS_KEY)
+        return sorted(s.decode() for s in stream_ids)
+
+    async def list_streams(self) -> List[Dict]:
+        """Every stream known to the cluster, with owner and cluster-wide viewer count"""
+        return await self.list_streams_for(await self.stream_ids())
+
+    async def get_stream(self, stream_id: str) -> Optional[Dict]:
+        streams = await self.list_streams_for([stream_id])
+        return streams[0] if streams else None
+
+    async def list_streams_for(self, stream_ids: List[str]) -> List[Dict]:
+        client = redis_service.get_redis()
+        async with client.pipeline(transaction=False) as pipe:
+            for stream_id in stream_ids:
+                pipe.hgetall(f"stream:{stream_id}")
+                pipe.get(owner_key(stream_id))
+                pipe.hvals(viewers_key(stream_id))
+            results = await pipe.execute()
+        streams = []
+        for index, stream_id in enumerate(stream_ids):
+            info, owner, counts = results[index * 3:index * 3 + 3]
+            if not info:
+                continue
+            stream = {k.decode(): v.decode() for k, v in info.items()}
+            stream['viewer_count'] = sum(int(c) for c in counts)
+            stream['owner'] = owner.decode() if owner is not None else None
+            streams.append(stream)
+        return streams
+
+    # Placement
+
+    async def refresh_ring(self, nodes: Optional[Dict[bytes, bytes]] = None):
+        """Rebuild the hash ring from the transcoders' reported headroom"""
+        if nodes is None:
+            nodes = await redis_service.get_redis().hgetall(NODES_KEY)
+        weights = {node.decode(): float(weight) for node, weight in nodes.items()}
+        if weights != self.ring.weights:
+            self.ring = HashRing(weights)
+
+    async def _listen(self):
+        """Claim streams that front-ends place on this worker"""
+        pubsub = redis_service.get_redis().pubsub()
+        await pubsub.subscribe(assign_channel(self.worker_id))
+        try:
+            async for message in pubsub.listen():
+                if message['type'] != 'message':
+                    continue
+                stream_id = message['data'].decode()
+                try:
+                    await self.claim(stream_id)
+                except Exception as e:
+                    logger.error(f"Failed to claim stream {stream_id}: {e}")
+        finally:
+            await pubsub.aclose()
+
+    # Heartbeat
+
+    async def _heartbeat_loop(self):
+        interval = self.lease_ms / 3000
+        while True:
+            try:
+                await self.heartbeat()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cluster heartbeat failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def heartbeat(self, claim_orphans: bool = True):
+        """Renew leases, prune dead workers, refresh the ring, claim orphaned streams, report idle ones"""
+        client = redis_service.get_redis()
+        renew = client.register_script(RENEW_SCRIPT)
+        now = time.time()
+        owned = sorted(self.owned)
+
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.zadd(WORKERS_KEY, {self.worker_id: now})
+            if self.transcoder:
+                pipe.hset(NODES_KEY, self.worker_id, cpu_headroom())
+            pipe.zrangebyscore(WORKERS_KEY, '-inf', now - self.lease_ms / 1000)
+            for stream_id in owned:
+                pipe.hvals(viewers_key(stream_id))
+            results = await pipe.execute()
+        dead, *counts = results[2:] if self.transcoder else results[1:]
+
+        if owned:
+            renewed = await renew(keys=[owner_key(s) for s in owned], args=[self.worker_id, self.lease_ms])
+            for stream_id, ok in zip(owned, renewed):
+                if not ok:
+                    # Lease lapsed (e.g. a long pause) and another worker took the camera
+                    logger.warning(f"Lost ownership of {stream_id}")
+                    self.owned.discard(stream_id)
+                    if self.on_lost:
+                        await self.on_lost(stream_id)
+
+        if dead:
+            await self._prune_workers([d.decode() for d in dead])
+        await self.refresh_ring()
+
+        for stream_id, stream_counts in zip(owned, counts):
+            if stream_id in self.owned and not sum(int(c) for c in stream_counts) and self.on_idle:
+                await self.on_idle(stream_id)
+
+        if self.transcoder and claim_orphans:
+            await self._claim_orphans()
+
+    async def _claim_orphans(self):
+        """Claim streams that have viewers, are pinned or are desired running, but have
+        no owner and hash onto this worker"""
+        client = redis_service.get_redis()
+        stream_ids = sorted({s.decode() for s in await client.smembers(STREAMS_KEY)} | self.pinned)
+        mine = [s for s in stream_ids if s not in self.owned and self.ring.node_for(s) == self.worker_id]
+        if not mine:
+            return
+        async with client.pipeline(transaction=False) as pipe:
+            for stream_id in mine:
+                pipe.exists(owner_key(stream_id))
+                pipe.hvals(viewers_key(stream_id))
+                pipe.hget(f"stream:{stream_id}", 'desired')
+            results = await pipe.execute()
+        for index, stream_id in enumerate(mine):
+            has_owner, counts, desired = results[index * 3:index * 3 + 3]
+            wanted = (
+                stream_id in self.pinned
+                or sum(int(c) for c in counts)
+                or (desired is not None and desired.decode() == DESIRED_RUNNING)
+            )
+            if not has_owner and wanted:
+                logger.info(f"Taking over stream {stream_id}")
+                await self.claim(stream_id)
+
+    async def _prune_workers(self, dead_workers: List[str]):
+        client = redis_service.get_redis()
+        stream_ids = [s.decode() for s in await client.smembers(STREAMS_KEY)]
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.zrem(WORKERS_KEY, *dead_workers)
+            pipe.hdel(NODES_KEY, *dead_workers)
+            for stream_id in stream_ids:
+                pipe.hdel(viewers_key(stream_id), *dead_workers)
+            await pipe.execute()
+        logger.info(f"Pruned dead workers: {', '.join(dead_workers)}")
+
+
+cluster = ClusterCoordinator()
@@ -0,0 +1,193 @@
+import asyncio
+import struct
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+# trun / tfhd flag bits (ISO/IEC 14496-12)
+TFHD_BASE_DATA_OFFSET = 0x000001
+TFHD_SAMPLE_DESCRIPTION_INDEX = 0x000002
+TFHD_DEFAULT_DURATION = 0x000008
+TFHD_DEFAULT_SIZE = 0x000010
+TFHD_DEFAULT_FLAGS = 0x000020
+TRUN_DATA_OFFSET = 0x000001
+TRUN_FIRST_SAMPLE_FLAGS = 0x000004
+TRUN_SAMPLE_DURATION = 0x000100
+TRUN_SAMPLE_SIZE = 0x000200
+TRUN_SAMPLE_FLAGS = 0x000400
+TRUN_SAMPLE_CTO = 0x000800
+
+SAMPLE_IS_NON_SYNC = 0x00010000
+
+
+class Track(NamedTuple):
+    track_id: int
+    handler: str
+    timescale: int
+    default_duration: int
+    default_flags: int
+
+
+class FragmentInfo(NamedTuple):
+    """What the packager needs to know about one moof+mdat pair"""
+    independent: bool
+    start: float      # decode time of the first sample, seconds
+    duration: float   # seconds
+
+
+def iter_boxes(data: bytes, offset: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload_offset, box_end) for each box in data[offset:end]"""
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            raise ValueError(f"Corrupt box {box_type!r} at {offset}")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def find_box(data: bytes, box_type: bytes, offset: int = 0, end: Optional[int] = None):
+    for found, payload, box_end in iter_boxes(data, offset, end):
+        if found == box_type:
+            return payload, box_end
+    return None
+
+
+async def read_box(reader: asyncio.StreamReader) -> Optional[Tuple[bytes, bytes]]:
+    """Read one top-level box from a pipe; None at a clean end of stream"""
+    try:
+        header = await reader.readexactly(8)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise
+        return None
+    size, box_type = struct.unpack('>I4s', header)
+    if size == 1:
+        extended = await reader.readexactly(8)
+        header += extended
+        size = struct.unpack('>Q', extended)[0]
+    elif size == 0:
+        return box_type, header + await reader.read()
+    return box_type, header + await reader.readexactly(size - len(header))
+
+
+def parse_init_segment(moov: bytes) -> Dict[int, Track]:
+    """Track ids, handlers, timescales and trex defaults from a moov box"""
+    payload, end = find_box(moov, b'moov')
+    trex_defaults = {}
+    mvex = find_box(moov, b'mvex', payload, end)
+    if mvex:
+        for box_type, offset, _ in iter_boxes(moov, *mvex):
+            if box_type == b'trex':
+                track_id, _, duration, _, flags = struct.unpack_from('>IIIII', moov, offset + 4)
+                trex_defaults[track_id] = (duration, flags)
+
+    tracks = {}
+    for box_type, offset, box_end in iter_boxes(moov, payload, end):
+        if box_type != b'trak':
+            continue
+        tkhd, _ = find_box(moov, b'tkhd', offset, box_end)
+        version = moov[tkhd]
+        track_id = struct.unpack_from('>I', moov, tkhd + (20 if version == 1 else 12))[0]
+
+        mdia = find_box(moov, b'mdia', offset, box_end)
+        mdhd, _ = find_box(moov, b'mdhd', *mdia)
+        version = moov[mdhd]
+        timescale = struct.unpack_from('>I', moov, mdhd + (20 if version == 1 else 12))[0]
+        hdlr, _ = find_box(moov, b'hdlr', *mdia)
+        handler = moov[hdlr + 8:hdlr + 12].decode('ascii', 'replace')
+
+        duration, flags = trex_defaults.get(track_id, (0, 0))
+        tracks[track_id] = Track(track_id, handler, timescale, duration, flags)
+    return tracks
+
+
+def parse_fragment(moof: bytes, tracks: Dict[int, Track]) -> FragmentInfo:
+    """Keyframe flag, start and duration of a fragment, judged on its video track"""
+    payload, end = find_box(moof, b'moof')
+    fallback = None
+    for box_type, offset, box_end in iter_boxes(moof, payload, end):
+        if box_type != b'traf':
+            continue
+        info = _parse_traf(moof, offset, box_end, tracks)
+        if info is None:
+            continue
+        if info[0].handler == 'vide':
+            return info[1]
+        fallback = fallback or info[1]
+    if fallback is None:
+        raise ValueError("Fragment has no known tracks")
+    return fallback
+
+
+def _parse_traf(data: bytes, offset: int, end: int, tracks: Dict[int, Track]):
+    tfhd, _ = find_box(data, b'tfhd', offset, end)
+    tf_flags = struct.unpack_from('>I', data, tfhd)[0] & 0xFFFFFF
+    track_id = struct.unpack_from('>I', data, tfhd + 4)[0]
+    track = tracks.get(track_id)
+    if track is None:
+        return None
+
+    cursor = tfhd + 8
+    if tf_flags & TFHD_BASE_DATA_OFFSET:
+        cursor += 8
+    if tf_flags & TFHD_SAMPLE_DESCRIPTION_INDEX:
+        cursor += 4
+    default_duration = track.default_duration
+    default_flags = track.default_flags
+    if tf_flags & TFHD_DEFAULT_DURATION:
+        default_duration = struct.unpack_from('>I', data, cursor)[0]
+        cursor += 4
+    if tf_flags & TFHD_DEFAULT_SIZE:
+        cursor += 4
+    if tf_flags & TFHD_DEFAULT_FLAGS:
+        default_flags = struct.unpack_from('>I', data, cursor)[0]
+
+    decode_time = 0
+    tfdt = find_box(data, b'tfdt', offset, end)
+    if tfdt:
+        version = data[tfdt[0]]
+        decode_time = struct.unpack_from('>Q' if version == 1 else '>I', data, tfdt[0] + 4)[0]
+
+    duration = 0
+    first_flags = None
+    for box_type, trun, _ in iter_boxes(data, offset, end):
+        if box_type != b'trun':
+            continue
+        tr_flags = struct.unpack_from('>I', data, trun)[0] & 0xFFFFFF
+        sample_count = struct.unpack_from('>I', data, trun + 4)[0]
+        cursor = trun + 8
+        if tr_flags & TRUN_DATA_OFFSET:
+            cursor += 4
+        run_first_flags = None
+        if tr_flags & TRUN_FIRST_SAMPLE_FLAGS:
+            run_first_flags = struct.unpack_from('>I', data, cursor)[0]
+            cursor += 4
+
+        fields = [TRUN_SAMPLE_DURATION, TRUN_SAMPLE_SIZE, TRUN_SAMPLE_FLAGS, TRUN_SAMPLE_CTO]
+        stride = 4 * sum(1 for f in fields if tr_flags & f)
+        for index in range(sample_count):
+            sample = cursor + index * stride
+            if tr_flags & TRUN_SAMPLE_DURATION:
+                duration += struct.unpack_from('>I', data, sample)[0]
+            else:
+                duration += default_duration
+            if first_flags is None:
+                if index == 0 and run_first_flags is not None:
+                    first_flags = run_first_flags
+                elif tr_flags & TRUN_SAMPLE_FLAGS:
+                    flags_at = sample + (4 if tr_flags & TRUN_SAMPLE_DURATION else 0) \
+                        + (4 if tr_flags & TRUN_SAMPLE_SIZE else 0)
+                    first_flags = struct.unpack_from('>I', data, flags_at)[0]
+                else:
+                    first_flags = default_flags
+
+    independent = first_flags is not None and not first_flags & SAMPLE_IS_NON_SYNC
+    if track.handler != 'vide':
+        independent = True
+    timescale = track.timescale or 1
+    return track, FragmentInfo(independent, decode_time / timescale, duration / timescale)
@@ -1,9 +1,29 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
+import asyncio
+import base64
 import json
+import logging
+import time
 import uuid
 from .stream_manager import stream_manager
 from .ffmpeg_processor import ffmpeg_processor
 from .redis_service import redis_service
+from .cluster import cluster
+from .protocol import DELIVERY_BINARY, DELIVERY_JSON, DELIVERY_MODES, frame_cache
+from .segment_store import segment_store
+from .segment_ring import segment_ring
+from .archive import archive
+from .transcode import AUTO, PROFILE_CHOICES
+from .mosaic import MOSAIC, MosaicLayout, is_mosaic_url
+from .ll_hls import MODE_HLS, MODE_LL_HLS, MODES
+from .admission import PRIORITIES, PRIORITY_NORMAL
+from .backpressure import CLOSE_TOO_SLOW, SLOW_DISCONNECT, SLOW_DOWNGRADE, ViewerOutbox, viewer_outboxes
+from .metrics import FIRST_FRAME_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Largest wall of cameras one add_streams request may open
+MAX_BATCH_STREAMS = 64
 
 class StreamConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer - handles real-time stream communication"""
@@ -12,42 +32,49 @@ class StreamConsumer(AsyncWebsocketConsumer):
         await self.accept()
         self.user_id = str(uuid.uuid4())
         self.user_streams = set()
+        self.delivery = DELIVERY_JSON
+        self.renditions = {}  # stream_id: selected rendition (ABR streams only)
+        self.caught_up = {}  # stream_id: (sequence, part) of the last catch-up item queued
+        self.joined_at = {}  # stream_id: perf_counter at join, until its first frame is sent
+        self.outbox = ViewerOutbox(self.deliver)
+        viewer_outboxes[self.user_id] = self.outbox
         
         # Join user group in Redis
         await redis_service.add_user_to_group(self.user_id, self.channel_name)
         
+        # Daphne has no lifespan startup; restore the registry and bring pinned streams up on demand
+        cluster.restore_once()
+        if ffmpeg_processor.pinned:
+            await ffmpeg_processor.start_pinned_streams()
+        
         await self.send(text_data=json.dumps({
             'type': 'connection_established',
-            'user_id': self.user_id
+            'user_id': self.user_id,
+            'delivery': self.delivery,
+            'delivery_modes': list(DELIVERY_MODES)
         }))
         
-        print(f"User connected: {self.user_id}")
+        logger.info(f"User connected: {self.user_id}")
 
     async def disconnect(self, close_code):
         """Enhanced cleanup on disconnect"""
-        print(f"User disconnecting: {self.user_id}")
-        
-        # Clean up ALL user streams
-        streams_to_cleanup = list(self.user_streams)
-        
-        for stream_id in streams_to_cleanup:
-            try:
-                should_stop = stream_manager.remove_user_from_stream(stream_id, self.user_id)
-                await self.channel_layer.group_discard(f"stream_{stream_id}", self.channel_name)
-                await redis_service.remove_user_from_stream_group(stream_id, self.channel_name)
-                
-                if should_stop:
-                    print(f"Stopping FFmpeg for stream: {stream_id}")
-                    await ffmpeg_processor.stop_stream_processing(stream_id)
-                    
-            except Exception as e:
-                print(f"Error cleaning up stream {stream_id}: {e}")
+        logger.debug(f"User disconnecting: {self.user_id}")
+        self.outbox.close()
+        viewer_outboxes.pop(self.user_id, None)
         
-        await redis_service.remove_user_from_group(self.user_id, self.channel_name)
-        print(f"User disconnected: {self.user_id}")
+        # Clean up ALL user streams; stream groups and user group in one round trip
+        try:
+            await self.leave_streams(list(self.user_streams), disconnecting=True)
+        except Exception as e:
+            logger.error(f"Error cleaning up streams for {self.user_id}: {e}")
+        logger.info(f"User disconnected: {self.user_id}")
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """Handle incoming WebSocket messages"""
+        if text_data is None:
+            await self.send_error("Binary messages are not supported")
+            return
+        
         try:
             data = json.loads(text_data)
             action = data.get('action')
@@ -56,8 +83,16 @@ class StreamConsumer(AsyncWebsocketConsumer):
                 await self.handle_add_stream(data)
             elif action == 'remove_stream':
                 await self.handle_remove_stream(data)
+            elif action == 'add_streams':
+                await self.handle_add_streams(data)
+            elif action == 'remove_streams':
+                await self.handle_remove_streams(data)
             elif action == 'get_streams':
                 await self.handle_get_streams(data)
+            elif action == 'set_delivery':
+                await self.handle_set_delivery(data)
+            elif action == 'select_rendition':
+                await self.handle_select_rendition(data)
             else:
                 await self.send_error(f"Unknown action: {action}")
                 
@@ -65,64 +100,201 @@ class StreamConsumer(AsyncWebsocketConsumer):
             await self.send_error("Invalid JSON format")
         except Exception as e:
             await self.send_error(f"Error processing request: {str(e)}")
-            print(f"Error in receive: {e}")
+            logger.error(f"Error in receive: {e}")
 
     async def handle_add_stream(self, data):
         """Orchestrate adding new stream with duplicate handling"""
-        rtsp_url = data.get('url')
-        title = data.get('title')
-        
-        if not rtsp_url or not rtsp_url.startswith('rtsp://'):
-            await self.send_error("Invalid RTSP URL format")
+        try:
+            added, errors = await self.add_streams([data])
+            if errors:
+                await self.send_error(errors[0]['message'])
+                return
+            
+            await self.send(text_data=json.dumps({'type': 'stream_added', **added[0]}))
+            await self.send_init_segments(added)
+            await self.send_recent_segments(added)
+            
+        except Exception as e:
+            await self.send_error(f"Failed to add stream: {str(e)}")
+            logger.error(f"Error adding stream: {e}")
+
+    async def handle_add_streams(self, data):
+        """Open a wall of cameras at once; replies with one combined acknowledgement"""
+        streams = data.get('streams')
+        if not isinstance(streams, list) or not streams:
+            await self.send_error("A non-empty list of streams is required")
+            return
+        if len(streams) > MAX_BATCH_STREAMS:
+            await self.send_error(f"At most {MAX_BATCH_STREAMS} streams per request")
             return
         
         try:
-            # Business logic
-            stream_id = stream_manager.generate_stream_id(rtsp_url)
-            
-            # Check if stream exists and clean it up if needed
-            existing_stream = stream_manager.get_stream(stream_id)
+            added, errors = await self.add_streams([s if isinstance(s, dict) else {'url': s} for s in streams])
+            await self.send(text_data=json.dumps({
+                'type': 'streams_added',
+                'streams': added,
+                'errors': errors
+            }))
+            await self.send_init_segments(added)
+            await self.send_recent_segments(added)
             
-            if existing_stream:
-                print(f"Stream {stream_id} already exists, checking status...")
-                
-                # Check if FFmpeg process is still running
-                if stream_id not in ffmpeg_processor.active_processes:
-                    print(f"Stream {stream_id} FFmpeg stopped, cleaning up...")
-                    stream_manager.streams.pop(stream_id, None)
-                    existing_stream = None
+        except Exception as e:
+            await self.send_error(f"Failed to add streams: {str(e)}")
+            logger.error(f"Error adding streams: {e}")
+
+    def parse_stream_request(self, data):
+        """Validate one add request; returns (url, title, profile, mode, priority) or raises ValueError.
+
+        A ``mosaic`` of camera URLs instead of ``url`` asks for one stream
+        compositing them; its canonical mosaic: URL dedupes like a camera's.
+        ``record`` also archives the stream (see archive); only HLS mode is recorded.
+        """
+        rtsp_url = data.get('url')
+        profile = data.get('profile') or AUTO
+        mode = data.get('mode') or MODE_HLS
+        priority = data.get('priority') or PRIORITY_NORMAL
+        
+        if data.get('mosaic') is not None:
+            rtsp_url, profile = MosaicLayout.from_request(data['mosaic']).to_url(), MOSAIC
+        elif is_mosaic_url(rtsp_url):
+            rtsp_url, profile = MosaicLayout.from_url(rtsp_url).to_url(), MOSAIC
+        elif not rtsp_url or not rtsp_url.startswith('rtsp://'):
+            raise ValueError("Invalid RTSP URL format")
+        if not is_mosaic_url(rtsp_url) and profile not in PROFILE_CHOICES:
+            raise ValueError(f"Unknown transcode profile: {profile}")
+        if mode not in MODES:
+            raise ValueError(f"Unknown stream mode: {mode}")
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        if data.get('record') and mode != MODE_HLS:
+            raise ValueError("Only HLS mode streams can be recorded")
+        return rtsp_url, data.get('title'), profile, mode, priority
+
+    async def add_streams(self, requests):
+        """Subscribe this viewer to several streams.
+
+        Group membership, registry entries and viewer counts go through one
+        Redis pipeline, and streams that need FFmpeg start concurrently.
+        Returns the stream_added payloads and a list of per-stream errors.
+        """
+        errors = []
+        joining = {}  # stream_id: (stream, url, title, profile, mode, priority)
+        recording = []
+        for data in requests:
+            try:
+                rtsp_url, title, profile, mode, priority = self.parse_stream_request(data)
+            except ValueError as e:
+                errors.append({'url': data.get('url'), 'message': str(e)})
+                continue
             
-            if existing_stream:
-                # Add user to existing active stream
+            stream_id = stream_manager.generate_stream_id(rtsp_url)
+            if stream_id in joining:
+                continue
+            stream = stream_manager.get_stream(stream_id)
+            if stream:
                 stream_manager.add_user_to_stream(stream_id, self.user_id)
-                print(f"Added user to existing stream: {stream_id}")
+                logger.debug(f"Added user to existing stream: {stream_id}")
             else:
-                # Create new stream (or recreate cleaned up stream)
-                stream = stream_manager.create_stream(rtsp_url, title, self.user_id)
-                print(f"Created new stream: {stream_id}")
-                
-                # Start FFmpeg processing
-                await ffmpeg_processor.start_stream_processing(stream_id, rtsp_url)
-            
-            # Join WebSocket group
-            await self.channel_layer.group_add(f"stream_{stream_id}", self.channel_name)
-            
-            # Redis management
-            await redis_service.add_user_to_stream_group(stream_id, self.channel_name)
-            await redis_service.store_stream_info(stream_id, stream_manager.get_stream(stream_id))
-            
-            self.user_streams.add(stream_id)
+                stream = stream_manager.create_stream(rtsp_url, title, self.user_id, profile, mode)
+                logger.info(f"Created new stream: {stream_id}")
+            joining[stream_id] = (stream, rtsp_url, title, profile, mode, priority)
+            if data.get('record'):
+                recording.append(stream_id)
+        
+        if not joining:
+            return [], errors
+        # Before FFmpeg starts, so the archive has the stream from its first segment
+        await asyncio.gather(*(archive.start_recording(stream_id) for stream_id in recording))
+        
+        # Join WebSocket groups, then Redis management in one round trip; the
+        # registry entry lets whichever node is placed start the stream
+        await asyncio.gather(*(
+            self.channel_layer.group_add(f"stream_{stream_id}", self.channel_name) for stream_id in joining
+        ))
+        async with redis_service.get_redis().pipeline(transaction=False) as pipe:
+            for stream_id, (stream, *_) in joining.items():
+                redis_service.queue_join_stream(pipe, stream_id, self.channel_name, stream)
+                cluster.queue_local_viewers(pipe, stream_id, len(stream.viewers))
+            await pipe.execute()
+        self.user_streams.update(joining)
+        now = time.perf_counter()
+        for stream_id in joining:
+            self.joined_at.setdefault(stream_id, now)
+        
+        outcomes = await asyncio.gather(
+            *(self.ensure_transcoding(stream_id, *request) for stream_id, request in joining.items()),
+            return_exceptions=True
+        )
+        
+        added, failed = [], []
+        for (stream_id, (stream, rtsp_url, title, *_)), outcome in zip(joining.items(), outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Error adding stream {stream_id}: {outcome}")
+                errors.append({'url': rtsp_url, 'stream_id': stream_id, 'message': f"Failed to add stream: {outcome}"})
+                failed.append(stream_id)
+                continue
             
-            await self.send(text_data=json.dumps({
-                'type': 'stream_added',
+            renditions, default_rendition = await self.get_renditions(stream_id)
+            if renditions and stream_id not in self.renditions:
+                self.renditions[stream_id] = default_rendition
+            added.append({
                 'stream_id': stream_id,
                 'url': rtsp_url,
-                'title': title or f'Stream {stream_id[:6]}'
-            }))
-            
-        except Exception as e:
-            await self.send_error(f"Failed to add stream: {str(e)}")
-            print(f"Error adding stream: {e}")
+                'title': title or f'Stream {stream_id[:6]}',
+                'profile': stream.profile,
+                'renditions': renditions,
+                'rendition': self.renditions.get(stream_id),
+                'mode': stream.mode
+            })
+        
+        if failed:
+            await self.leave_streams(failed)
+        return added, errors
+
+    async def ensure_transcoding(self, stream_id, stream, rtsp_url, title, profile, mode, priority):
+        """Make sure some worker runs FFmpeg for a stream this viewer joined"""
+        # The hash ring picks one transcoder per camera; every other
+        # worker relays its segments through the channel layer group.
+        # LL-HLS parts and blocking playlists aren't mirrored, so those
+        # streams stay on the worker the viewer is connected to.
+        if not await cluster.place(stream_id, local=mode == MODE_LL_HLS):
+            logger.debug(f"Stream {stream_id} is transcoded by another worker, relaying")
+            return
+        
+        if stream_id in ffmpeg_processor.active_processes:
+            ffmpeg_processor.acquire_stream(stream_id)
+            return
+        
+        # Returns at once if the start is queued for capacity; the viewer
+        # then follows its queue position through stream_status
+        try:
+            await ffmpeg_processor.start_stream_processing(stream_id, rtsp_url, profile, mode, priority)
+        except Exception:
+            await cluster.release(stream_id)
+            raise
+
+    async def send_init_segments(self, added):
+        """Late joiners to an LL-HLS stream need the init segment before any part"""
+        for stream in added:
+            packager = ffmpeg_processor.get_ll_packager(stream['stream_id'])
+            if packager is not None and packager.init is not None:
+                await self.stream_init({'stream_id': stream['stream_id'], 'init': packager.init})
+
+    async def send_recent_segments(self, added):
+        """Queue each stream's current window so playback starts without waiting for the next segment.
+
+        Broadcasts at or before the window's last item are skipped afterwards,
+        since the owner rings a segment before broadcasting it.
+        """
+        windows = await asyncio.gather(*(
+            segment_ring.recent(stream['stream_id'], self.renditions.get(stream['stream_id'])) for stream in added
+        ))
+        for stream, window in zip(added, windows):
+            for event, data in window:
+                self.outbox.put({**event, 'data': data}, droppable=False)
+            if window:
+                last = window[-1][0]
+                self.caught_up[stream['stream_id']] = (last['sequence'], last.get('part', -1))
 
     async def handle_remove_stream(self, data):
         """Handle removing stream with proper cleanup"""
@@ -133,32 +305,82 @@ class StreamConsumer(AsyncWebsocketConsumer):
             return
         
         try:
-            print(f"Removing stream: {stream_id}")
-            
-            # Remove user from stream
-            should_stop = stream_manager.remove_user_from_stream(stream_id, self.user_id)
-            
-            # Leave WebSocket group
-            await self.channel_layer.group_discard(f"stream_{stream_id}", self.channel_name)
-            await redis_service.remove_user_from_stream_group(stream_id, self.channel_name)
-            
-            # Stop FFmpeg if no users left
-            if should_stop:
-                print(f"Stopping FFmpeg for stream: {stream_id}")
-                await ffmpeg_processor.stop_stream_processing(stream_id)
-            
-            self.user_streams.discard(stream_id)
+            logger.debug(f"Removing stream: {stream_id}")
+            await self.leave_streams([stream_id])
             
             await self.send(text_data=json.dumps({
                 'type': 'stream_removed',
                 'stream_id': stream_id
             }))
             
-            print(f"Successfully removed stream: {stream_id}")
+            logger.info(f"Successfully removed stream: {stream_id}")
             
         except Exception as e:
             await self.send_error(f"Failed to remove stream: {str(e)}")
-            print(f"Error removing stream: {e}")
+            logger.error(f"Error removing stream: {e}")
+
+    async def handle_remove_streams(self, data):
+        """Close several streams at once; replies with one combined acknowledgement"""
+        stream_ids = data.get('stream_ids')
+        if not isinstance(stream_ids, list) or not all(isinstance(s, str) and s for s in stream_ids):
+            await self.send_error("A list of stream IDs is required")
+            return
+        
+        try:
+            await self.leave_streams(list(dict.fromkeys(stream_ids)))
+            await self.send(text_data=json.dumps({
+                'type': 'streams_removed',
+                'stream_ids': stream_ids
+            }))
+        except Exception as e:
+            await self.send_error(f"Failed to remove streams: {str(e)}")
+            logger.error(f"Error removing streams: {e}")
+
+    async def leave_streams(self, stream_ids, disconnecting=False):
+        """Drop this viewer from several streams in one Redis round trip.
+
+        Each stream's owner lingers, then stops FFmpeg, once no worker has viewers left.
+        """
+        await asyncio.gather(*(
+            self.channel_layer.group_discard(f"stream_{stream_id}", self.channel_name) for stream_id in stream_ids
+        ))
+        
+        counts = {}  # stream_id: index of its per-worker viewer counts
+        async with redis_service.get_redis().pipeline(transaction=False) as pipe:
+            for stream_id in stream_ids:
+                stream_manager.remove_user_from_stream(stream_id, self.user_id)
+                stream = stream_manager.get_stream(stream_id)
+                redis_service.queue_leave_stream(pipe, stream_id, self.channel_name)
+                counts[stream_id] = cluster.queue_local_viewers(pipe, stream_id, len(stream.viewers) if stream else 0)
+            if disconnecting:
+                redis_service.queue_remove_user_from_group(pipe, self.user_id, self.channel_name)
+            results = await pipe.execute()
+        
+        for stream_id in stream_ids:
+            self.user_streams.discard(stream_id)
+            self.renditions.pop(stream_id, None)
+            self.caught_up.pop(stream_id, None)
+            self.joined_at.pop(stream_id, None)
+            stream = stream_manager.get_stream(stream_id)
+            if not (stream and stream.viewers) and not cluster.is_owner(stream_id):
+                segment_ring.discard(stream_id)  # Relayed for viewers that have all left
+        
+        idle = [
+            stream_id for stream_id, index in counts.items()
+            if not sum(int(c) for c in results[index]) and cluster.is_owner(stream_id)
+        ]
+        await asyncio.gather(*(ffmpeg_processor.release_stream(stream_id) for stream_id in idle))
+
+    async def get_renditions(self, stream_id):
+        """Rendition names and the default rendition, from the owning worker if it isn't us"""
+        if stream_id in ffmpeg_processor.active_processes:
+            renditions = ffmpeg_processor.get_renditions(stream_id)
+            if not renditions:
+                return [], None
+            return renditions, ffmpeg_processor.active_processes[stream_id]['profile'].default_rendition
+        info = await cluster.get_stream(stream_id) or {}
+        renditions = [r for r in info.get('renditions', '').split(',') if r]
+        return renditions, info.get('default_rendition') or None
 
     async def handle_get_streams(self, data):
         """Get user's active streams"""
@@ -174,25 +396,135 @@ class StreamConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             await self.send_error(f"Failed to get streams: {str(e)}")
 
+    async def handle_set_delivery(self, data):
+        """Opt this connection into binary or JSON segment delivery"""
+        mode = data.get('mode')
+        if mode not in DELIVERY_MODES:
+            await self.send_error(f"Unknown delivery mode: {mode}")
+            return
+        
+        self.delivery = mode
+        await self.send(text_data=json.dumps({
+            'type': 'delivery_set',
+            'delivery': mode
+        }))
+
+    async def handle_select_rendition(self, data):
+        """Switch this viewer to another rendition of an ABR stream mid-stream"""
+        stream_id = data.get('stream_id')
+        rendition = data.get('rendition')
+        
+        if stream_id not in self.user_streams:
+            await self.send_error("Not watching this stream")
+            return
+        
+        renditions, _ = await self.get_renditions(stream_id)
+        if rendition not in renditions:
+            await self.send_error(f"Unknown rendition: {rendition}")
+            return
+        
+        # Takes effect from the next segment broadcast
+        self.renditions[stream_id] = rendition
+        await self.send(text_data=json.dumps({
+            'type': 'rendition_selected',
+            'stream_id': stream_id,
+            'rendition': rendition,
+            'renditions': renditions
+        }))
+
     async def stream_data(self, event):
         """Handle stream data broadcast"""
+        # ABR streams broadcast every rendition; keep only the one this viewer picked
+        if event.get('rendition') != self.renditions.get(event['stream_id']):
+            return
+        
+        await self.queue_media(event)
+
+    async def stream_part(self, event):
+        """Handle an LL-HLS part broadcast"""
+        await self.queue_media(event)
+
+    async def stream_init(self, event):
+        """Queue the fMP4 init segment an LL-HLS viewer needs before its first part"""
+        self.outbox.put({**event, 'type': 'stream_init'}, droppable=False)
+
+    async def queue_media(self, event):
+        """Queue a segment or part; a viewer that keeps falling behind is downgraded, then dropped"""
+        caught_up = self.caught_up.get(event['stream_id'])
+        if caught_up is not None:
+            if (event['sequence'], event.get('part', -1)) <= caught_up:
+                return  # Already sent from the recent-segment window
+            del self.caught_up[event['stream_id']]
+        
+        action = self.outbox.put(event)
+        if action == SLOW_DOWNGRADE:
+            await self.downgrade_rendition(event['stream_id'])
+        elif action == SLOW_DISCONNECT:
+            logger.warning(f"Disconnecting slow viewer {self.user_id}: {self.outbox.stats()}")
+            await self.close(code=CLOSE_TOO_SLOW)
+
+    async def downgrade_rendition(self, stream_id):
+        """Move a slow viewer one step down the ABR ladder"""
+        renditions, _ = await self.get_renditions(stream_id)
+        current = self.renditions.get(stream_id)
+        if current not in renditions or current == renditions[-1]:
+            return
+        
+        self.renditions[stream_id] = renditions[renditions.index(current) + 1]
         await self.send(text_data=json.dumps({
-            'type': 'stream_data',
-            'stream_id': event['stream_id'],
-            'chunk': event['chunk'],
-            'timestamp': event['timestamp'],
-            'segment_name': event.get('segment_name', 'unknown'),
-            'chunk_size': event.get('chunk_size', 0)
+            'type': 'rendition_selected',
+            'stream_id': stream_id,
+            'rendition': self.renditions[stream_id],
+            'renditions': renditions,
+            'reason': 'slow_consumer'
         }))
 
+    async def deliver(self, event):
+        """Send one queued event; runs in the outbox's sender task"""
+        if event['stream_id'] not in self.user_streams:
+            return  # Removed while the event was queued
+        if event['type'] == 'stream_init':
+            await self.send(text_data=json.dumps({
+                'type': 'stream_init',
+                'stream_id': event['stream_id'],
+                'init': base64.b64encode(event['init']).decode('ascii')
+            }))
+        else:
+            await self.send_media(event)
+
+    async def send_media(self, event):
+        """Resolve a segment or part reference and send it in this viewer's delivery mode"""
+        frame = frame_cache.get(event, self.delivery)
+        if frame is None:
+            # Catch-up items carry their bytes from the recent-segment ring
+            data = event.get('data') or await segment_store.get(event['segment_key'])
+            if data is None:
+                return  # Expired from the shared store before we got to it
+            segment_ring.add(event, data)
+            frame = frame_cache.get(event, self.delivery)
+            if frame is None:
+                frame = frame_cache.encode(event, self.delivery, data)
+        
+        if self.delivery == DELIVERY_BINARY:
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
+        if self.joined_at:
+            joined_at = self.joined_at.pop(event['stream_id'], None)
+            if joined_at is not None:
+                FIRST_FRAME_LATENCY.observe(time.perf_counter() - joined_at)
+
     async def stream_status(self, event):
-        """Handle stream status updates"""
-        await self.send(text_data=json.dumps({
+        """Handle stream status updates; periodic ones carry FFmpeg progress"""
+        status = {
             'type': 'stream_status',
             'stream_id': event['stream_id'],
             'status': event['status'],
             'message': event.get('message', '')
-        }))
+        }
+        if 'progress' in event:
+            status['progress'] = event['progress']
+        await self.send(text_data=json.dumps(status))
 
     async def send_error(self, message):
         """Send error message to frontend"""
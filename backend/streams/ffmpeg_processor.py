@@ -1,229 +1,888 @@
 import asyncio
 import os
+import shutil
 import tempfile
 import json
 from datetime import datetime
 from channels.layers import get_channel_layer
-import redis.asyncio as redis
-import base64
+from django.conf import settings
+import time
 import logging
+from .segment_watcher import SegmentWatcher
+from .ingest import INGEST_DISK, INGEST_HTTP, IngestedFile, file_etag, ingest_server
+from .protocol import frame_cache
+from .segment_store import segment_store
+from .segment_ring import segment_ring
+from .archive import archive
+from .snapshots import read_jpegs, snapshot_cache, snapshot_output_args
+from .redis_service import redis_service
+from .transcode import ABR, AUTO, PASSTHROUGH, cheaper_profile, select_profile
+from .mosaic import MOSAIC, MosaicLayout, is_mosaic_url
+from .probe_cache import probe_cache
+from .stream_manager import stream_manager
+from .models import DESIRED_STOPPED
+from .cmaf import read_box
+from .ll_hls import MODE_HLS, MODE_LL_HLS, LowLatencyPackager
+from .supervisor import CIRCUIT_OPEN, Backoff, CircuitBreaker
+from .progress import ProgressTracker
+from .cluster import cluster
+from .admission import PRIORITY_HIGH, PRIORITY_NORMAL, AdmissionCancelled, admission
+from .backpressure import viewer_outboxes
+from .metrics import (
+    ACTIVE_STREAMS, BYTES_BROADCAST, CONNECTED_VIEWERS, FFMPEG_CPU, FFMPEG_RESTARTS, FFMPEG_RSS, FFMPEG_SPEED,
+    GROUP_SEND_DURATION, SEGMENT_BROADCAST_LATENCY, SEGMENT_INTERVAL, process_usage, registry,
+)
 
 # Add this after the class definition
 logger = logging.getLogger(__name__)
 
+# HLS temp directories are named <prefix><stream_id>_<pid>_<random>
+TEMP_DIR_PREFIX = 'stream_'
+
+
+def sweep_orphaned_dirs(root=None):
+    """Remove HLS temp directories left behind by processes that died without cleaning up.
+
+    Called at startup, before this process creates any, so directories
+    carrying our own pid (reused in a restarted container) are stale too.
+    """
+    root = root or tempfile.gettempdir()
+    removed = 0
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return 0
+    for name in names:
+        fields = name[len(TEMP_DIR_PREFIX):].split('_')
+        if not name.startswith(TEMP_DIR_PREFIX) or len(fields) != 3 or not fields[1].isdigit():
+            continue
+        pid = int(fields[1])
+        if pid != os.getpid():
+            try:
+                os.kill(pid, 0)
+                continue  # Another live worker's
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                continue  # Alive, run by another user
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        removed += 1
+    if removed:
+        logger.info(f"Removed {removed} orphaned HLS temp directories")
+    return removed
+
 class FFmpegProcessor:
     def __init__(self):
         self.active_processes = {}  # stream_id: process_info
         self.channel_layer = get_channel_layer()
-        self.redis_url = os.environ.get('REDIS_URL', 'redis://redis:6379')
+        self.pinned = {stream_manager.generate_stream_id(url): url for url in settings.PINNED_STREAMS}
+        self.warm_hits = 0
+        self.cold_starts = 0
+        sweep_orphaned_dirs()
     
-    async def start_stream_processing(self, stream_id, rtsp_url):
-        """Start FFmpeg process for RTSP stream conversion with enhanced error handling"""
+    @staticmethod
+    def input_args(rtsp_url):
+        if is_mosaic_url(rtsp_url):
+            return MosaicLayout.from_url(rtsp_url).input_args()
+        return ['-rtsp_transport', 'tcp', '-i', rtsp_url]
+
+    @staticmethod
+    def snapshot_args(profile, snapshot_fd):
+        """Input options and extra output for keyframe snapshots on ``snapshot_fd``, if any"""
+        if snapshot_fd is None:
+            return [], []
+        # A remux never decodes, so only keyframes need decoding for the snapshots
+        input_options = ['-skip_frame:v', 'nokey'] if profile.is_passthrough else []
+        return input_options, snapshot_output_args(snapshot_fd)
+
+    def build_ffmpeg_command(self, rtsp_url, temp_dir, profile, probe=None, input_args=None,
+                             discontinuity=False, upload=False, snapshot_fd=None):
+        """FFmpeg command line for HLS output with the given transcode profile.
+
+        ABR ladders write one playlist per rendition under ``<temp_dir>/<name>/``
+        plus ``master.m3u8``; all renditions come from a single decode. With
+        ``discontinuity`` the restarted muxer appends to the existing playlist
+        behind an EXT-X-DISCONTINUITY, keeping the media sequence continuous.
+        With ``upload`` the output root is the ingest server's URL and FFmpeg
+        PUTs every file over one kept-alive connection instead of writing it.
+        With ``snapshot_fd`` a second output writes keyframe JPEGs to that fd.
+        """
+        snapshot_input, snapshot_output = self.snapshot_args(profile, snapshot_fd)
+        if upload:
+            hls_flags = 'delete_segments+append_list+omit_endlist'  # An upload is complete when it lands
+            upload_args = ['-method', 'PUT', '-http_persistent', '1', '-ignore_io_errors', '1']
+        else:
+            hls_flags = 'delete_segments+append_list+omit_endlist+temp_file'  # Live stream flags, atomic renames
+            upload_args = []
+        if discontinuity:
+            hls_flags += '+discont_start'
+        if getattr(profile, 'renditions', None):
+            output_dir = os.path.join(temp_dir, '%v')
+            master_args = ['-master_pl_name', 'master.m3u8']
+        else:
+            output_dir = temp_dir
+            master_args = []
+        
+        return [
+            'ffmpeg',
+            *snapshot_input,
+            *(input_args or self.input_args(rtsp_url)),
+            *profile.codec_args(probe),
+            '-f', 'hls',
+            '-hls_time', str(settings.HLS_SEGMENT_DURATION),
+            '-hls_list_size', str(settings.HLS_LIST_SIZE),
+            '-hls_flags', hls_flags,
+            '-hls_start_number_source', 'epoch', # Use timestamp-based numbering
+            '-hls_segment_filename', os.path.join(output_dir, 'segment_%03d.ts'),
+            *master_args,
+            *upload_args,
+            '-avoid_negative_ts', 'make_zero',
+            '-fflags', '+genpts',                # Generate PTS
+            '-progress', 'pipe:2', '-nostats',   # Machine-readable progress blocks on stderr
+            '-loglevel', 'error',                # Reduced FFmpeg logging
+            os.path.join(output_dir, 'playlist.m3u8'),
+            *snapshot_output
+        ]
+
+    def build_ll_ffmpeg_command(self, rtsp_url, profile, probe=None, input_args=None, snapshot_fd=None):
+        """FFmpeg command line for LL-HLS: fragmented MP4 on stdout.
+
+        A fragment starts at every keyframe and otherwise every part duration;
+        LowLatencyPackager turns fragments into parts and segments.
+        """
+        # frag_duration is a floor; stay under the advertised part target
+        frag_us = int(settings.LL_HLS_PART_DURATION * 0.9 * 1_000_000)
+        snapshot_input, snapshot_output = self.snapshot_args(profile, snapshot_fd)
+        return [
+            'ffmpeg',
+            *snapshot_input,
+            *(input_args or self.input_args(rtsp_url)),
+            *profile.codec_args(probe),
+            '-f', 'mp4',
+            '-movflags', '+frag_keyframe+empty_moov+default_base_moof',
+            '-frag_duration', str(frag_us),
+            '-flush_packets', '1',
+            '-avoid_negative_ts', 'make_zero',
+            '-fflags', '+genpts',
+            '-progress', 'pipe:2', '-nostats',  # stdout carries the fragments
+            '-loglevel', 'error',
+            'pipe:1',
+            *snapshot_output
+        ]
+
+    async def start_stream_processing(self, stream_id, rtsp_url, profile=None, mode=MODE_HLS,
+                                      priority=PRIORITY_NORMAL):
+        """Start FFmpeg process for RTSP stream conversion with enhanced error handling.
+
+        Without capacity for it the start is queued: this returns at once and
+        the stream starts in the background when admitted, reporting its queue
+        position through stream_status meanwhile.
+        """
         if stream_id in self.active_processes:
             logger.info(f"Stream {stream_id} already processing")
+            self.acquire_stream(stream_id)
+            return
+        if admission.is_waiting(stream_id):
+            logger.info(f"Stream {stream_id} already queued for transcoder capacity")
             return
         
         try:
             logger.info(f"Starting stream processing for {stream_id}")
+            self.cold_starts += 1
             
-            # Validate RTSP URL first (but don't fail if validation fails)
-            is_valid = await self.validate_rtsp_url(rtsp_url)
-            if not is_valid:
-                logger.warning(f"RTSP URL validation failed, but proceeding anyway")
-            
-            # Create temporary directory for HLS segments
-            temp_dir = tempfile.mkdtemp(prefix=f"stream_{stream_id}_")
-            playlist_path = os.path.join(temp_dir, "playlist.m3u8")
-            
-            # Enhanced FFmpeg command for live streaming
-            ffmpeg_cmd = [
-                'ffmpeg',
-                '-rtsp_transport', 'tcp',
-                '-i', rtsp_url,
-                '-f', 'hls',
-                '-hls_time', '2',                    # 2-second segments
-                '-hls_list_size', '3',               # Keep only 3 segments in playlist
-                '-hls_flags', 'delete_segments+append_list+omit_endlist',  # Live stream flags
-                '-hls_start_number_source', 'epoch', # Use timestamp-based numbering
-                '-hls_segment_filename', os.path.join(temp_dir, 'segment_%03d.ts'),
-                '-c:v', 'libx264',
-                '-preset', 'ultrafast',
-                '-tune', 'zerolatency',
-                '-profile:v', 'baseline',            # Better compatibility
-                '-level', '3.0',
-                '-g', '30',                          # 2-second GOP (15fps * 2)
-                '-sc_threshold', '0',
-                '-b:v', '500k',                      # Lower bitrate for stability
-                '-maxrate', '600k',
-                '-bufsize', '1200k',
-                '-s', '640x480',
-                '-r', '15',
-                '-c:a', 'aac',
-                '-b:a', '64k',
-                '-ac', '1',
-                '-avoid_negative_ts', 'make_zero',
-                '-fflags', '+genpts',                # Generate PTS
-                '-loglevel', 'error',                # Reduced FFmpeg logging
-                playlist_path
-            ]
+            if is_mosaic_url(rtsp_url):
+                # Every tile is decoded and re-encoded, so there is nothing to probe for
+                probe, transcode_profile = None, MosaicLayout.from_url(rtsp_url)
+            else:
+                # Never wait on ffprobe unless the ladder's audio mapping depends on it;
+                # unknown cameras start on the safe re-encode and are probed alongside
+                probe = probe_cache.get(rtsp_url)
+                if probe is None and profile == ABR:
+                    probe = await self.probe_rtsp_url(rtsp_url)
+                transcode_profile = select_profile(probe, profile)
             
-            logger.info(f"Starting FFmpeg for stream {stream_id}")
+            admitted = admission.try_admit(stream_id, transcode_profile)
+            if admitted is None:
+                await self.update_stream_status(stream_id, 'queued', 'Waiting for transcoder capacity')
+                asyncio.create_task(self._start_when_admitted(
+                    stream_id, rtsp_url, probe, profile, transcode_profile, mode, priority
+                ))
+                return
+            await self._launch(stream_id, rtsp_url, probe, profile, admitted, mode)
             
-            # Start FFmpeg process
+        except Exception as e:
+            admission.release(stream_id)
+            logger.error(f"Failed to start stream {stream_id}: {e}")
+            await self.update_stream_status(stream_id, 'error', str(e))
+            raise Exception(f"Failed to start stream processing: {str(e)}")
+
+    async def _start_when_admitted(self, stream_id, rtsp_url, probe, requested_profile, transcode_profile, mode,
+                                   priority):
+        """Wait in the admission queue, then start the stream"""
+        async def report_position(position):
+            await self.update_stream_status(stream_id, 'queued', f'Waiting for transcoder capacity (position {position})')
+        
+        try:
+            admitted = await admission.wait(stream_id, transcode_profile, priority, report_position)
+            await self._launch(stream_id, rtsp_url, probe, requested_profile, admitted, mode)
+        except AdmissionCancelled:
+            pass
+        except Exception as e:
+            admission.release(stream_id)
+            logger.warning(f"Could not start stream {stream_id}: {e}")
+            await self.update_stream_status(stream_id, 'error', str(e))
+            await cluster.release(stream_id)
+
+    async def _launch(self, stream_id, rtsp_url, probe, requested_profile, transcode_profile, mode):
+        """Set up output and supervision for an admitted stream and spawn FFmpeg"""
+        logger.info(f"Using transcode profile '{transcode_profile.name}' for {stream_id}")
+        renditions = getattr(transcode_profile, 'rendition_names', [])
+        
+        if mode == MODE_LL_HLS:
+            if renditions:
+                raise ValueError("LL-HLS mode does not support ABR ladders")
+            # Parts are packaged in memory; nothing touches disk
+            temp_dir = playlist_path = output = None
+            packager = LowLatencyPackager(stream_id)
+        elif settings.HLS_INGEST == INGEST_HTTP:
+            # FFmpeg uploads into memory; nothing touches disk either
+            await ingest_server.ensure_started()
+            temp_dir = playlist_path = packager = None
+            output = ingest_server.open(stream_id)
+        else:
+            # Create temporary directory for HLS segments; the pid in its name
+            # lets the next process sweep it if this one dies
+            temp_dir = tempfile.mkdtemp(prefix=f"{TEMP_DIR_PREFIX}{stream_id}_{os.getpid()}_")
+            playlist_path = os.path.join(temp_dir, "playlist.m3u8")
+            packager = output = None
+            for rendition in renditions:
+                os.mkdir(os.path.join(temp_dir, rendition))
+        
+        # Store process info
+        self.active_processes[stream_id] = {
+            'process': None,
+            'temp_dir': temp_dir,
+            'playlist_path': playlist_path,
+            'rtsp_url': rtsp_url,
+            'probe': probe,
+            'profile': transcode_profile,
+            'renditions': renditions,
+            'mode': mode,
+            'packager': packager,
+            'output': output,  # MemoryOutput under HTTP ingest
+            'watchers': [],
+            'started_at': datetime.now(),
+            'restarts': 0,
+            'downtime': 0.0,
+            'down_since': None,
+            'last_exit_code': None,
+            'backoff': Backoff(),
+            'breaker': CircuitBreaker(),
+            'supervisor': None,
+            'planned_restart': False,
+            'linger_task': None,
+            'progress': ProgressTracker(),  # Replaced on every spawn
+            'progress_reported_at': 0.0,
+            'lag_warned': False,
+            'last_segment_at': {},  # rendition: monotonic time its previous segment was finalized
+            # Pre-bound metric series for the per-segment path
+            'bytes_broadcast': BYTES_BROADCAST.labels(stream_id),
+            'restart_counter': FFMPEG_RESTARTS.labels(stream_id)
+        }
+        
+        try:
+            await self.spawn_ffmpeg(stream_id)
+        except Exception:
+            # Nothing is running yet; leave no entry behind for the next start to trip over
+            self.discard_unstarted(stream_id)
+            raise
+        archive.ensure_started()  # Follows which streams to record
+        if probe is None and transcode_profile.name != MOSAIC:
+            asyncio.create_task(self.probe_in_background(stream_id, rtsp_url, requested_profile))
+        
+        # Update Redis status; other workers read the stream layout from the same hash
+        await redis_service.get_redis().hset(f"stream:{stream_id}", mapping={
+            'profile': transcode_profile.name,
+            'mode': mode,
+            'renditions': ','.join(renditions),
+            'default_rendition': getattr(transcode_profile, 'default_rendition', None) or '',
+        })
+        stream = stream_manager.get_stream(stream_id)
+        if stream is not None:
+            stream.profile = transcode_profile.name
+            stream.mode = mode
+        await self.update_stream_status(stream_id, 'active', 'Stream processing started')
+        
+        # Start monitoring tasks; segment watchers outlive FFmpeg restarts
+        self.active_processes[stream_id]['supervisor'] = asyncio.create_task(self.supervise_stream(stream_id))
+        if packager is None:
+            for rendition in renditions or [None]:
+                asyncio.create_task(self.stream_hls_segments(stream_id, rendition))
+        
+        logger.info(f"Successfully started FFmpeg processing for stream {stream_id}")
+
+    def discard_unstarted(self, stream_id):
+        """Forget a stream whose first FFmpeg never spawned, with its output; the caller releases admission"""
+        process_info = self.active_processes.pop(stream_id, None)
+        if process_info is None:
+            return  # Stopped while spawning; the stop cleaned up
+        if process_info['packager'] is not None:
+            process_info['packager'].close()
+        if process_info['temp_dir']:
+            shutil.rmtree(process_info['temp_dir'], ignore_errors=True)
+        if process_info['output'] is not None:
+            ingest_server.close(stream_id)
+        BYTES_BROADCAST.remove(stream_id)
+        FFMPEG_RESTARTS.remove(stream_id)
+
+    async def spawn_ffmpeg(self, stream_id, restart=False):
+        """Launch FFmpeg for a registered stream; restarts continue the same playlist"""
+        process_info = self.active_processes[stream_id]
+        profile = process_info['profile']
+        # Keyframe snapshots come out of the same process on a pipe of their own;
+        # a mosaic's picture is a filter output the snapshot output can't also map
+        snapshots = settings.SNAPSHOT_ENABLED and profile.name != MOSAIC
+        snapshot_read, snapshot_fd = os.pipe() if snapshots else (None, None)
+        if process_info['packager'] is not None:
+            ffmpeg_cmd = self.build_ll_ffmpeg_command(
+                process_info['rtsp_url'], profile, process_info['probe'], snapshot_fd=snapshot_fd
+            )
+        elif process_info['output'] is not None:
+            ffmpeg_cmd = self.build_ffmpeg_command(
+                process_info['rtsp_url'], ingest_server.url(stream_id), profile, process_info['probe'],
+                discontinuity=restart, upload=True, snapshot_fd=snapshot_fd
+            )
+        else:
+            ffmpeg_cmd = self.build_ffmpeg_command(
+                process_info['rtsp_url'], process_info['temp_dir'], profile, process_info['probe'],
+                discontinuity=restart, snapshot_fd=snapshot_fd
+            )
+        
+        logger.info(f"Starting FFmpeg for stream {stream_id}")
+        try:
             process = await asyncio.create_subprocess_exec(
-                *ffmpeg_cmd,
+                *self.nice_prefix(), *ffmpeg_cmd,
                 stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+                stderr=asyncio.subprocess.PIPE,
+                pass_fds=(snapshot_fd,) if snapshot_fd is not None else ()
             )
-            
-            print(f"FFmpeg process started for stream: {stream_id}")
-            
-            # Store process info
-            self.active_processes[stream_id] = {
-                'process': process,
-                'temp_dir': temp_dir,
-                'playlist_path': playlist_path,
-                'rtsp_url': rtsp_url,
-                'started_at': datetime.now()
-            }
-            
-            # Update Redis status
-            await self.update_stream_status(stream_id, 'active', 'Stream processing started')
-            
-            # Start monitoring tasks
-            asyncio.create_task(self.monitor_ffmpeg_process(stream_id))
-            asyncio.create_task(self.stream_hls_segments(stream_id))
-            
-            logger.info(f"Successfully started FFmpeg processing for stream {stream_id}")
-            
+        except Exception:
+            if snapshot_fd is not None:
+                os.close(snapshot_read)
+            raise
+        finally:
+            if snapshot_fd is not None:
+                os.close(snapshot_fd)  # The child holds the write end now
+        if settings.FFMPEG_CGROUP:
+            self.join_cgroup(stream_id, process.pid)
+        process_info['process'] = process
+        process_info['spawned_at'] = time.monotonic()
+        process_info['progress'] = ProgressTracker()
+        process_info['progress_reported_at'] = process_info['spawned_at']
+        process_info['lag_warned'] = False
+        logger.debug(f"FFmpeg process {process.pid} started for stream {stream_id}")
+        
+        if process_info['packager'] is not None:
+            asyncio.create_task(self.stream_ll_parts(stream_id, process))
+        if snapshot_read is not None:
+            asyncio.create_task(self.read_snapshots(stream_id, snapshot_read))
+        return process
+
+    async def read_snapshots(self, stream_id, fd):
+        """Cache the keyframe JPEGs one FFmpeg run writes to its snapshot pipe"""
+        reader = asyncio.StreamReader()
+        transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, 'rb', 0)
+        )
+        try:
+            # Drain until FFmpeg exits: an unread pipe would block the whole process
+            async for jpeg in read_jpegs(reader):
+                if stream_id in self.active_processes:
+                    snapshot_cache.put(stream_id, jpeg)
+        finally:
+            transport.close()
+
+    @staticmethod
+    def nice_prefix():
+        """Run FFmpeg under nice so it yields CPU to the server and other streams' I/O.
+
+        nice execs FFmpeg in place, so the pid is FFmpeg's and every thread it
+        starts inherits the priority. A preexec_fn would do the same in the
+        forked child, which is unsafe in this threaded process.
+        """
+        return ['nice', '-n', str(settings.FFMPEG_NICE)] if settings.FFMPEG_NICE else []
+
+    @staticmethod
+    def join_cgroup(stream_id, pid):
+        """Move an FFmpeg child into the configured cgroup so its CPU/memory limits apply"""
+        try:
+            with open(os.path.join(settings.FFMPEG_CGROUP, 'cgroup.procs'), 'w') as f:
+                f.write(str(pid))
+        except OSError as e:
+            logger.warning(f"Could not move FFmpeg for {stream_id} into {settings.FFMPEG_CGROUP}: {e}")
+
+    async def supervise_stream(self, stream_id):
+        """Restart FFmpeg with jittered backoff while the stream is registered.
+
+        A run shorter than FFMPEG_STABLE_RUN is a failure; repeated failures
+        open the circuit breaker, which parks the camera for a cooldown
+        instead of respawning it in a tight loop.
+        """
+        try:
+            while stream_id in self.active_processes:
+                process_info = self.active_processes[stream_id]
+                return_code = await self.monitor_ffmpeg_process(
+                    stream_id, process_info['process'], process_info['progress']
+                )
+                if self.active_processes.get(stream_id) is not process_info:
+                    return  # Stopped on purpose while we waited
+                
+                if process_info['planned_restart']:
+                    # Profile switch: respawn at once, it is not a camera failure
+                    process_info['planned_restart'] = False
+                    await self.spawn_ffmpeg(stream_id, restart=True)
+                    continue
+                
+                process_info['last_exit_code'] = return_code
+                process_info['down_since'] = time.monotonic()
+                backoff = process_info['backoff']
+                breaker = process_info['breaker']
+                if time.monotonic() - process_info['spawned_at'] >= settings.FFMPEG_STABLE_RUN:
+                    backoff.reset()
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+                
+                if breaker.state == CIRCUIT_OPEN:
+                    delay = breaker.retry_in()
+                    logger.warning(f"Circuit open for {stream_id} after {breaker.failures} failures; retrying in {delay:.1f}s")
+                    await self.update_stream_status(stream_id, 'error', f'Camera unavailable, retrying in {delay:.1f}s')
+                else:
+                    delay = backoff.next_delay()
+                    logger.info(f"FFmpeg for {stream_id} exited with {return_code}; restarting in {delay:.1f}s")
+                    await self.update_stream_status(stream_id, 'reconnecting', f'Reconnecting in {delay:.1f}s')
+                
+                await asyncio.sleep(delay)
+                if self.active_processes.get(stream_id) is not process_info:
+                    return
+                if breaker.state == CIRCUIT_OPEN:
+                    breaker.allow_trial()
+                
+                await self.spawn_ffmpeg(stream_id, restart=True)
+                process_info['restarts'] += 1
+                process_info['restart_counter'].inc()
+                process_info['downtime'] += time.monotonic() - process_info['down_since']
+                process_info['down_since'] = None
+                await self.update_stream_status(stream_id, 'active', f"Stream restarted (restart {process_info['restarts']})")
+        
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to start stream {stream_id}: {e}")
-            print(f"Failed to start stream {stream_id}: {e}")
+            logger.error(f"Supervisor for {stream_id} failed: {e}")
             await self.update_stream_status(stream_id, 'error', str(e))
-            raise Exception(f"Failed to start stream processing: {str(e)}")
+            await self.stop_stream_processing(stream_id)
 
-    async def monitor_ffmpeg_process(self, stream_id):
-        """Enhanced monitoring with essential logging only"""
-        if stream_id not in self.active_processes:
+    async def probe_in_background(self, stream_id, rtsp_url, requested_profile=None):
+        """Probe a camera off the critical path, then switch to passthrough if it can be remuxed"""
+        probe = await self.probe_rtsp_url(rtsp_url)
+        process_info = self.active_processes.get(stream_id)
+        if probe is None or process_info is None:
             return
         
-        process_info = self.active_processes[stream_id]
-        process = process_info['process']
+        process_info['probe'] = probe
+        if (requested_profile or AUTO) != AUTO:
+            return
+        profile = select_profile(probe, AUTO)
+        if profile.name == PASSTHROUGH and process_info['profile'].name != PASSTHROUGH:
+            logger.info(f"Camera for {stream_id} can be remuxed; switching to passthrough")
+            await self.switch_profile(stream_id, profile)
+
+    async def switch_profile(self, stream_id, profile):
+        """Restart FFmpeg with another profile; viewers see one discontinuity"""
+        process_info = self.active_processes.get(stream_id)
+        if process_info is None:
+            return
         
+        process_info['profile'] = profile
+        admission.resize(stream_id, profile)
+        stream = stream_manager.get_stream(stream_id)
+        if stream is not None:
+            stream.profile = profile.name
+        await redis_service.get_redis().hset(f"stream:{stream_id}", 'profile', profile.name)
+        process = process_info['process']
+        if process.returncode is None:
+            process_info['planned_restart'] = True
+            process.terminate()
+
+    async def monitor_ffmpeg_process(self, stream_id, process, progress):
+        """Relay FFmpeg's critical errors and progress, and return its exit code"""
+        # Keep draining stderr to EOF even after an error: -progress writes to it
+        # twice a second, and FFmpeg blocks on a full pipe. Lost RTSP packets also
+        # log "Invalid data found" without ending the run.
+        reported = False
         try:
-            # Read stderr for FFmpeg logs
+            # Read stderr for FFmpeg logs and -progress blocks
             while True:
                 line = await process.stderr.readline()
                 if not line:
                     break
                 
-                log_line = line.decode('utf-8').strip()
-                if log_line:
+                log_line = line.decode('utf-8', 'replace').strip()
+                if progress.feed(log_line):
+                    await self.on_progress(stream_id, progress)
+                elif log_line:
                     # Only log critical errors
                     if 'Connection refused' in log_line or 'No route to host' in log_line:
-                        print(f"RTSP connection failed for {stream_id}")
-                        await self.update_stream_status(stream_id, 'error', 'RTSP connection failed')
-                        break
+                        if not reported:
+                            reported = True
+                            logger.warning(f"RTSP connection failed for {stream_id}")
+                            await self.update_stream_status(stream_id, 'error', 'RTSP connection failed')
                     elif 'Invalid data found' in log_line:
-                        print(f"Invalid RTSP stream for {stream_id}")
-                        await self.update_stream_status(stream_id, 'error', 'Invalid RTSP stream')
-                        break
+                        if not reported:
+                            reported = True
+                            logger.warning(f"Invalid RTSP stream for {stream_id}")
+                            await self.update_stream_status(stream_id, 'error', 'Invalid RTSP stream')
                     elif 'error' in log_line.lower() or 'failed' in log_line.lower():
-                        print(f"FFmpeg error [{stream_id}]: {log_line}")
-            
-            # Wait for process to complete
-            return_code = await process.wait()
-            if return_code != 0:
-                print(f"FFmpeg process for {stream_id} ended with error code {return_code}")
-                await self.update_stream_status(stream_id, 'error', f'FFmpeg exited with code {return_code}')
+                        logger.warning(f"FFmpeg error [{stream_id}]: {log_line}")
             
         except Exception as e:
-            print(f"Error monitoring FFmpeg for {stream_id}: {e}")
-            await self.update_stream_status(stream_id, 'error', str(e))
+            logger.error(f"Error monitoring FFmpeg for {stream_id}: {e}")
         
-        finally:
-            # Cleanup
-            await self.stop_stream_processing(stream_id)
+        # Wait for process to complete
+        return_code = await process.wait()
+        if return_code != 0:
+            logger.warning(f"FFmpeg process for {stream_id} ended with error code {return_code}")
+        return return_code
     
-    async def stream_hls_segments(self, stream_id):
-        """Monitor HLS segments and stream them via WebSocket"""
-        if stream_id not in self.active_processes:
+    async def on_progress(self, stream_id, progress):
+        """A progress block arrived: step down a transcode that can't keep up, report to viewers"""
+        process_info = self.active_processes.get(stream_id)
+        if process_info is None or process_info['progress'] is not progress or process_info['planned_restart']:
             return
+        if settings.FFMPEG_AUTO_DOWNGRADE and progress.is_behind(settings.FFMPEG_MIN_SPEED):
+            if await self.downgrade_lagging(stream_id, progress):
+                return
         
+        now = time.monotonic()
+        if now - process_info['progress_reported_at'] < settings.FFMPEG_PROGRESS_REPORT_INTERVAL:
+            return
+        process_info['progress_reported_at'] = now
+        stats = progress.to_dict()
+        if stats['speed'] is not None:
+            message = f"Transcoding at {stats['speed']:.2f}x, {stats['fps']:.1f} fps"
+            await self.update_stream_status(stream_id, 'active', message, progress=stats)
+
+    async def downgrade_lagging(self, stream_id, progress):
+        """Move a transcode that fell behind real time to the next cheaper profile.
+
+        ABR ladders, mosaics and passthrough have nothing to step down to
+        without changing the stream's layout, so they are only reported.
+        """
         process_info = self.active_processes[stream_id]
-        temp_dir = process_info['temp_dir']
+        profile = process_info['profile']
+        cheaper = None if process_info['renditions'] or profile.is_passthrough else cheaper_profile(profile)
+        if cheaper is None:
+            if not process_info['lag_warned']:
+                process_info['lag_warned'] = True
+                logger.warning(f"FFmpeg for {stream_id} runs at {progress.speed:.2f}x on '{profile.name}' with no cheaper profile")
+            return False
+        
+        logger.warning(f"FFmpeg for {stream_id} runs at {progress.speed:.2f}x; stepping down from '{profile.name}' to '{cheaper.name}'")
+        await self.switch_profile(stream_id, cheaper)
+        await self.update_stream_status(
+            stream_id, 'active', f"Transcode fell behind ({progress.speed:.2f}x); switched to '{cheaper.name}'",
+            progress=progress.to_dict()
+        )
+        return True
+
+    async def stream_hls_segments(self, stream_id, rendition=None):
+        """Broadcast HLS segments via WebSocket as soon as FFmpeg finalizes them"""
+        if stream_id not in self.active_processes:
+            return
         
-        processed_segments = set()
+        process_info = self.active_processes[stream_id]
+        watcher = self.segment_watcher(stream_id, rendition)
+        process_info['watchers'].append(watcher)
+        logger.info(f"Watching segments for {stream_id} ({rendition or 'single'}) using {watcher.backend}")
         
         try:
-            while stream_id in self.active_processes:
-                try:
-                    # Check if directory exists
-                    if not os.path.exists(temp_dir):
-                        await asyncio.sleep(2)
-                        continue
-                    
-                    # Check for new HLS segments
-                    files = os.listdir(temp_dir)
-                    for filename in files:
-                        if filename.endswith('.ts') and filename not in processed_segments:
-                            segment_path = os.path.join(temp_dir, filename)
-                            
-                            # Wait a bit to ensure segment is fully written
-                            await asyncio.sleep(1)
-                            
-                            if os.path.exists(segment_path) and os.path.getsize(segment_path) > 0:
-                                await self.send_hls_segment(stream_id, segment_path)
-                                processed_segments.add(filename)
-                                
-                except FileNotFoundError:
-                    pass
-                except Exception as e:
-                    print(f"Error scanning directory for {stream_id}: {e}")
-                
-                # Wait before checking again
-                await asyncio.sleep(2)
+            async for segment in watcher:
+                if stream_id not in self.active_processes:
+                    break
+                await self.send_hls_segment(stream_id, segment, rendition)
                 
         except Exception as e:
-            print(f"Error streaming HLS segments for {stream_id}: {e}")
+            logger.error(f"Error streaming HLS segments for {stream_id}: {e}")
+        finally:
+            watcher.close()
 
-    async def send_hls_segment(self, stream_id, segment_path):
-        """Send HLS segment"""
+    async def send_hls_segment(self, stream_id, segment, rendition=None):
+        """Publish a finalized HLS segment and broadcast a reference to all viewers"""
+        process_info = self.active_processes.get(stream_id)
+        if process_info is None:
+            return
         try:
-            # Read segment file
-            with open(segment_path, 'rb') as f:
-                segment_data = f.read()
+            ingested = await self.read_hls_file(stream_id, segment.name, rendition)
+            if ingested is None:
+                return
+            segment_data, finalized_at = ingested.data, ingested.finalized_at
+            
+            now = time.monotonic()
+            previous = process_info['last_segment_at'].get(rendition)
+            if previous is not None:
+                SEGMENT_INTERVAL.observe(now - previous)
+            process_info['last_segment_at'][rendition] = now
             
             # Validate chunk data
             chunk_size = len(segment_data)
             if chunk_size == 0:
                 return
             
-            # Encode as base64
-            segment_b64 = base64.b64encode(segment_data).decode('utf-8')
-            
             # Basic validation - check for MPEG-TS sync byte
             if not segment_data.startswith(b'\x47'):
                 return
             
-            # Broadcast to all users watching this stream
-            await self.channel_layer.group_send(
-                f"stream_{stream_id}",
-                {
-                    'type': 'stream_data',
-                    'stream_id': stream_id,
-                    'chunk': segment_b64,
-                    'timestamp': datetime.now().isoformat(),
-                    'segment_name': os.path.basename(segment_path),
-                    'chunk_size': chunk_size
-                }
-            )
+            # Store once; viewers receive a reference and encode per
+            # delivery mode (binary frame or base64 JSON)
+            segment_key = await segment_store.put(stream_id, segment.sequence, segment_data, rendition)
+            await self.publish_playlists(stream_id, rendition)
+            event = {
+                'type': 'stream_data',
+                'stream_id': stream_id,
+                'rendition': rendition,
+                'segment_key': segment_key,
+                'sequence': segment.sequence,
+                'timestamp': time.time(),
+                'segment_name': segment.name,
+                'chunk_size': chunk_size
+            }
+            segment_ring.add(event, segment_data)
+            archive.append(stream_id, rendition, segment.sequence, segment.duration, segment_data, finalized_at)
+            start = time.perf_counter()
+            await self.channel_layer.group_send(f"stream_{stream_id}", event)
+            GROUP_SEND_DURATION.observe(time.perf_counter() - start)
+            SEGMENT_BROADCAST_LATENCY.observe(time.time() - finalized_at)
+            process_info['bytes_broadcast'].inc(chunk_size)
                 
         except Exception as e:
-            print(f"Error sending HLS segment for {stream_id}: {e}")
+            logger.error(f"Error sending HLS segment for {stream_id}: {e}")
+
+    async def publish_playlists(self, stream_id, rendition=None):
+        """Mirror the local playlists into Redis for workers that don't own the stream"""
+        playlist = await self.read_hls_file(stream_id, 'playlist.m3u8', rendition)
+        if playlist is None:
+            return
+        await segment_store.put_playlists(stream_id, {'playlist.m3u8': playlist.data.decode()}, rendition)
+        if rendition is not None:
+            master = await self.read_hls_file(stream_id, 'master.m3u8')
+            if master is not None:
+                await segment_store.put_playlists(stream_id, {'master.m3u8': master.data.decode()})
+
+    async def stream_ll_parts(self, stream_id, process):
+        """Package one FFmpeg run's fMP4 output into LL-HLS parts and push each one to viewers"""
+        process_info = self.active_processes.get(stream_id)
+        if process_info is None:
+            return
+        
+        reader = process.stdout
+        packager = process_info['packager']
+        header = b''
+        initialized = False
+        moof = None
+        try:
+            while True:
+                box = await read_box(reader)
+                if box is None:
+                    break
+                box_type, data = box
+                if box_type == b'moov':
+                    packager.set_init(header + data)
+                    initialized = True
+                    await self.channel_layer.group_send(
+                        f"stream_{stream_id}",
+                        {'type': 'stream_init', 'stream_id': stream_id, 'init': packager.init}
+                    )
+                elif box_type == b'moof':
+                    moof = data
+                elif box_type == b'mdat' and moof is not None:
+                    msn, index, part, _ = packager.add_fragment(moof + data)
+                    moof = None
+                    await self.send_ll_part(stream_id, msn, index, part)
+                elif not initialized:
+                    header += data  # ftyp precedes moov in the init segment
+                    
+        except Exception as e:
+            logger.error(f"Error packaging LL-HLS parts for {stream_id}: {e}")
+
+    async def send_ll_part(self, stream_id, msn, index, part):
+        """Publish one LL-HLS part and broadcast a reference to all viewers"""
+        process_info = self.active_processes.get(stream_id)
+        if process_info is None:
+            return
+        try:
+            segment_key = await segment_store.put(stream_id, msn, part.data, part=index)
+            event = {
+                'type': 'stream_part',
+                'stream_id': stream_id,
+                'segment_key': segment_key,
+                'sequence': msn,
+                'part': index,
+                'independent': part.independent,
+                'duration': part.duration,
+                'timestamp': time.time(),
+                'chunk_size': len(part.data)
+            }
+            segment_ring.add(event, part.data)
+            start = time.perf_counter()
+            await self.channel_layer.group_send(f"stream_{stream_id}", event)
+            GROUP_SEND_DURATION.observe(time.perf_counter() - start)
+            process_info['bytes_broadcast'].inc(len(part.data))
+        except Exception as e:
+            logger.error(f"Error sending LL-HLS part for {stream_id}: {e}")
+
+    def acquire_stream(self, stream_id):
+        """A viewer joined a running stream; cancel its pending teardown.
+
+        Returns True when this saved a cold start (the stream was idle).
+        """
+        process_info = self.active_processes.get(stream_id)
+        if process_info is None:
+            return False
+        
+        linger_task = process_info['linger_task']
+        stream = stream_manager.get_stream(stream_id)
+        idle = linger_task is not None or (stream is not None and len(stream.viewers) <= 1)
+        if linger_task is not None:
+            linger_task.cancel()
+            process_info['linger_task'] = None
+            logger.info(f"Viewer rejoined {stream_id} during linger; teardown cancelled")
+        if idle:
+            self.warm_hits += 1
+        return idle
+
+    async def release_stream(self, stream_id):
+        """The last viewer left: keep FFmpeg and its HLS window warm for the linger period"""
+        process_info = self.active_processes.get(stream_id)
+        if process_info is None and admission.cancel(stream_id):
+            logger.info(f"No viewers left for queued stream {stream_id}; start withdrawn")
+            await cluster.release(stream_id)
+            await self.update_stream_status(stream_id, 'stopped', 'Stream start withdrawn')
+            return
+        if process_info is None or stream_id in self.pinned:
+            return
+        
+        if settings.STREAM_LINGER_SECONDS <= 0:
+            await self.stop_stream_processing(stream_id)
+        elif process_info['linger_task'] is None:
+            process_info['linger_task'] = asyncio.create_task(self._linger(stream_id, process_info))
 
-    async def stop_stream_processing(self, stream_id):
-        """Stop FFmpeg process and cleanup resources"""
+    async def _linger(self, stream_id, process_info):
+        await asyncio.sleep(settings.STREAM_LINGER_SECONDS)
+        if self.active_processes.get(stream_id) is not process_info:
+            return
+        if await cluster.viewer_count(stream_id):
+            process_info['linger_task'] = None
+            return
+        logger.info(f"No viewers for {stream_id} after {settings.STREAM_LINGER_SECONDS}s; stopping")
+        await self.stop_stream_processing(stream_id)
+
+    async def start_pinned_streams(self):
+        """Bring up the streams configured in PINNED_STREAMS; they are never lingered out"""
+        for stream_id, rtsp_url in self.pinned.items():
+            if stream_id in self.active_processes:
+                continue
+            try:
+                if not await cluster.place(stream_id):
+                    continue  # Placed on another transcoder
+                if stream_manager.get_stream(stream_id) is None:
+                    stream_manager.create_stream(rtsp_url, f"Pinned {stream_id[:6]}", None)
+                await self.start_stream_processing(stream_id, rtsp_url, priority=PRIORITY_HIGH)
+            except Exception as e:
+                logger.error(f"Failed to start pinned stream {stream_id}: {e}")
+
+    def pool_stats(self):
+        return {
+            'warm_hits': self.warm_hits,
+            'cold_starts': self.cold_starts,
+            'lingering': sum(1 for info in self.active_processes.values() if info['linger_task'] is not None),
+            'pinned': len(self.pinned),
+        }
+
+    def collect_metrics(self):
+        """Scrape-time samples: per-child FFmpeg CPU (a counter read from /proc) and memory, streams and viewers"""
+        FFMPEG_CPU.clear()
+        FFMPEG_RSS.clear()
+        FFMPEG_SPEED.clear()
+        for stream_id, process_info in self.active_processes.items():
+            process = process_info['process']
+            usage = process_usage(process.pid) if process is not None and process.returncode is None else None
+            if usage is not None:
+                FFMPEG_CPU.labels(stream_id).set(usage[0])
+                FFMPEG_RSS.labels(stream_id).set(usage[1])
+            speed = process_info['progress'].speed
+            if speed is not None:
+                FFMPEG_SPEED.labels(stream_id).set(speed)
+        ACTIVE_STREAMS.set(len(self.active_processes))
+        CONNECTED_VIEWERS.set(len(viewer_outboxes))
+
+    def stream_health(self):
+        """Supervisor view of each stream: running, reconnecting, circuit open or stalled"""
+        now = time.monotonic()
+        health = {}
+        for stream_id, info in self.active_processes.items():
+            process = info['process']
+            # Segments for HLS; LL-HLS has no watcher, but FFmpeg reports progress either way
+            activity = [t for t in (info.get('spawned_at'), info['progress'].updated_at,
+                                    *info['last_segment_at'].values()) if t is not None]
+            idle = now - max(activity) if activity else None
+            if info['breaker'].state == CIRCUIT_OPEN:
+                state = 'circuit_open'
+            elif process is None or process.returncode is not None or info['down_since'] is not None:
+                state = 'reconnecting'
+            elif idle is not None and idle > settings.HEALTH_STALL_SECONDS:
+                state = 'stalled'
+            else:
+                state = 'running'
+            health[stream_id] = {
+                'state': state,
+                'idle_seconds': round(idle, 1) if idle is not None else None,
+                'restarts': info['restarts'],
+                'speed': info['progress'].to_dict()['speed'],
+            }
+        return health
+
+    def progress_stats(self):
+        """Rolling FFmpeg progress of every stream this worker transcodes"""
+        return {
+            stream_id: {'profile': info['profile'].name, **info['progress'].to_dict()}
+            for stream_id, info in self.active_processes.items()
+        }
+
+    async def takeover_stream(self, stream_id):
+        """The hash ring placed this stream here (or its owner died); start transcoding it"""
+        stream = stream_manager.get_stream(stream_id)
+        if stream is None:
+            # Placed from another worker: the registry has what its viewer asked for
+            info = await cluster.get_stream(stream_id) or {}
+            rtsp_url = info.get('url') or self.pinned.get(stream_id)
+            if rtsp_url is None:
+                await cluster.release(stream_id)
+                return
+            stream = stream_manager.create_stream(rtsp_url, info.get('title') or f"Stream {stream_id[:6]}", None,
+                                                  info.get('profile', AUTO), info.get('mode', MODE_HLS))
+        try:
+            await self.start_stream_processing(stream_id, stream.url, stream.profile, stream.mode, PRIORITY_HIGH)
+        except Exception:
+            await cluster.release(stream_id)
+            if not await cluster.viewer_count(stream_id):
+                # Nobody is waiting for it; stop orphan claims from retrying it forever
+                await redis_service.get_redis().hset(f"stream:{stream_id}", 'desired', DESIRED_STOPPED)
+
+    async def stop_stream_processing(self, stream_id, announce=True):
+        """Stop FFmpeg process and cleanup resources.
+
+        ``announce=False`` stops quietly, for a worker that lost the stream to a new owner.
+        """
         if stream_id not in self.active_processes:
             return
         
@@ -232,8 +891,18 @@ class FFmpegProcessor:
             process = process_info['process']
             temp_dir = process_info['temp_dir']
             
+            for task in (process_info['supervisor'], process_info['linger_task']):
+                if task is not None and task is not asyncio.current_task():
+                    task.cancel()
+            
+            # Stop segment notifications before the directory goes away
+            for watcher in process_info['watchers']:
+                watcher.close()
+            if process_info['packager'] is not None:
+                process_info['packager'].close()
+            
             # Terminate FFmpeg process
-            if process.returncode is None:
+            if process is not None and process.returncode is None:
                 process.terminate()
                 try:
                     await asyncio.wait_for(process.wait(), timeout=5.0)
@@ -242,67 +911,145 @@ class FFmpegProcessor:
                     await process.wait()
             
             # Cleanup temporary files
-            import shutil
-            if os.path.exists(temp_dir):
+            if temp_dir and os.path.exists(temp_dir):
                 shutil.rmtree(temp_dir)
+            if process_info['output'] is not None:
+                ingest_server.close(stream_id)
             
             # Remove from active processes
             del self.active_processes[stream_id]
+            admission.release(stream_id)
+            frame_cache.discard(stream_id)
+            segment_ring.discard(stream_id)
+            archive.close(stream_id)
+            await snapshot_cache.discard(stream_id)
+            BYTES_BROADCAST.remove(stream_id)
+            FFMPEG_RESTARTS.remove(stream_id)
             
             # Update status
-            await self.update_stream_status(stream_id, 'stopped', 'Stream processing stopped')
+            if announce:
+                await cluster.release(stream_id)
+                await self.update_stream_status(stream_id, 'stopped', 'Stream processing stopped')
             
-            print(f"Stopped FFmpeg processing for stream {stream_id}")
+            logger.info(f"Stopped FFmpeg processing for stream {stream_id}")
             
         except Exception as e:
-            print(f"Error stopping FFmpeg for {stream_id}: {e}")
+            logger.error(f"Error stopping FFmpeg for {stream_id}: {e}")
     
-    async def update_stream_status(self, stream_id, status, message=None):
-        """Update stream status in Redis and notify clients"""
+    async def update_stream_status(self, stream_id, status, message=None, progress=None):
+        """Update stream status in Redis and notify clients, with FFmpeg progress if given"""
         try:
-            r = redis.from_url(self.redis_url)
-            
             # Update Redis
-            await r.hset(f"stream:{stream_id}", "status", status)
+            fields = {'status': status}
             if message:
-                await r.hset(f"stream:{stream_id}", "last_message", message)
-            
-            await r.close()
+                fields['last_message'] = message
+            if status == 'stopped':
+                fields['desired'] = DESIRED_STOPPED  # Nothing to re-warm after a restart
+            await redis_service.get_redis().hset(f"stream:{stream_id}", mapping=fields)
             
             # Notify all viewers
-            await self.channel_layer.group_send(
-                f"stream_{stream_id}",
-                {
-                    'type': 'stream_status',
-                    'stream_id': stream_id,
-                    'status': status,
-                    'message': message or ''
-                }
-            )
+            event = {
+                'type': 'stream_status',
+                'stream_id': stream_id,
+                'status': status,
+                'message': message or ''
+            }
+            if progress is not None:
+                event['progress'] = progress
+            await self.channel_layer.group_send(f"stream_{stream_id}", event)
             
         except Exception as e:
-            print(f"Error updating stream status for {stream_id}: {e}")
+            logger.error(f"Error updating stream status for {stream_id}: {e}")
     
+    def get_output_dir(self, stream_id, rendition=None):
+        """HLS output directory for a stream (or one of its renditions), or None"""
+        process_info = self.active_processes.get(stream_id)
+        if process_info is None:
+            return None
+        if rendition is None:
+            return process_info['temp_dir']
+        if rendition not in process_info['renditions']:
+            return None
+        return os.path.join(process_info['temp_dir'], rendition)
+
+    def get_ingest_output(self, stream_id):
+        """In-memory HLS output of a stream under HTTP ingest, or None"""
+        process_info = self.active_processes.get(stream_id)
+        return process_info['output'] if process_info else None
+
+    def segment_watcher(self, stream_id, rendition=None):
+        """Watcher reporting a stream's new HLS segments, wherever FFmpeg puts them"""
+        output = self.get_ingest_output(stream_id)
+        if output is not None:
+            return output.watch(rendition)
+        return SegmentWatcher(self.get_output_dir(stream_id, rendition))
+
+    async def read_hls_file(self, stream_id, name, rendition=None):
+        """A playlist or segment of a stream this worker runs, as an IngestedFile, or None"""
+        if rendition is not None and rendition not in self.get_renditions(stream_id):
+            return None
+        output = self.get_ingest_output(stream_id)
+        if output is not None:
+            return output.get(rendition, name)
+        output_dir = self.get_output_dir(stream_id, rendition)
+        if output_dir is None:
+            return None
+        # Segments run to megabytes; read them off the event loop
+        return await asyncio.to_thread(self._read_output_file, os.path.join(output_dir, name))
+
+    @staticmethod
+    def _read_output_file(path):
+        try:
+            with open(path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                # Its mtime is when FFmpeg finalized it
+                return IngestedFile(f.read(), st.st_mtime, file_etag(st))
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+
+    def get_ll_packager(self, stream_id):
+        """In-memory LL-HLS packager of a stream, or None for regular HLS streams"""
+        process_info = self.active_processes.get(stream_id)
+        return process_info['packager'] if process_info else None
+
+    def get_renditions(self, stream_id):
+        """Rendition names of an ABR stream; empty for single-output streams"""
+        process_info = self.active_processes.get(stream_id)
+        return process_info['renditions'] if process_info else []
+
     async def get_stream_info(self, stream_id):
         """Get detailed stream information"""
         if stream_id not in self.active_processes:
             return None
         
         process_info = self.active_processes[stream_id]
+        downtime = process_info['downtime']
+        if process_info['down_since'] is not None:
+            downtime += time.monotonic() - process_info['down_since']
         return {
             'stream_id': stream_id,
             'rtsp_url': process_info['rtsp_url'],
             'started_at': process_info['started_at'].isoformat(),
             'temp_dir': process_info['temp_dir'],
-            'is_running': process_info['process'].returncode is None
+            'ingest': INGEST_HTTP if process_info['output'] is not None else INGEST_DISK if process_info['temp_dir'] else 'pipe',
+            'profile': process_info['profile'].to_dict(),
+            'renditions': process_info['renditions'],
+            'mode': process_info['mode'],
+            'is_running': process_info['process'] is not None and process_info['process'].returncode is None,
+            'restarts': process_info['restarts'],
+            'downtime_seconds': round(downtime, 1),
+            'last_exit_code': process_info['last_exit_code'],
+            'circuit': process_info['breaker'].to_dict(),
+            'progress': process_info['progress'].to_dict(),
+            'pinned': stream_id in self.pinned,
+            'lingering': process_info['linger_task'] is not None
         }
 
-    async def validate_rtsp_url(self, rtsp_url):
-        """Quick validation of RTSP URL accessibility"""
+    async def probe_rtsp_url(self, rtsp_url):
+        """Probe the RTSP stream; returns ffprobe's JSON, or None if probing failed"""
         try:
-            logger.info(f"Validating RTSP URL")
+            logger.info(f"Probing RTSP URL")
             
-            # Quick FFmpeg probe to check if URL is accessible
             probe_cmd = [
                 'ffprobe', '-v', 'quiet', '-print_format', 'json',
                 '-show_streams', '-timeout', '10000000',  # 10 second timeout
@@ -318,22 +1065,23 @@ class FFmpegProcessor:
             
             try:
                 stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=15)
-                
-                if process.returncode == 0:
-                    logger.info(f"RTSP URL validation successful")
-                    return True
-                else:
-                    logger.warning(f"RTSP URL validation failed")
-                    return True  # Let FFmpeg try anyway
-                    
             except asyncio.TimeoutError:
-                logger.warning(f"RTSP URL validation timeout")
+                logger.warning(f"RTSP URL probe timeout")
                 process.kill()
-                return True  # Let FFmpeg try anyway
+                await process.wait()
+                return None  # Let FFmpeg try anyway
+            
+            if process.returncode != 0:
+                logger.warning(f"RTSP URL probe failed")
+                return None  # Let FFmpeg try anyway
+            
+            probe = json.loads(stdout)
+            probe_cache.put(rtsp_url, probe)
+            return probe
             
         except Exception as e:
-            logger.warning(f"RTSP URL validation error: {e}")
-            return True  # Let FFmpeg try anyway
+            logger.warning(f"RTSP URL probe error: {e}")
+            return None  # Let FFmpeg try anyway
         
     async def update_playlist_urls(self, stream_id, playlist_path):
         """Update playlist to use proper HTTP URLs"""
@@ -361,7 +1109,13 @@ class FFmpegProcessor:
                     f.write(updated_content)
                     
         except Exception as e:
-            print(f"Error updating playlist URLs: {e}")
+            logger.error(f"Error updating playlist URLs: {e}")
 
 # Global FFmpeg processor instance
 ffmpeg_processor = FFmpegProcessor()
+
+cluster.pinned = set(ffmpeg_processor.pinned)
+cluster.on_acquired = ffmpeg_processor.takeover_stream
+cluster.on_lost = lambda stream_id: ffmpeg_processor.stop_stream_processing(stream_id, announce=False)
+cluster.on_idle = ffmpeg_processor.release_stream
+registry.add_collector(ffmpeg_processor.collect_metrics)
@@ -1,59 +1,162 @@
 import asyncio
-import redis.asyncio as redis
-import os
+import json
+import logging
+import time
+from django.conf import settings
 from .stream_manager import stream_manager
 from .ffmpeg_processor import ffmpeg_processor
+from .redis_service import redis_service
+from .admission import admission
+from .backpressure import viewer_outboxes
+from .segment_ring import segment_ring
+from .ingest import ingest_server
+from .snapshots import snapshot_cache
+from .archive import archive
+from .cluster import cluster
+
+logger = logging.getLogger(__name__)
+
 
 class HealthService:
-    """Service health monitoring and diagnostics"""
-    
+    """Service health monitoring and diagnostics.
+
+    Probing is done by a background sampler, not per request: FFmpeg's
+    capabilities are checked once, Redis is pinged through the pooled client
+    every HEALTH_SAMPLE_INTERVAL, and stream liveness comes from the
+    supervisor's state. The health and stats endpoints serve the last
+    snapshot, already encoded as JSON.
+    """
+
+    def __init__(self):
+        self.interval = settings.HEALTH_SAMPLE_INTERVAL
+        self.ffmpeg = None  # Cached capability check
+        self.health = {}
+        self.stats = {}
+        self.health_json = b'{}'
+        self.stats_json = b'{}'
+        self.sampled_at = None  # monotonic
+        self._task = None
+        self._sampled = None  # Set once the first snapshot exists
+
+    async def ensure_started(self):
+        """Start the sampler on the running loop and wait for its first snapshot"""
+        if self._task is None or self._task.done():
+            self._sampled = self._sampled or asyncio.Event()
+            self._task = asyncio.create_task(self._sample_loop())
+        await self._sampled.wait()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
     async def check_redis_connection(self):
-        """Test Redis connectivity"""
+        """Ping Redis through the shared pool"""
         try:
-            redis_url = os.environ.get('REDIS_URL', 'redis://redis:6379')
-            r = redis.from_url(redis_url)
-            await r.ping()
-            await r.close()
-            return True, "Redis connection OK"
+            start = time.perf_counter()
+            await asyncio.wait_for(redis_service.get_redis().ping(), timeout=settings.HEALTH_REDIS_TIMEOUT)
+            return True, f"Redis connection OK ({(time.perf_counter() - start) * 1000:.1f} ms)"
         except Exception as e:
-            return False, f"Redis connection failed: {e}"
-    
+            return False, f"Redis connection failed: {e or type(e).__name__}"
+
     async def check_ffmpeg_availability(self):
-        """Test FFmpeg installation"""
+        """FFmpeg version and the encoders our profiles need; run once per process"""
         try:
             process = await asyncio.create_subprocess_exec(
-                'ffmpeg', '-version',
+                'ffmpeg', '-hide_banner', '-encoders',
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE
             )
             stdout, stderr = await process.communicate()
-            if process.returncode == 0:
-                return True, "FFmpeg available"
-            else:
-                return False, f"FFmpeg check failed: {stderr.decode()}"
+            if process.returncode != 0:
+                return {'status': False, 'message': f"FFmpeg check failed: {stderr.decode()}"}
+            encoders = stdout.decode()
+            missing = [name for name in ('libx264', 'aac') if f' {name} ' not in encoders]
+            if missing:
+                return {'status': False, 'message': f"FFmpeg lacks encoders: {', '.join(missing)}"}
+            return {'status': True, 'message': "FFmpeg available"}
         except Exception as e:
-            return False, f"FFmpeg not found: {e}"
-    
-    async def get_system_status(self):
-        """Get comprehensive system status"""
+            return {'status': False, 'message': f"FFmpeg not found: {e}"}
+
+    async def _sample_loop(self):
+        while True:
+            try:
+                await self.sample()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Health sample failed: {e}")
+            finally:
+                self._sampled.set()
+            await asyncio.sleep(self.interval)
+
+    async def sample(self):
+        """Refresh the health and stats snapshots"""
+        if self.ffmpeg is None:
+            self.ffmpeg = await self.check_ffmpeg_availability()
+            if not self.ffmpeg['status']:
+                logger.warning(self.ffmpeg['message'])
         redis_ok, redis_msg = await self.check_redis_connection()
-        ffmpeg_ok, ffmpeg_msg = await self.check_ffmpeg_availability()
-        
-        active_streams = len(stream_manager.streams)
-        active_processes = len(ffmpeg_processor.active_processes)
-        total_viewers = sum(len(s.viewers) for s in stream_manager.streams.values())
-        
-        return {
+
+        streams = ffmpeg_processor.stream_health()
+        ffmpeg_ok = self.ffmpeg['status'] or not cluster.transcoder
+        self.health = {
             'redis': {'status': redis_ok, 'message': redis_msg},
-            'ffmpeg': {'status': ffmpeg_ok, 'message': ffmpeg_msg},
+            'ffmpeg': self.ffmpeg,
             'streams': {
-                'active_streams': active_streams,
-                'active_processes': active_processes,
-                'total_viewers': total_viewers
+                'active_streams': len(stream_manager.streams),
+                'active_processes': len(ffmpeg_processor.active_processes),
+                'total_viewers': sum(len(s.viewers) for s in stream_manager.streams.values()),
+                'unhealthy': sorted(s for s, info in streams.items() if info['state'] != 'running'),
+                'liveness': streams
             },
             'overall_health': redis_ok and ffmpeg_ok
         }
+        self.stats = self.system_stats()
+        self.health_json = json.dumps(self.health).encode()
+        self.stats_json = json.dumps(self.stats).encode()
+        self.sampled_at = time.monotonic()
 
-health_service = HealthService()
+    def system_stats(self):
+        stats = {
+            'streams': {
+                'total': len(stream_manager.streams),
+                'by_status': {}
+            },
+            'processes': {
+                'ffmpeg_active': len(ffmpeg_processor.active_processes),
+                'progress': ffmpeg_processor.progress_stats()
+            },
+            'pool': ffmpeg_processor.pool_stats(),
+            'admission': admission.stats(),
+            'segment_ring': segment_ring.stats(),
+            'ingest': ingest_server.stats(),
+            'snapshots': snapshot_cache.stats(),
+            'archive': archive.stats(),
+            'viewers': {
+                'connected': len(viewer_outboxes),
+                'dropped': sum(outbox.dropped for outbox in viewer_outboxes.values()),
+                'overflows': sum(outbox.overflows for outbox in viewer_outboxes.values())
+            }
+        }
+
+        # Count streams by status
+        for stream in stream_manager.streams.values():
+            status = stream.status
+            stats['streams']['by_status'][status] = stats['streams']['by_status'].get(status, 0) + 1
+        return stats
+
+    @property
+    def age(self):
+        """Seconds since the last snapshot, or None before the first"""
+        return None if self.sampled_at is None else time.monotonic() - self.sampled_at
 
+    def is_live(self):
+        """The event loop still runs the sampler on schedule"""
+        return self.age is not None and self.age < self.interval * 3
 
+    def is_ready(self):
+        """This worker can take viewers: Redis answers and, on transcoders, FFmpeg works"""
+        return self.is_live() and self.health.get('overall_health', False)
+
+health_service = HealthService()
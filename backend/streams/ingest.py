@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import unquote, urlsplit
+from django.conf import settings
+from .segment_watcher import SegmentWatcher
+
+logger = logging.getLogger(__name__)
+
+INGEST_DISK = 'disk'
+INGEST_HTTP = 'http'
+INGEST_MODES = (INGEST_DISK, INGEST_HTTP)
+
+# Largest upload accepted; a segment of a high-bitrate camera is a few MB
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+MAX_HEADER_LINES = 64
+
+_REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large'}
+
+
+class IngestedFile(NamedTuple):
+    """A playlist or segment as FFmpeg uploaded it"""
+    data: bytes
+    finalized_at: float  # epoch seconds the upload completed
+    etag: str
+
+
+def file_etag(st) -> str:
+    """ETag of a file on disk from its stat result"""
+    return f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+class MemoryOutput:
+    """One stream's HLS output held in memory: playlists and segments per rendition.
+
+    FFmpeg deletes segments that leave the window with DELETE requests;
+    each rendition also keeps at most ``keep`` segments in case it doesn't.
+    """
+
+    def __init__(self, stream_id: str, keep: int):
+        self.stream_id = stream_id
+        self.keep = keep
+        self._files: Dict[Optional[str], 'OrderedDict[str, IngestedFile]'] = {}
+        self._watchers: Dict[Optional[str], List['MemoryWatcher']] = {}
+        self._uploads = 0
+        self.bytes = 0
+
+    def put(self, rendition: Optional[str], name: str, data: bytes):
+        files = self._files.setdefault(rendition, OrderedDict())
+        self.delete(rendition, name)
+        self._uploads += 1
+        files[name] = IngestedFile(data, time.time(), f'"{self.stream_id}-{self._uploads:x}-{len(data):x}"')
+        self.bytes += len(data)
+        if name.endswith('.m3u8'):
+            for watcher in self._watchers.get(rendition, ()):
+                watcher.notify()
+            return
+        segments = [n for n in files if not n.endswith('.m3u8')]
+        for stale in segments[:-self.keep]:
+            self.delete(rendition, stale)
+
+    def get(self, rendition: Optional[str], name: str) -> Optional[IngestedFile]:
+        return self._files.get(rendition, {}).get(name)
+
+    def delete(self, rendition: Optional[str], name: str) -> bool:
+        removed = self._files.get(rendition, {}).pop(name, None)
+        if removed is None:
+            return False
+        self.bytes -= len(removed.data)
+        return True
+
+    def watch(self, rendition: Optional[str] = None) -> 'MemoryWatcher':
+        watcher = MemoryWatcher(self, rendition)
+        self._watchers.setdefault(rendition, []).append(watcher)
+        return watcher
+
+    def close(self):
+        for watchers in self._watchers.values():
+            for watcher in watchers:
+                watcher.close()
+        self._watchers.clear()
+        self._files.clear()
+        self.bytes = 0
+
+
+class MemoryWatcher(SegmentWatcher):
+    """SegmentWatcher over a MemoryOutput, woken by each playlist upload"""
+
+    def __init__(self, output: MemoryOutput, rendition: Optional[str] = None):
+        self.output = output
+        self.rendition = rendition
+        super().__init__('', backend='manual')
+        self.backend = 'memory'
+
+    def _read_playlist(self) -> Optional[str]:
+        playlist = self.output.get(self.rendition, self.playlist_name)
+        return playlist.data.decode() if playlist is not None else None
+
+
+class IngestError(Exception):
+    def __init__(self, status: int):
+        super().__init__(_REASONS.get(status, ''))
+        self.status = status
+
+
+class IngestServer:
+    """Loopback HTTP endpoint that FFmpeg's HLS muxer uploads to (-method PUT).
+
+    Segments and playlists land in per-stream MemoryOutputs instead of a
+    temp directory, so the broadcaster and the HLS views share the bytes
+    FFmpeg sent without a file round trip. Paths carry a per-process token
+    so nothing else on the host can write into a stream.
+    """
+
+    def __init__(self):
+        self.host = settings.HLS_INGEST_HOST
+        self.port = settings.HLS_INGEST_PORT
+        self.token = secrets.token_urlsafe(16)
+        self.outputs: Dict[str, MemoryOutput] = {}
+        self.uploads = 0
+        self.bytes_received = 0
+        self._server = None
+        self._starting = None
+
+    async def ensure_started(self):
+        if self._starting is None:
+            self._starting = asyncio.create_task(self._start())
+        try:
+            await self._starting
+        except Exception:
+            self._starting = None
+            raise
+
+    async def _start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"HLS ingest listening on {self.host}:{self.port}")
+
+    def url(self, stream_id: str) -> str:
+        """Output root FFmpeg uploads a stream's playlists and segments under"""
+        return f"http://{self.host}:{self.port}/{self.token}/{stream_id}"
+
+    def open(self, stream_id: str) -> MemoryOutput:
+        output = self.outputs.get(stream_id)
+        if output is None:
+            output = self.outputs[stream_id] = MemoryOutput(stream_id, keep=settings.HLS_LIST_SIZE + 2)
+        return output
+
+    def close(self, stream_id: str):
+        output = self.outputs.pop(stream_id, None)
+        if output is not None:
+            output.close()
+
+    def stats(self) -> dict:
+        return {
+            'streams': len(self.outputs),
+            'uploads': self.uploads,
+            'bytes_received': self.bytes_received,
+            'bytes_held': sum(output.bytes for output in self.outputs.values())
+        }
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """One FFmpeg connection; -http_persistent keeps it open across requests"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split(' ', 2)
+                headers = await self._read_headers(reader)
+                keep_alive = version.strip() == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                if headers.get('expect', '').lower() == '100-continue':
+                    writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+                try:
+                    status, body = await self._handle(method, target, headers, reader)
+                except IngestError as e:
+                    status, body, keep_alive = e.status, b'', False
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # FFmpeg exited mid-request, or sent something we don't speak
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_headers(reader) -> Dict[str, str]:
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                return headers
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        raise ValueError("Too many headers")
+
+    @staticmethod
+    async def _read_body(reader, headers) -> bytes:
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks, size = [], 0
+            while True:
+                chunk_size = int((await reader.readline()).split(b';', 1)[0], 16)
+                if chunk_size == 0:
+                    await IngestServer._read_headers(reader)  # Trailers
+                    return b''.join(chunks)
+                size += chunk_size
+                if size > MAX_UPLOAD_BYTES:
+                    raise IngestError(413)
+                chunks.append(await reader.readexactly(chunk_size))
+                await reader.readline()
+        length = int(headers.get('content-length', 0))
+        if length > MAX_UPLOAD_BYTES:
+            raise IngestError(413)
+        return await reader.readexactly(length)
+
+    async def _handle(self, method, target, headers, reader):
+        parts = unquote(urlsplit(target).path).split('/')[1:]
+        if len(parts) not in (3, 4) or not secrets.compare_digest(parts[0], self.token):
+            raise IngestError(404)
+        stream_id, name = parts[1], parts[-1]
+        rendition = parts[2] if len(parts) == 4 else None
+        output = self.outputs.get(stream_id)
+
+        if method in ('PUT', 'POST'):
+            data = await self._read_body(reader, headers)
+            if output is None:
+                return 404, b''  # Stream stopped; FFmpeg is about to be terminated
+            output.put(rendition, name, data)
+            self.uploads += 1
+            self.bytes_received += len(data)
+            return 201, b''
+        if method == 'DELETE':
+            return (200 if output is not None and output.delete(rendition, name) else 404), b''
+        if method == 'GET':
+            # append_list reads the playlist back when FFmpeg restarts
+            found = output.get(rendition, name) if output is not None else None
+            return (200, found.data) if found is not None else (404, b'')
+        raise IngestError(405)
+
+
+ingest_server = IngestServer()
@@ -0,0 +1,42 @@
+from .redis_service import redis_service
+from .ffmpeg_processor import ffmpeg_processor
+from .cluster import cluster
+from .health_service import health_service
+from .archive import archive
+
+
+class LifespanApp:
+    """ASGI lifespan handler: restores the stream registry and brings up
+    pinned streams, the health sampler and recording retention on startup, and releases
+    process-wide resources (including cluster leases) on shutdown.
+
+    Servers that implement the lifespan protocol (uvicorn, hypercorn) call
+    this; Daphne does not, so the registry restore and pinned streams also
+    run on the first WebSocket connection and the pooled connections simply
+    close with the process.
+    """
+
+    async def __call__(self, scope, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await cluster.restore_once()
+                except Exception:
+                    pass  # Logged; the first WebSocket connection retries
+                await ffmpeg_processor.start_pinned_streams()
+                await health_service.ensure_started()
+                archive.ensure_started()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                try:
+                    # Hand leases back so other workers take over without waiting for expiry
+                    health_service.stop()
+                    archive.stop()
+                    await cluster.stop()
+                    await redis_service.close()
+                except Exception as e:
+                    await send({'type': 'lifespan.shutdown.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import math
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Optional
+from django.conf import settings
+from .cmaf import parse_fragment, parse_init_segment
+
+MODE_HLS = 'hls'
+MODE_LL_HLS = 'll-hls'
+MODES = (MODE_HLS, MODE_LL_HLS)
+
+INIT_NAME = re.compile(r'^init(?:_(\d+))?\.mp4$')
+PART_NAME = re.compile(r'^part_(\d+)_(\d+)\.m4s$')
+SEGMENT_NAME = re.compile(r'^segment_(\d+)\.m4s$')
+
+
+def init_name(generation: int) -> str:
+    return f'init_{generation}.mp4'
+
+
+def part_name(msn: int, index: int) -> str:
+    return f'part_{msn}_{index}.m4s'
+
+
+def segment_name(msn: int) -> str:
+    return f'segment_{msn}.m4s'
+
+
+@dataclass
+class Part:
+    data: bytes
+    start: float      # media time, seconds
+    duration: float
+    independent: bool
+
+
+@dataclass
+class LLSegment:
+    msn: int
+    generation: int = 0  # which init segment (FFmpeg run) the media belongs to
+    discontinuity: bool = False
+    parts: List[Part] = field(default_factory=list)
+    complete: bool = False
+    data: Optional[bytes] = None
+
+    @property
+    def duration(self) -> float:
+        return sum(p.duration for p in self.parts)
+
+
+class LowLatencyPackager:
+    """Turns FFmpeg's fragmented MP4 into LL-HLS segments and parts, in memory.
+
+    Every moof+mdat pair FFmpeg emits is one EXT-X-PART; a segment closes at
+    the first independent part once it has reached the target duration.
+    Waiters (blocking playlist reloads, preload-hinted parts) are woken on
+    each new part. A new init segment (FFmpeg restarted) starts a new
+    segment behind EXT-X-DISCONTINUITY with its own EXT-X-MAP.
+    """
+
+    def __init__(self, stream_id: str, part_target: Optional[float] = None,
+                 segment_target: Optional[float] = None, window: Optional[int] = None):
+        self.stream_id = stream_id
+        self.part_target = part_target or settings.LL_HLS_PART_DURATION
+        self.segment_target = segment_target or settings.HLS_SEGMENT_DURATION
+        self.window = window or settings.HLS_LIST_SIZE
+        self.inits = {}  # generation: (data, etag)
+        self.generation = -1
+        self.tracks = {}
+        self.segments = deque()
+        self.discontinuity_sequence = 0
+        # Epoch numbering, like the MPEG-TS pipeline, so names never repeat across restarts
+        self.next_msn = int(time.time())
+        self.target_duration = math.ceil(self.segment_target)
+        self.closed = False
+        self._updated = asyncio.Event()
+
+    @property
+    def init(self) -> Optional[bytes]:
+        """Init segment of the current FFmpeg run"""
+        return self.inits[self.generation][0] if self.generation >= 0 else None
+
+    def get_init(self, generation: Optional[int] = None):
+        """(data, etag) of an init segment still referenced by the window"""
+        return self.inits.get(self.generation if generation is None else generation)
+
+    def set_init(self, data: bytes):
+        self.tracks = parse_init_segment(data)
+        self.generation += 1
+        self.inits[self.generation] = (data, f'"{hashlib.md5(data).hexdigest()}"')
+        if self.segments and not self.segments[-1].complete:
+            self._complete(self.segments[-1])
+        self._notify()
+
+    def add_fragment(self, data: bytes):
+        """Append one moof+mdat; returns (msn, part_index, part, completed_segment)"""
+        info = parse_fragment(data, self.tracks)
+        part = Part(data, info.start, info.duration, info.independent)
+
+        completed = None
+        current = self.segments[-1] if self.segments else None
+        if current is None or current.complete or (
+            part.independent and current.duration >= self.segment_target - self.part_target / 2
+        ):
+            if current is not None and not current.complete:
+                completed = self._complete(current)
+            discontinuity = current is not None and current.generation != self.generation
+            current = LLSegment(self.next_msn, self.generation, discontinuity)
+            self.next_msn += 1
+            self.segments.append(current)
+
+        current.parts.append(part)
+        while len(self.segments) > self.window + 1:
+            dropped = self.segments.popleft()
+            if self.segments[0].discontinuity:
+                self.discontinuity_sequence += 1
+            if dropped.generation != self.segments[0].generation:
+                self.inits.pop(dropped.generation, None)
+        self._notify()
+        return current.msn, len(current.parts) - 1, part, completed
+
+    def _complete(self, segment: LLSegment) -> LLSegment:
+        segment.complete = True
+        segment.data = b''.join(p.data for p in segment.parts)
+        # Target duration may only grow; cameras with long GOPs yield long segments
+        self.target_duration = max(self.target_duration, math.ceil(segment.duration))
+        return segment
+
+    def close(self):
+        self.closed = True
+        self._notify()
+
+    def _notify(self):
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    # Lookup
+
+    def _find(self, msn: int) -> Optional[LLSegment]:
+        if not self.segments:
+            return None
+        index = msn - self.segments[0].msn
+        if 0 <= index < len(self.segments):
+            return self.segments[index]
+        return None
+
+    def get_segment(self, msn: int) -> Optional[bytes]:
+        segment = self._find(msn)
+        return segment.data if segment and segment.complete else None
+
+    def get_part(self, msn: int, index: int) -> Optional[bytes]:
+        segment = self._find(msn)
+        if segment and index < len(segment.parts):
+            return segment.parts[index].data
+        return None
+
+    @property
+    def last_msn(self) -> Optional[int]:
+        return self.segments[-1].msn if self.segments else None
+
+    def is_available(self, msn: int, part: Optional[int] = None) -> bool:
+        """True once the playlist would contain segment msn (or its given part)"""
+        if not self.segments:
+            return False
+        last = self.segments[-1]
+        if msn < last.msn:
+            return True
+        if msn > last.msn:
+            return False
+        if part is None:
+            return last.complete
+        return part < len(last.parts)
+
+    async def wait_until(self, msn: int, part: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """Block until is_available(msn, part); False on timeout or shutdown"""
+        return await self._wait(lambda: self.is_available(msn, part), timeout)
+
+    async def wait_for_init(self, timeout: Optional[float] = None) -> bool:
+        return await self._wait(lambda: self.init is not None, timeout)
+
+    async def _wait(self, predicate, timeout: Optional[float]) -> bool:
+        deadline = time.monotonic() + (timeout if timeout is not None else 3 * self.target_duration)
+        while not predicate():
+            remaining = deadline - time.monotonic()
+            if self.closed or remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._updated.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    # Playlist
+
+    def render_playlist(self) -> str:
+        segments = list(self.segments)
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:9',
+            f'#EXT-X-TARGETDURATION:{self.target_duration}',
+            f'#EXT-X-PART-INF:PART-TARGET={self.part_target:.3f}',
+            f'#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,PART-HOLD-BACK={3 * self.part_target:.3f}',
+            f'#EXT-X-MEDIA-SEQUENCE:{segments[0].msn if segments else self.next_msn}',
+            f'#EXT-X-DISCONTINUITY-SEQUENCE:{self.discontinuity_sequence}',
+        ]
+        # Parts are only advertised near the live edge, as the spec recommends
+        first_with_parts = len(segments) - 3
+        for position, segment in enumerate(segments):
+            if segment.discontinuity and position > 0:
+                lines.append('#EXT-X-DISCONTINUITY')
+            if position == 0 or segment.discontinuity:
+                lines.append(f'#EXT-X-MAP:URI="{init_name(segment.generation)}"')
+            if position >= first_with_parts:
+                for index, part in enumerate(segment.parts):
+                    independent = ',INDEPENDENT=YES' if part.independent else ''
+                    lines.append(
+                        f'#EXT-X-PART:DURATION={part.duration:.3f},'
+                        f'URI="{part_name(segment.msn, index)}"{independent}'
+                    )
+            if segment.complete:
+                lines.append(f'#EXTINF:{segment.duration:.3f},')
+                lines.append(segment_name(segment.msn))
+
+        if segments:
+            last = segments[-1]
+            msn, index = (last.msn + 1, 0) if last.complete else (last.msn, len(last.parts))
+            lines.append(f'#EXT-X-PRELOAD-HINT:TYPE=PART,URI="{part_name(msn, index)}"')
+        return '\n'.join(lines) + '\n'
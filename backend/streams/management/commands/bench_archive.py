@@ -0,0 +1,124 @@
+from django.core.management.base import BaseCommand
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from streams.archive import _ChunkWriter, archive, chunk_name, render_playlist
+
+SEGMENT_SECONDS = 2
+SEGMENT_BYTES = 188 * 4  # The index doesn't care how big segments are
+
+
+class Command(BaseCommand):
+    help = (
+        'Seek and playlist latency of the recording archive with days of footage, '
+        'and how long a retention pass holds up the event loop'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=7, help='Footage to generate')
+        parser.add_argument('--seeks', type=int, default=2000)
+        parser.add_argument('--expire-hours', type=float, default=24, help='Footage the retention pass removes')
+
+    def handle(self, *args, **options):
+        root = archive.root
+        archive.root = tempfile.mkdtemp(prefix='bench_archive_')
+        try:
+            asyncio.run(self.run(options))
+        finally:
+            shutil.rmtree(archive.root, ignore_errors=True)
+            archive.root = root
+
+    async def run(self, options):
+        start = time.perf_counter()
+        start_ms, end_ms = self.generate('bench', options['days'])
+        segments = int((end_ms - start_ms) / 1000 / SEGMENT_SECONDS)
+        self.stdout.write(
+            f"Generated {options['days']:g} days: {segments:,} segments in "
+            f"{len(archive.chunks(archive.track_dir('bench')))} chunks ({time.perf_counter() - start:.1f} s)"
+        )
+
+        timings = []
+        for _ in range(options['seeks']):
+            at_ms = random.randint(start_ms, end_ms - 1)
+            begin = time.perf_counter()
+            segment = archive.locate('bench', None, at_ms)
+            timings.append(time.perf_counter() - begin)
+            assert segment is not None and segment.start_ms <= at_ms < segment.end_ms
+        self.report('seek', timings)
+
+        timings = []
+        for _ in range(20):
+            at_ms = random.randint(start_ms, end_ms - 3600 * 1000)
+            begin = time.perf_counter()
+            render_playlist(archive.segments('bench', None, at_ms, at_ms + 3600 * 1000, 10000), ended=True)
+            timings.append(time.perf_counter() - begin)
+        self.report('1 h playlist', timings)
+
+        # Retention runs in a thread; sample how late the loop wakes meanwhile
+        cutoff_ms = start_ms + int(options['expire_hours'] * 3600 * 1000)
+        lags = []
+        running = True
+
+        async def sample():
+            while running:
+                begin = time.perf_counter()
+                await asyncio.sleep(0.001)
+                lags.append(time.perf_counter() - begin - 0.001)
+
+        sampler = asyncio.create_task(sample())
+        begin = time.perf_counter()
+        removed = 0
+        while True:
+            batch = await asyncio.to_thread(archive._expire, cutoff_ms, 200, set())
+            removed += batch
+            if batch < 200:
+                break
+        elapsed = time.perf_counter() - begin
+        running = False
+        await sampler
+        self.stdout.write(
+            f"Retention removed {removed} chunks in {elapsed * 1000:.0f} ms; "
+            f"event loop lag max={max(lags, default=0) * 1000:.2f} ms p99={self.percentile(lags, 0.99) * 1000:.2f} ms"
+        )
+
+    @staticmethod
+    def generate(stream_id, days):
+        """Write an index of back-to-back segments ending now; returns (start_ms, end_ms)"""
+        count = int(days * 86400 / SEGMENT_SECONDS)
+        end_ms = int(time.time() * 1000)
+        start_ms = end_ms - count * SEGMENT_SECONDS * 1000
+        data = b'\x47' + bytes(SEGMENT_BYTES - 1)
+        directory = archive.track_dir(stream_id)
+        writer = None
+        for i in range(count):
+            at_ms = start_ms + i * SEGMENT_SECONDS * 1000
+            if writer is None or at_ms - writer.chunk >= archive.chunk_seconds * 1000:
+                if writer is not None:
+                    writer.close()
+                writer = _ChunkWriter(directory, at_ms)
+            writer.append(data, at_ms, i * SEGMENT_SECONDS * 90000, SEGMENT_SECONDS * 1000, 0)
+        if writer is not None:
+            writer.close()
+        # The index files were all just written; date them by their footage for retention
+        for chunk in archive.chunks(directory):
+            for extension in ('.idx', '.ts'):
+                path = os.path.join(directory, chunk_name(chunk, extension))
+                os.utime(path, (chunk / 1000 + archive.chunk_seconds,) * 2)
+        return start_ms, end_ms
+
+    def report(self, name, timings):
+        self.stdout.write(
+            f"{name:13s} median={statistics.median(timings) * 1e6:.0f} us "
+            f"p99={self.percentile(timings, 0.99) * 1e6:.0f} us max={max(timings) * 1e6:.0f} us"
+        )
+
+    @staticmethod
+    def percentile(values, q):
+        if not values:
+            return 0.0
+        values = sorted(values)
+        return values[min(int(len(values) * q), len(values) - 1)]
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand
+import asyncio
+import statistics
+import time
+from streams.backpressure import SLOW_DISCONNECT, SLOW_DOWNGRADE, ViewerOutbox
+
+
+class FakeViewer:
+    """A WebSocket client whose link drains at a fixed bandwidth"""
+
+    def __init__(self, bandwidth):
+        self.bandwidth = bandwidth  # bits per second
+        self.latencies = []
+        self.downgraded = False
+        self.disconnected_at = None
+        self.outbox = None
+
+    async def send(self, event):
+        await asyncio.sleep(event['chunk_size'] * 8 / self.bandwidth)
+        self.latencies.append(time.monotonic() - event['timestamp'])
+
+
+class Command(BaseCommand):
+    help = 'Load-test the per-viewer send queue with throttled fake clients sharing one stream'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--viewers', type=int, default=20)
+        parser.add_argument('--slow', type=int, default=2, help='How many of the viewers are slow')
+        parser.add_argument('--bandwidth', type=float, default=50, help='Fast viewer link, Mbit/s')
+        parser.add_argument('--slow-bandwidth', type=float, default=1, help='Slow viewer link, Mbit/s')
+        parser.add_argument('--segment-kb', type=int, default=250)
+        parser.add_argument('--interval', type=float, default=0.5, help='Seconds between segments')
+        parser.add_argument('--duration', type=float, default=20)
+        parser.add_argument('--depth', type=int, default=None, help='Queue depth (default VIEWER_QUEUE_DEPTH)')
+
+    def handle(self, *args, **options):
+        for label, depth in (('unbounded', 10 ** 9), ('bounded', options['depth'])):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{label} queue"))
+            asyncio.run(self.run(options, depth))
+
+    async def run(self, options, depth):
+        viewers = []
+        for i in range(options['viewers']):
+            slow = i < options['slow']
+            viewer = FakeViewer((options['slow_bandwidth'] if slow else options['bandwidth']) * 1e6)
+            viewer.outbox = ViewerOutbox(viewer.send, depth)
+            viewers.append(viewer)
+
+        chunk_size = options['segment_kb'] * 1024
+        handler_times = []
+        start = time.monotonic()
+        sequence = 0
+        while time.monotonic() - start < options['duration']:
+            event = {'type': 'stream_data', 'stream_id': 'bench', 'sequence': sequence,
+                     'timestamp': time.monotonic(), 'chunk_size': chunk_size}
+            for viewer in viewers:
+                if viewer.disconnected_at is not None:
+                    continue
+                # What the consumer's channel-layer handler does per broadcast
+                put_start = time.perf_counter()
+                action = viewer.outbox.put(event)
+                handler_times.append(time.perf_counter() - put_start)
+                if action == SLOW_DOWNGRADE:
+                    viewer.downgraded = True
+                elif action == SLOW_DISCONNECT:
+                    viewer.disconnected_at = time.monotonic() - start
+                    viewer.outbox.close()
+            sequence += 1
+            await asyncio.sleep(options['interval'])
+
+        for viewer in viewers:
+            viewer.outbox.close()
+
+        self.stdout.write(f"handler time per broadcast: max={max(handler_times) * 1e6:.0f}us")
+        self.report('fast', viewers[options['slow']:], chunk_size)
+        self.report('slow', viewers[:options['slow']], chunk_size)
+
+    def report(self, label, viewers, chunk_size):
+        if not viewers:
+            return
+        latencies = sorted(l for v in viewers for l in v.latencies)
+        p50 = statistics.median(latencies) if latencies else 0
+        p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+        peak_depth = max(v.outbox.max_depth for v in viewers)
+        dropped = sum(v.outbox.dropped for v in viewers)
+        disconnected = [v.disconnected_at for v in viewers if v.disconnected_at is not None]
+        self.stdout.write(
+            f"{label:5s} x{len(viewers):<3d} latency p50={p50:.2f}s p99={p99:.2f}s "
+            f"peak queue={peak_depth} ({peak_depth * chunk_size / 1e6:.1f} MB if copied) "
+            f"dropped={dropped} downgraded={sum(v.downgraded for v in viewers)} "
+            f"disconnected={len(disconnected)}"
+            + (f" (after {min(disconnected):.1f}s)" if disconnected else '')
+        )
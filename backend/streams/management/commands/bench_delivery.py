@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand
+import base64
+import json
+import os
+import time
+from datetime import datetime
+import msgpack
+from streams.protocol import DELIVERY_BINARY, DELIVERY_JSON, FrameCache
+
+
+class Command(BaseCommand):
+    help = 'Compare bytes per segment and CPU per viewer for JSON vs binary segment delivery'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segment-kb', type=int, default=150, help='Segment size (2 s at ~600 kbit/s is ~150 KB)')
+        parser.add_argument('--viewers', type=int, default=50)
+        parser.add_argument('--segments', type=int, default=20)
+
+    def handle(self, *args, **options):
+        segment = b'\x47' + os.urandom(options['segment_kb'] * 1024 - 1)
+        viewers = options['viewers']
+        segments = options['segments']
+        stream_id = 'a1b2c3d4e5f6'
+
+        # Previous path: base64 once in the producer, json.dumps per viewer
+        legacy_event = {
+            'type': 'stream_data',
+            'stream_id': stream_id,
+            'chunk': base64.b64encode(segment).decode('utf-8'),
+            'timestamp': datetime.now().isoformat(),
+            'segment_name': 'segment_000.ts',
+            'chunk_size': len(segment)
+        }
+        event = {
+            'type': 'stream_data',
+            'stream_id': stream_id,
+            'segment_key': f'segment:{stream_id}:0',
+            'sequence': 0,
+            'timestamp': time.time(),
+            'segment_name': 'segment_000.ts',
+            'chunk_size': len(segment)
+        }
+
+        start = time.process_time()
+        for _ in range(segments):
+            legacy_event['chunk'] = base64.b64encode(segment).decode('utf-8')
+            for _ in range(viewers):
+                legacy_frame = json.dumps({k: legacy_event[k] for k in (
+                    'type', 'stream_id', 'chunk', 'timestamp', 'segment_name', 'chunk_size')})
+        legacy_cpu = time.process_time() - start
+
+        # Redis holds one channel message per viewer, plus (new path) one shared segment key
+        results = [('legacy json', len(msgpack.packb(legacy_event)), 0, len(legacy_frame.encode()), legacy_cpu)]
+        for mode in (DELIVERY_JSON, DELIVERY_BINARY):
+            cache = FrameCache()
+            start = time.process_time()
+            for sequence in range(segments):
+                event['sequence'] = sequence
+                for _ in range(viewers):
+                    frame = cache.get(event, mode)
+                    if frame is None:
+                        frame = cache.encode(event, mode, segment)
+            cpu = time.process_time() - start
+            wire = len(frame) if isinstance(frame, bytes) else len(frame.encode())
+            results.append((mode, len(msgpack.packb(event)), len(segment), wire, cpu))
+
+        self.stdout.write(f"segment={len(segment)} bytes viewers={viewers} segments={segments}")
+        for name, layer_bytes, store_bytes, wire_bytes, cpu in results:
+            per_viewer_us = cpu / (segments * viewers) * 1e6
+            redis_bytes = layer_bytes * viewers + store_bytes
+            self.stdout.write(
+                f"{name:12s} channel-layer={layer_bytes} B  redis/segment={redis_bytes} B  wire={wire_bytes} B "
+                f"({wire_bytes / len(segment):.3f}x)  cpu/viewer/segment={per_viewer_us:.1f}us"
+            )
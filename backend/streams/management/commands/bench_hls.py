@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from streams.ffmpeg_processor import ffmpeg_processor
+
+
+class Command(BaseCommand):
+    help = 'Benchmark HLS segment GETs per second through the ASGI handler'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--streams', type=int, nargs='+', default=[1, 100, 500])
+        parser.add_argument('--segment-kb', type=int, default=150)
+        parser.add_argument('--concurrency', type=int, default=32)
+
+    def handle(self, *args, **options):
+        for stream_count in options['streams']:
+            asyncio.run(self.run(stream_count, options))
+
+    async def run(self, stream_count, options):
+        root = tempfile.mkdtemp(prefix='bench_hls_')
+        payload = b'\x47' * (options['segment_kb'] * 1024)
+        stream_ids = [f"{i:012x}" for i in range(stream_count)]
+        for stream_id in stream_ids:
+            temp_dir = os.path.join(root, stream_id)
+            os.mkdir(temp_dir)
+            with open(os.path.join(temp_dir, 'segment_001.ts'), 'wb') as f:
+                f.write(payload)
+            # Just what the HLS views read of a disk-ingest stream
+            ffmpeg_processor.active_processes[stream_id] = {
+                'temp_dir': temp_dir, 'renditions': [], 'packager': None, 'output': None
+            }
+
+        client = AsyncClient()
+        target = stream_ids[-1]
+        url = f'/api/hls/{target}/segment_001.ts'
+        per_worker = options['requests'] // options['concurrency']
+
+        async def worker():
+            for _ in range(per_worker):
+                response = await client.get(url)
+                async for _ in response:
+                    pass
+                assert response.status_code == 200
+
+        try:
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+            elapsed = time.perf_counter() - start
+            response = await client.get(url)
+            response.close()
+            not_modified = (await client.get(url, headers={'If-None-Match': response['ETag']})).status_code
+        finally:
+            for stream_id in stream_ids:
+                ffmpeg_processor.active_processes.pop(stream_id, None)
+            shutil.rmtree(root)
+
+        total = per_worker * options['concurrency']
+        self.stdout.write(
+            f"streams={stream_count:4d} {total / elapsed:8.1f} GETs/s "
+            f"({elapsed / total * 1e6:.0f} us/request, conditional GET -> {not_modified})"
+        )
@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import shutil
+import time
+from streams.ffmpeg_processor import ffmpeg_processor
+from streams.ingest import INGEST_MODES, ingest_server
+from streams.testsource import FakeRTSPServer
+from streams.transcode import PASSTHROUGH
+
+IO_FIELDS = ('rchar', 'wchar', 'syscr', 'syscw', 'write_bytes')
+
+
+def read_io(pid='self'):
+    """Counters from /proc/<pid>/io; zeros once the process is gone"""
+    counters = dict.fromkeys(IO_FIELDS, 0)
+    try:
+        with open(f'/proc/{pid}/io') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in counters:
+                    counters[name] = int(value)
+    except OSError:
+        pass
+    return counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare HLS ingest modes under many streams: syscalls, bytes copied through the kernel and '
+        'disk writes of this process and its FFmpeg children, for temp files vs HTTP PUT into memory'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--streams', type=int, default=100)
+        parser.add_argument('--seconds', type=float, default=30, help='Measurement window per mode')
+        parser.add_argument('--port', type=int, default=8554)
+
+    def handle(self, *args, **options):
+        if shutil.which('ffmpeg') is None:
+            raise CommandError("ffmpeg is required for this benchmark")
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        camera = FakeRTSPServer(port=options['port'])
+        await camera.start()
+        await asyncio.sleep(2)  # Let the publisher ANNOUNCE before the first DESCRIBE
+        ingest = settings.HLS_INGEST
+        try:
+            for mode in INGEST_MODES:
+                settings.HLS_INGEST = mode
+                # The relay ignores the path, so every URL is a distinct stream of the same feed
+                urls = [f"rtsp://{camera.host}:{camera.port}/ingest-{mode}-{i}" for i in range(options['streams'])]
+                await self.measure(mode, urls, options['seconds'])
+        finally:
+            settings.HLS_INGEST = ingest
+            await camera.kill()
+
+    async def measure(self, mode, urls, seconds):
+        stream_ids = [f"ingest{mode[0]}{i:05d}" for i in range(len(urls))]
+        try:
+            await asyncio.gather(*(
+                ffmpeg_processor.start_stream_processing(stream_id, url, PASSTHROUGH)
+                for stream_id, url in zip(stream_ids, urls)
+            ))
+            await self.wait_for_segments(stream_ids)
+
+            before = self.snapshot(stream_ids)
+            received = ingest_server.bytes_received
+            start = time.perf_counter()
+            await asyncio.sleep(seconds)
+            elapsed = time.perf_counter() - start
+            after = self.snapshot(stream_ids)
+        finally:
+            for stream_id in stream_ids:
+                await ffmpeg_processor.stop_stream_processing(stream_id, announce=False)
+
+        delta = {name: after[name] - before[name] for name in IO_FIELDS}
+        self.stdout.write(
+            f"{mode:5s} {len(stream_ids)} streams: "
+            f"syscalls/s={(delta['syscr'] + delta['syscw']) / elapsed:,.0f} "
+            f"(read {delta['syscr'] / elapsed:,.0f}, write {delta['syscw'] / elapsed:,.0f}) "
+            f"copied through kernel={(delta['rchar'] + delta['wchar']) / elapsed / 1e6:.1f} MB/s "
+            f"disk writes={delta['write_bytes'] / elapsed / 1e6:.2f} MB/s "
+            f"uploaded={(ingest_server.bytes_received - received) / elapsed / 1e6:.1f} MB/s"
+        )
+
+    @staticmethod
+    def snapshot(stream_ids):
+        """Summed I/O counters of this process and the streams' FFmpeg children"""
+        pids = ['self'] + [
+            ffmpeg_processor.active_processes[s]['process'].pid
+            for s in stream_ids if s in ffmpeg_processor.active_processes
+        ]
+        total = dict.fromkeys(IO_FIELDS, 0)
+        for pid in pids:
+            for name, value in read_io(pid).items():
+                total[name] += value
+        return total
+
+    async def wait_for_segments(self, stream_ids, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if all(
+                ffmpeg_processor.active_processes.get(s, {}).get('last_segment_at') for s in stream_ids
+            ):
+                return
+            await asyncio.sleep(0.5)
+        self.stderr.write("Not every stream produced a segment; measuring anyway")
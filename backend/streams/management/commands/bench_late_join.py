@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import random
+import shutil
+import statistics
+import time
+from channels.testing import WebsocketCommunicator
+from streams.consumers import StreamConsumer
+from streams.ffmpeg_processor import ffmpeg_processor
+from streams.ll_hls import MODE_HLS, MODES
+from streams.segment_ring import segment_ring
+from streams.testsource import FakeRTSPServer
+
+MEDIA_TYPES = ('stream_data', 'stream_part')
+
+
+class Command(BaseCommand):
+    help = (
+        'Time-to-first-frame for viewers joining a running stream, '
+        'with the recent-segment ring and waiting for the next broadcast'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--joins', type=int, default=10, help='Late joiners per scenario')
+        parser.add_argument('--mode', default=MODE_HLS, choices=MODES)
+        parser.add_argument('--port', type=int, default=8554)
+
+    def handle(self, *args, **options):
+        if shutil.which('ffmpeg') is None:
+            raise CommandError("ffmpeg is required for this benchmark")
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        camera = FakeRTSPServer(port=options['port'])
+        await camera.start()
+        await asyncio.sleep(2)  # Let the publisher ANNOUNCE before the first DESCRIBE
+        url = f"rtsp://{camera.host}:{camera.port}/late-join"
+        request = {'action': 'add_stream', 'url': url, 'mode': options['mode']}
+        ring_bytes = segment_ring.max_bytes
+
+        # The first viewer starts FFmpeg and keeps it running throughout
+        first = WebsocketCommunicator(StreamConsumer.as_asgi(), '/ws/stream/')
+        await first.connect()
+        try:
+            await first.receive_json_from()  # connection_established
+            await first.send_json_to(request)
+            stream_id = (await self.receive_reply(first, 'stream_added'))['stream_id']
+            await self.receive_reply(first, *MEDIA_TYPES)
+
+            for scenario, ring in (('ring', True), ('next-broadcast', False)):
+                segment_ring.max_bytes = ring_bytes if ring else 0
+                if not ring:
+                    segment_ring.discard(stream_id)
+                timings = []
+                for _ in range(options['joins']):
+                    # Join at a random point in the segment cycle
+                    await asyncio.sleep(random.uniform(0, settings.HLS_SEGMENT_DURATION))
+                    timings.append(await self.time_to_first_frame(request))
+                    await self.drain(first)
+                timings.sort()
+                self.stdout.write(
+                    f"{scenario:15s} time-to-first-frame median={statistics.median(timings) * 1000:.0f} ms "
+                    f"p95={timings[int(len(timings) * 0.95) - 1] * 1000:.0f} ms max={timings[-1] * 1000:.0f} ms"
+                )
+        finally:
+            segment_ring.max_bytes = ring_bytes
+            await first.disconnect()
+            for stream_id in list(ffmpeg_processor.active_processes):
+                await ffmpeg_processor.stop_stream_processing(stream_id)
+            await camera.kill()
+
+    async def time_to_first_frame(self, request):
+        communicator = WebsocketCommunicator(StreamConsumer.as_asgi(), '/ws/stream/')
+        await communicator.connect()
+        try:
+            await communicator.receive_json_from()  # connection_established
+            start = time.perf_counter()
+            await communicator.send_json_to(request)
+            await self.receive_reply(communicator, *MEDIA_TYPES)
+            return time.perf_counter() - start
+        finally:
+            await communicator.disconnect()
+
+    @staticmethod
+    async def drain(communicator):
+        """Discard what the first viewer was sent so its queue doesn't grow"""
+        while not await communicator.receive_nothing(timeout=0.01):
+            await communicator.receive_from()
+
+    @staticmethod
+    async def receive_reply(communicator, *reply_types):
+        """Next message of one of the given types, skipping everything else"""
+        while True:
+            message = await communicator.receive_json_from(timeout=60)
+            if message['type'] == 'error':
+                raise CommandError(message['message'])
+            if message['type'] in reply_types:
+                return message
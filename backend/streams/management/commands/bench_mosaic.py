@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import resource
+import shutil
+import time
+from streams.ffmpeg_processor import ffmpeg_processor
+from streams.metrics import process_usage
+from streams.mosaic import MAX_MOSAIC_TILES, MosaicLayout
+from streams.segment_ring import segment_ring
+from streams.stream_manager import stream_manager
+from streams.testsource import FakeRTSPServer
+from streams.transcode import PASSTHROUGH
+
+
+class Command(BaseCommand):
+    help = (
+        'A wall of cameras as one server-side mosaic vs one stream per camera: '
+        'egress per viewer, what each viewer has to decode, and FFmpeg CPU on the server'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cameras', type=int, default=16, help=f'At most {MAX_MOSAIC_TILES}')
+        parser.add_argument('--seconds', type=float, default=20, help='Measurement window per run')
+        parser.add_argument('--port', type=int, default=8554)
+
+    def handle(self, *args, **options):
+        if shutil.which('ffmpeg') is None:
+            raise CommandError("ffmpeg is required for this benchmark")
+        if not 2 <= options['cameras'] <= MAX_MOSAIC_TILES:
+            raise CommandError(f"--cameras must be 2-{MAX_MOSAIC_TILES}")
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        camera = FakeRTSPServer(port=options['port'])
+        await camera.start()
+        await asyncio.sleep(2)  # Let the publisher ANNOUNCE before the first DESCRIBE
+        # The relay ignores the path, so every URL is a distinct camera of the same feed
+        urls = [f"rtsp://{camera.host}:{camera.port}/mosaic-{i}" for i in range(options['cameras'])]
+        layout = MosaicLayout(urls)
+        width, height = (int(n) for n in camera.size.split('x'))
+        try:
+            individual = await self.measure({stream_manager.generate_stream_id(url): url for url in urls}, options)
+            mosaic = await self.measure({stream_manager.generate_stream_id(layout.to_url()): layout.to_url()}, options)
+        finally:
+            await camera.kill()
+
+        rows = (
+            ('individual', individual, len(urls), len(urls) * width * height * camera.fps),
+            ('mosaic', mosaic, 1, layout.output.width * layout.output.height * layout.output.fps),
+        )
+        for name, (egress, server_cpu, decode_cpu), decoders, pixel_rate in rows:
+            self.stdout.write(
+                f"{name:10s} per viewer: egress={egress / 1e6:.2f} MB/s, {decoders} decoder(s), "
+                f"{pixel_rate / 1e6:.1f} Mpixel/s, decode CPU={decode_cpu:.2f} s/s; "
+                f"server FFmpeg CPU={server_cpu:.1f}%"
+            )
+        self.stdout.write(
+            f"{len(urls)} cameras as a {layout.columns}x{layout.rows} mosaic: "
+            f"{mosaic[0] / individual[0]:.0%} of the egress, {mosaic[2] / individual[2]:.0%} of the client decode"
+        )
+
+    async def measure(self, streams, options):
+        """(bytes/s one viewer receives, FFmpeg CPU %, client decode CPU seconds per second of video)"""
+        # Cameras are remuxed as they are; a mosaic always re-encodes and ignores the profile
+        await asyncio.gather(*(
+            ffmpeg_processor.start_stream_processing(stream_id, url, PASSTHROUGH)
+            for stream_id, url in streams.items()
+        ))
+        try:
+            await self.wait_for_segments(streams)
+            before_bytes, before_cpu = self.totals(streams)
+            start = time.perf_counter()
+            await asyncio.sleep(options['seconds'])
+            elapsed = time.perf_counter() - start
+            after_bytes, after_cpu = self.totals(streams)
+            decode_cpu = sum([await self.decode_cpu(stream_id) for stream_id in streams])
+        finally:
+            for stream_id in streams:
+                await ffmpeg_processor.stop_stream_processing(stream_id, announce=False)
+        return (after_bytes - before_bytes) / elapsed, (after_cpu - before_cpu) / elapsed * 100, decode_cpu
+
+    @staticmethod
+    async def decode_cpu(stream_id):
+        """CPU seconds a single-threaded decoder spends per second of the stream's recent segments"""
+        segments = segment_ring.window(stream_id)
+        if not segments:
+            return 0.0
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        for _, data in segments:
+            process = await asyncio.create_subprocess_exec(
+                'ffmpeg', '-loglevel', 'error', '-threads', '1', '-i', 'pipe:0', '-an', '-f', 'null', '-',
+                stdin=asyncio.subprocess.PIPE
+            )
+            await process.communicate(data)
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu = after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime
+        return cpu / (len(segments) * settings.HLS_SEGMENT_DURATION)
+
+    @staticmethod
+    def totals(stream_ids):
+        """Bytes broadcast and FFmpeg CPU seconds summed over the streams"""
+        sent, cpu = 0.0, 0.0
+        for stream_id in stream_ids:
+            process_info = ffmpeg_processor.active_processes.get(stream_id)
+            if process_info is None:
+                continue
+            sent += process_info['bytes_broadcast'].value
+            usage = process_usage(process_info['process'].pid)
+            if usage is not None:
+                cpu += usage[0]
+        return sent, cpu
+
+    async def wait_for_segments(self, stream_ids, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if all(
+                ffmpeg_processor.active_processes.get(s, {}).get('last_segment_at') for s in stream_ids
+            ):
+                return
+            await asyncio.sleep(0.5)
+        self.stderr.write("Not every stream produced a segment; measuring anyway")
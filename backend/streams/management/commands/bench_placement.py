@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+import random
+import time
+from streams.placement import WEIGHT_STEP, HashRing
+from streams.stream_manager import stream_manager
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulate stream placement on the weighted hash ring: load balance and how many '
+        'streams move when a node joins, leaves or changes weight (vs modulo hashing)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nodes', type=int, default=8)
+        parser.add_argument('--streams', type=int, nargs='+', default=[1, 10, 50, 100, 250, 500])
+        parser.add_argument('--weighted', action='store_true',
+                            help='Give nodes random CPU headroom (0.5-8 cores) instead of equal weights')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        weights = {}
+        for i in range(options['nodes']):
+            weight = rng.randint(1, int(8 / WEIGHT_STEP)) * WEIGHT_STEP if options['weighted'] else 1.0
+            weights[f"node-{i}"] = weight
+
+        ring = HashRing(weights)
+        self.stdout.write(f"{len(weights)} nodes, weights: {', '.join(f'{w:g}' for w in weights.values())}")
+        self.stdout.write(
+            f"{'streams':>7s} {'peak/fair':>9s} {'join moved':>11s} {'ideal':>6s} {'modulo':>7s} "
+            f"{'leave moved':>11s} {'ideal':>6s} {'reweight moved':>14s} {'lookup':>8s}"
+        )
+        for count in options['streams']:
+            stream_ids = [stream_manager.generate_stream_id(f"rtsp://camera-{i}.local/live") for i in range(count)]
+
+            start = time.perf_counter()
+            placement = {s: ring.node_for(s) for s in stream_ids}
+            lookup = (time.perf_counter() - start) / count
+
+            join_weight = max(weights.values())
+            joined = HashRing({**weights, 'node-new': join_weight})
+            left = HashRing({n: w for n, w in weights.items() if n != 'node-0'})
+            reweighted = HashRing({**weights, 'node-0': weights['node-0'] * 2})
+
+            total = sum(weights.values())
+            self.stdout.write(
+                f"{count:7d} {self.peak_ratio(placement, weights):9.2f} "
+                f"{self.moved(placement, joined):10.1%} {join_weight / (total + join_weight):6.1%} "
+                f"{self.modulo_moved(stream_ids, len(weights)):7.1%} "
+                f"{self.moved(placement, left):10.1%} {weights['node-0'] / total:6.1%} "
+                f"{self.moved(placement, reweighted):13.1%} {lookup * 1e6:6.1f}us"
+            )
+
+    @staticmethod
+    def peak_ratio(placement, weights):
+        """Busiest node's stream count relative to its weighted fair share"""
+        total = sum(weights.values())
+        loads = {}
+        for node in placement.values():
+            loads[node] = loads.get(node, 0) + 1
+        return max(loads[n] / (len(placement) * weights[n] / total) for n in loads)
+
+    @staticmethod
+    def moved(placement, ring):
+        return sum(1 for s, node in placement.items() if ring.node_for(s) != node) / len(placement)
+
+    @staticmethod
+    def modulo_moved(stream_ids, nodes):
+        """Reference: naive hash-mod-N placement when one node joins"""
+        return sum(1 for s in stream_ids if int(s, 16) % nodes != int(s, 16) % (nodes + 1)) / len(stream_ids)
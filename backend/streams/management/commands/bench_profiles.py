@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from streams.transcode import PROFILES
+
+
+class Command(BaseCommand):
+    help = 'Measure FFmpeg CPU per stream for each transcode profile against an H.264/AAC source'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=int, default=20, help='Seconds of real-time input per profile')
+        parser.add_argument('--source-size', default='1920x1080')
+        parser.add_argument('--source-fps', type=int, default=25)
+        parser.add_argument('--profiles', nargs='+', default=list(PROFILES))
+
+    def handle(self, *args, **options):
+        if shutil.which('ffmpeg') is None:
+            raise CommandError("ffmpeg is required for this benchmark")
+
+        work_dir = tempfile.mkdtemp(prefix='bench_profiles_')
+        try:
+            source = self.make_source(work_dir, options)
+            for name in options['profiles']:
+                cores = self.measure(PROFILES[name], source, work_dir, options['duration'])
+                self.stdout.write(f"{name:12s} {cores * 100:6.1f}% of one core per stream")
+        finally:
+            shutil.rmtree(work_dir)
+
+    def make_source(self, work_dir, options):
+        """Camera-like H.264/AAC source, encoded once up front"""
+        source = os.path.join(work_dir, 'camera.ts')
+        subprocess.run([
+            'ffmpeg', '-v', 'error',
+            '-f', 'lavfi', '-i', f"testsrc2=size={options['source_size']}:rate={options['source_fps']}",
+            '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+            '-t', str(options['duration']),
+            '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+            '-g', str(options['source_fps'] * 2),
+            '-c:a', 'aac', '-b:a', '64k',
+            source
+        ], check=True)
+        return source
+
+    def measure(self, profile, source, work_dir, duration):
+        out_dir = tempfile.mkdtemp(dir=work_dir)
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = time.perf_counter()
+        subprocess.run([
+            'ffmpeg', '-v', 'error', '-re', '-i', source,
+            '-f', 'hls', '-hls_time', '2', '-hls_list_size', '3',
+            '-hls_flags', 'delete_segments',
+            '-hls_segment_filename', os.path.join(out_dir, 'segment_%03d.ts'),
+            *profile.codec_args(),
+            os.path.join(out_dir, 'playlist.m3u8')
+        ], check=True)
+        wall = time.perf_counter() - start
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+        return cpu / wall
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+import asyncio
+import time
+from datetime import datetime
+import redis.asyncio as redis
+from streams.models import StreamInfo
+from streams.redis_service import redis_service
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark add/remove stream Redis round trips: per-call connections vs pooled pipelines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options['iterations']))
+
+    async def run(self, iterations):
+        info = StreamInfo(
+            id='bench0000000', url='rtsp://bench/stream', title='Bench',
+            status='active', created_at=datetime.now(), viewers=['bench-user']
+        )
+        channel = 'bench.channel'
+
+        async def legacy_cycle():
+            # One connection per RedisService call, as before pooling
+            for command in (
+                lambda r: r.sadd(f"stream_group:{info.id}", channel),
+                lambda r: r.hset(f"stream:{info.id}", mapping=info.to_dict()),
+            ):
+                r = redis.from_url(redis_service.redis_url)
+                await command(r)
+                await r.close()
+            r = redis.from_url(redis_service.redis_url)
+            await r.hset(f"stream:{info.id}", "status", "active")
+            await r.hset(f"stream:{info.id}", "last_message", "Stream processing started")
+            await r.close()
+            r = redis.from_url(redis_service.redis_url)
+            await r.srem(f"stream_group:{info.id}", channel)
+            await r.close()
+
+        async def pooled_cycle():
+            await redis_service.join_stream(info.id, channel, info)
+            await redis_service.get_redis().hset(
+                f"stream:{info.id}", mapping={'status': 'active', 'last_message': 'Stream processing started'}
+            )
+            await redis_service.leave_streams([info.id], 'bench-user', channel)
+
+        for name, cycle in (('per-call', legacy_cycle), ('pooled', pooled_cycle)):
+            await cycle()  # warm up
+            start = time.perf_counter()
+            for _ in range(iterations):
+                await cycle()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{name:9s} {iterations / elapsed:8.1f} add/remove cycles/s "
+                f"({elapsed / iterations * 1000:.2f} ms per cycle)"
+            )
+
+        await redis_service.get_redis().delete(f"stream:{info.id}", f"stream_group:{info.id}", "user_group:bench-user")
+        await redis_service.close()
@@ -0,0 +1,113 @@
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import shutil
+import statistics
+import time
+from datetime import datetime
+from streams.cluster import STREAMS_KEY, WORKERS_KEY, cluster, owner_key, viewers_key
+from streams.ffmpeg_processor import ffmpeg_processor
+from streams.models import DESIRED_RUNNING, DESIRED_STOPPED, StreamInfo
+from streams.redis_service import redis_service
+from streams.stream_manager import stream_manager
+from streams.testsource import FakeRTSPServer
+from streams.transcode import PASSTHROUGH
+
+# Worker id of the simulated crashed process
+DEAD_WORKER = 'bench-restore-crashed'
+
+
+class Command(BaseCommand):
+    help = (
+        'Time restoring streams after a restart: seed the registry as a crashed worker left it, '
+        'then reconcile, unlink stale entries and pre-warm the streams that had viewers'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--streams', type=int, default=100, help='Streams that had viewers at the crash')
+        parser.add_argument('--stale', type=int, default=100, help='Stopped entries left in the registry')
+        parser.add_argument('--port', type=int, default=8554)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Reconcile and place only; do not start FFmpeg')
+
+    def handle(self, *args, **options):
+        if not options['dry_run'] and shutil.which('ffmpeg') is None:
+            raise CommandError("ffmpeg is required for this benchmark (or use --dry-run)")
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        camera = None
+        if not options['dry_run']:
+            camera = FakeRTSPServer(port=options['port'])
+            await camera.start()
+            await asyncio.sleep(2)  # Let the publisher ANNOUNCE before the first DESCRIBE
+        else:
+            cluster.on_acquired = self.no_start
+        host = f"{camera.host}:{camera.port}" if camera else 'camera.invalid'
+
+        # The relay ignores the path, so every URL is a distinct stream of the same feed
+        warm = await self.seed([f"rtsp://{host}/restore-{i}" for i in range(options['streams'])], DESIRED_RUNNING)
+        stale = await self.seed([f"rtsp://{host}/stale-{i}" for i in range(options['stale'])], DESIRED_STOPPED)
+        try:
+            start = time.perf_counter()
+            summary = await cluster.restore()
+            self.stdout.write(
+                f"reconcile: {summary['seconds'] * 1000:.0f} ms, restored={summary['restored']} "
+                f"placed elsewhere={summary['placed_elsewhere']} unlinked={summary['unlinked']}/{len(stale)}"
+            )
+            if not options['dry_run']:
+                await self.wait_for_segments(warm, start)
+        finally:
+            for stream_id in list(ffmpeg_processor.active_processes):
+                await ffmpeg_processor.stop_stream_processing(stream_id)
+            await cluster.stop()
+            await self.cleanup(warm + stale)
+            if camera is not None:
+                await camera.kill()
+
+    async def seed(self, urls, desired):
+        """Registry entries as a worker that died while streaming left them"""
+        client = redis_service.get_redis()
+        stream_ids = []
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.zadd(WORKERS_KEY, {DEAD_WORKER: time.time() - 3600})
+            for url in urls:
+                stream_id = stream_manager.generate_stream_id(url)
+                info = StreamInfo(id=stream_id, url=url, title=f"Restore {stream_id[:6]}", status='active',
+                                  created_at=datetime.now(), viewers=[], profile=PASSTHROUGH)
+                pipe.hset(f"stream:{stream_id}", mapping={**info.to_dict(), 'desired': desired})
+                pipe.sadd(STREAMS_KEY, stream_id)
+                if desired == DESIRED_RUNNING:
+                    pipe.hset(viewers_key(stream_id), DEAD_WORKER, 1)
+                stream_ids.append(stream_id)
+            await pipe.execute()
+        return stream_ids
+
+    async def wait_for_segments(self, stream_ids, start, timeout=120):
+        """Time until each restored stream broadcast its first segment"""
+        ready = {}
+        while len(ready) < len(stream_ids) and time.perf_counter() - start < timeout:
+            for stream_id in stream_ids:
+                info = ffmpeg_processor.active_processes.get(stream_id)
+                if stream_id not in ready and info is not None and info['last_segment_at']:
+                    ready[stream_id] = time.perf_counter() - start
+            await asyncio.sleep(0.05)
+        if not ready:
+            raise CommandError("No restored stream produced a segment")
+        timings = sorted(ready.values())
+        self.stdout.write(
+            f"first segment: {len(ready)}/{len(stream_ids)} streams, median={statistics.median(timings):.2f}s "
+            f"p95={timings[int(len(timings) * 0.95) - 1]:.2f}s all={timings[-1]:.2f}s"
+        )
+
+    async def cleanup(self, stream_ids):
+        client = redis_service.get_redis()
+        keys = [key for s in stream_ids for key in (f"stream:{s}", viewers_key(s), owner_key(s))]
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.unlink(*keys)
+            pipe.srem(STREAMS_KEY, *stream_ids)
+            pipe.zrem(WORKERS_KEY, DEAD_WORKER)
+            await pipe.execute()
+
+    @staticmethod
+    async def no_start(stream_id):
+        pass
@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from streams.segment_watcher import SegmentWatcher, inotify_available
+
+SEGMENT_BYTES = 188 * 1000
+
+
+def write_segment(temp_dir, sequence, window, ready_at):
+    """Emulate FFmpeg's temp_file writes: segment, then playlist, both renamed into place"""
+    name = f"segment_{sequence:03d}.ts"
+    path = os.path.join(temp_dir, name)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(b'\x47' * SEGMENT_BYTES)
+    os.rename(path + '.tmp', path)
+
+    window.append(name)
+    del window[:-3]
+    first = sequence - len(window) + 1
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:2', f'#EXT-X-MEDIA-SEQUENCE:{first}']
+    for entry in window:
+        lines += ['#EXTINF:2.000000,', entry]
+    playlist = os.path.join(temp_dir, 'playlist.m3u8')
+    with open(playlist + '.tmp', 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    ready_at[name] = time.perf_counter()
+    os.rename(playlist + '.tmp', playlist)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark segment-ready-to-broadcast latency of the segment watcher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=['inotify', 'poll', 'legacy', 'all'], default='all')
+        parser.add_argument('--segments', type=int, default=10)
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between segments')
+
+    def handle(self, *args, **options):
+        backends = ['inotify', 'poll', 'legacy'] if options['backend'] == 'all' else [options['backend']]
+        if 'inotify' in backends and not inotify_available():
+            self.stdout.write(self.style.WARNING("inotify not available, skipping"))
+            backends.remove('inotify')
+
+        for backend in backends:
+            latencies = asyncio.run(self.measure(backend, options['segments'], options['interval']))
+            latencies_ms = sorted(l * 1000 for l in latencies)
+            p95 = latencies_ms[max(0, int(len(latencies_ms) * 0.95) - 1)]
+            self.stdout.write(
+                f"{backend:8s} segments={len(latencies_ms)} "
+                f"p50={statistics.median(latencies_ms):.2f}ms p95={p95:.2f}ms max={latencies_ms[-1]:.2f}ms"
+            )
+
+    async def measure(self, backend, count, interval):
+        temp_dir = tempfile.mkdtemp(prefix='bench_segments_')
+        ready_at = {}
+        latencies = []
+
+        async def consume():
+            if backend == 'legacy':
+                await self.legacy_loop(temp_dir, ready_at, latencies, count)
+                return
+            watcher = SegmentWatcher(temp_dir, backend=backend)
+            try:
+                async for segment in watcher:
+                    latencies.append(time.perf_counter() - ready_at[segment.name])
+                    if len(latencies) >= count:
+                        break
+            finally:
+                watcher.close()
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0.1)
+        window = []
+        for sequence in range(count):
+            await asyncio.to_thread(write_segment, temp_dir, sequence, window, ready_at)
+            await asyncio.sleep(interval)
+
+        await asyncio.wait_for(consumer, timeout=interval + 5 + (count if backend == 'legacy' else 0))
+        shutil.rmtree(temp_dir)
+        return latencies
+
+    async def legacy_loop(self, temp_dir, ready_at, latencies, count):
+        """The previous listdir loop: 2 s scan interval plus 1 s settle delay per file"""
+        processed = set()
+        while len(latencies) < count:
+            for filename in os.listdir(temp_dir):
+                if filename.endswith('.ts') and filename not in processed:
+                    await asyncio.sleep(1)
+                    if filename in ready_at:
+                        latencies.append(time.perf_counter() - ready_at[filename])
+                    processed.add(filename)
+            await asyncio.sleep(2)
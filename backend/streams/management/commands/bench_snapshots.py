@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+import asyncio
+import shutil
+import time
+from streams.ffmpeg_processor import ffmpeg_processor
+from streams.metrics import process_usage
+from streams.testsource import FakeRTSPServer
+from streams.transcode import PASSTHROUGH
+from streams import views
+
+
+class Command(BaseCommand):
+    help = (
+        'Cost of a camera overview from keyframe snapshots vs watching every stream: '
+        'bytes per second to the client and FFmpeg CPU with and without the snapshot output'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--streams', type=int, default=100)
+        parser.add_argument('--seconds', type=float, default=20, help='Measurement window per run')
+        parser.add_argument('--port', type=int, default=8554)
+
+    def handle(self, *args, **options):
+        if shutil.which('ffmpeg') is None:
+            raise CommandError("ffmpeg is required for this benchmark")
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        camera = FakeRTSPServer(port=options['port'])
+        await camera.start()
+        await asyncio.sleep(2)  # Let the publisher ANNOUNCE before the first DESCRIBE
+        enabled = settings.SNAPSHOT_ENABLED
+        try:
+            results = {}
+            for snapshots in (False, True):
+                settings.SNAPSHOT_ENABLED = snapshots
+                results[snapshots] = await self.measure(camera, options, snapshots)
+        finally:
+            settings.SNAPSHOT_ENABLED = enabled
+            await camera.kill()
+
+        video_rate, cpu_without, _ = results[False]
+        _, cpu_with, overview_rate = results[True]
+        self.stdout.write(
+            f"{options['streams']} streams: video to a viewer of all={video_rate / 1e6:.2f} MB/s, "
+            f"overview polling every {settings.SNAPSHOT_INTERVAL:g}s={overview_rate / 1e3:.1f} KB/s "
+            f"({overview_rate / video_rate:.1%} of video)"
+        )
+        self.stdout.write(
+            f"FFmpeg CPU: {cpu_without:.1f}% without snapshots, {cpu_with:.1f}% with "
+            f"(+{cpu_with - cpu_without:.1f}% for {options['streams']} snapshot outputs)"
+        )
+
+    async def measure(self, camera, options, snapshots):
+        """(video bytes/s, FFmpeg CPU %, overview bytes/s) over one window"""
+        tag = 'on' if snapshots else 'off'
+        stream_ids = [f"snap{tag}{i:05d}"[:12] for i in range(options['streams'])]
+        # The relay ignores the path, so every URL is a distinct stream of the same feed
+        await asyncio.gather(*(
+            ffmpeg_processor.start_stream_processing(
+                stream_id, f"rtsp://{camera.host}:{camera.port}/snapshots-{tag}-{i}", PASSTHROUGH
+            )
+            for i, stream_id in enumerate(stream_ids)
+        ))
+        try:
+            await asyncio.sleep(settings.HLS_SEGMENT_DURATION * 3)
+            before_bytes, before_cpu = self.totals(stream_ids)
+            overview_bytes = 0
+            request = RequestFactory().get('/api/snapshots/', {'ids': ','.join(stream_ids)})
+            start = time.perf_counter()
+            while time.perf_counter() - start < options['seconds']:
+                if snapshots:
+                    overview_bytes += len((await views.stream_snapshots(request)).content)
+                await asyncio.sleep(settings.SNAPSHOT_INTERVAL)
+            elapsed = time.perf_counter() - start
+            after_bytes, after_cpu = self.totals(stream_ids)
+        finally:
+            for stream_id in stream_ids:
+                await ffmpeg_processor.stop_stream_processing(stream_id, announce=False)
+        return (
+            (after_bytes - before_bytes) / elapsed,
+            (after_cpu - before_cpu) / elapsed * 100,
+            overview_bytes / elapsed
+        )
+
+    @staticmethod
+    def totals(stream_ids):
+        """Bytes broadcast and FFmpeg CPU seconds summed over the streams"""
+        sent, cpu = 0.0, 0.0
+        for stream_id in stream_ids:
+            process_info = ffmpeg_processor.active_processes.get(stream_id)
+            if process_info is None:
+                continue
+            sent += process_info['bytes_broadcast'].value
+            usage = process_usage(process_info['process'].pid)
+            if usage is not None:
+                cpu += usage[0]
+        return sent, cpu
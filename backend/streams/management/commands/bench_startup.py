@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import shutil
+import statistics
+import time
+from streams.ffmpeg_processor import ffmpeg_processor
+from streams.probe_cache import probe_cache
+from streams.testsource import FakeRTSPServer
+from streams.transcode import AUTO, PROFILE_CHOICES
+
+
+class Command(BaseCommand):
+    help = 'Measure time-to-first-segment against a local fake camera: probe-first vs cold vs cached probe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--port', type=int, default=8554)
+        parser.add_argument('--profile', default=AUTO, choices=PROFILE_CHOICES)
+
+    def handle(self, *args, **options):
+        if shutil.which('ffmpeg') is None:
+            raise CommandError("ffmpeg is required for this benchmark")
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        camera = FakeRTSPServer(port=options['port'])
+        await camera.start()
+        await asyncio.sleep(2)  # Let the publisher ANNOUNCE before the first DESCRIBE
+        try:
+            for scenario in ('probe-first', 'cold', 'cached'):
+                timings = []
+                for run in range(options['runs']):
+                    timings.append(await self.time_to_first_segment(camera.url, scenario, options['profile'], run))
+                self.stdout.write(
+                    f"{scenario:12s} time-to-first-segment median={statistics.median(timings):.2f}s "
+                    f"min={min(timings):.2f}s max={max(timings):.2f}s"
+                )
+        finally:
+            await camera.kill()
+
+    async def time_to_first_segment(self, rtsp_url, scenario, profile, run):
+        stream_id = f"bench{run:07d}"
+        if scenario != 'cached':
+            probe_cache.invalidate(rtsp_url)
+        elif probe_cache.get(rtsp_url) is None:
+            await ffmpeg_processor.probe_rtsp_url(rtsp_url)
+
+        start = time.perf_counter()
+        if scenario == 'probe-first':
+            # The old critical path: ffprobe to completion, then FFmpeg
+            await ffmpeg_processor.probe_rtsp_url(rtsp_url)
+        await ffmpeg_processor.start_stream_processing(stream_id, rtsp_url, profile)
+        renditions = ffmpeg_processor.get_renditions(stream_id)
+        watcher = ffmpeg_processor.segment_watcher(stream_id, renditions[0] if renditions else None)
+        try:
+            await asyncio.wait_for(watcher.wait_for_segments(), timeout=30)
+            return time.perf_counter() - start
+        finally:
+            watcher.close()
+            await ffmpeg_processor.stop_stream_processing(stream_id)
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import shutil
+import time
+from channels.testing import WebsocketCommunicator
+from streams.consumers import StreamConsumer
+from streams.ffmpeg_processor import ffmpeg_processor
+from streams.testsource import FakeRTSPServer
+
+
+class Command(BaseCommand):
+    help = 'Time opening a camera wall: one add_stream per camera vs a single add_streams batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cameras', type=int, default=32)
+        parser.add_argument('--port', type=int, default=8554)
+        parser.add_argument('--runs', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if shutil.which('ffmpeg') is None:
+            raise CommandError("ffmpeg is required for this benchmark")
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        camera = FakeRTSPServer(port=options['port'])
+        await camera.start()
+        await asyncio.sleep(2)  # Let the publisher ANNOUNCE before the first DESCRIBE
+        try:
+            for run in range(options['runs']):
+                # The relay ignores the path, so every URL is a distinct stream of the same feed
+                urls = [f"rtsp://{camera.host}:{camera.port}/wall{run}-cam{i}" for i in range(options['cameras'])]
+                serial = await self.open_wall(urls, batched=False)
+                urls = [f"{url}-batch" for url in urls]
+                batched = await self.open_wall(urls, batched=True)
+                self.stdout.write(
+                    f"run {run + 1}: {options['cameras']} cameras "
+                    f"serial add_stream={serial:.2f}s batched add_streams={batched:.2f}s"
+                )
+        finally:
+            await camera.kill()
+
+    async def open_wall(self, urls, batched):
+        communicator = WebsocketCommunicator(StreamConsumer.as_asgi(), '/ws/stream/')
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection_established
+
+        start = time.perf_counter()
+        if batched:
+            await communicator.send_json_to({'action': 'add_streams', 'streams': urls})
+            reply = await self.receive_reply(communicator, 'streams_added')
+            if reply['errors']:
+                raise CommandError(f"add_streams failed: {reply['errors']}")
+        else:
+            for url in urls:
+                await communicator.send_json_to({'action': 'add_stream', 'url': url})
+                await self.receive_reply(communicator, 'stream_added')
+        elapsed = time.perf_counter() - start
+
+        await communicator.disconnect()
+        for stream_id in list(ffmpeg_processor.active_processes):
+            await ffmpeg_processor.stop_stream_processing(stream_id)
+        return elapsed
+
+    @staticmethod
+    async def receive_reply(communicator, reply_type):
+        """Next reply of the given type, skipping status and media broadcasts"""
+        while True:
+            message = await communicator.receive_json_from(timeout=60)
+            if message['type'] == 'error':
+                raise CommandError(message['message'])
+            if message['type'] == reply_type:
+                return message
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import time
+from streams.cluster import NODES_KEY, STREAMS_KEY, WORKERS_KEY, ClusterCoordinator, owner_key, viewers_key
+from streams.redis_service import redis_service
+
+
+class Command(BaseCommand):
+    help = (
+        'Run several simulated workers against the configured Redis and check that '
+        'exactly one owns a stream, and that another takes over when the owner dies'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--stream-id', default='clustercheck')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 2:
+            raise CommandError("--workers must be at least 2")
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        stream_id = options['stream_id']
+        client = redis_service.get_redis()
+        await client.delete(owner_key(stream_id), viewers_key(stream_id))
+        await client.sadd(STREAMS_KEY, stream_id)
+
+        workers = [ClusterCoordinator(f"check-{i}") for i in range(options['workers'])]
+        acquired = []
+        for worker in workers:
+            worker.ensure_started = lambda: None  # Heartbeats are driven by hand below
+            worker.on_acquired = self.recorder(acquired, worker)
+
+        try:
+            # Every worker gets a viewer for the same camera at the same moment
+            wins = await asyncio.gather(*(w.acquire(stream_id) for w in workers))
+            await asyncio.gather(*(w.set_local_viewers(stream_id, 1) for w in workers))
+            owners = [w for w, won in zip(workers, wins) if won]
+            if len(owners) != 1:
+                raise CommandError(f"{len(owners)} workers acquired {stream_id}, expected 1")
+            owner = owners[0]
+            self.stdout.write(f"{owner.worker_id} owns {stream_id}; "
+                              f"cluster viewers={await owner.viewer_count(stream_id)}")
+
+            # Heartbeats keep the lease: nobody takes over while the owner is alive
+            for _ in range(2):
+                await asyncio.sleep(owner.lease_ms / 3000)
+                for worker in workers:
+                    await worker.heartbeat()
+            if acquired or await owner.owner(stream_id) != owner.worker_id:
+                raise CommandError("Ownership moved while the owner was heartbeating")
+
+            # The owner dies without releasing; survivors heartbeat past the lease
+            # and the stream's ring node among them claims it
+            survivors = [w for w in workers if w is not owner]
+            started = time.monotonic()
+            while not acquired and time.monotonic() - started < owner.lease_ms / 1000 * 3:
+                await asyncio.sleep(owner.lease_ms / 3000)
+                for worker in survivors:
+                    await worker.heartbeat()
+            if len(acquired) != 1:
+                raise CommandError(f"{len(acquired)} workers took over {stream_id}, expected 1")
+
+            viewers = await acquired[0].viewer_count(stream_id)
+            self.stdout.write(self.style.SUCCESS(
+                f"{acquired[0].worker_id} took over after {time.monotonic() - started:.1f}s; "
+                f"cluster viewers={viewers} (dead worker pruned: {viewers == len(survivors)})"
+            ))
+        finally:
+            for worker in workers:
+                await worker.release(stream_id)
+            worker_ids = [w.worker_id for w in workers]
+            await client.delete(viewers_key(stream_id))
+            await client.srem(STREAMS_KEY, stream_id)
+            await client.zrem(WORKERS_KEY, *worker_ids)
+            await client.hdel(NODES_KEY, *worker_ids)
+            await redis_service.close()
+
+    @staticmethod
+    def recorder(acquired, worker):
+        async def on_acquired(stream_id):
+            acquired.append(worker)
+        return on_acquired
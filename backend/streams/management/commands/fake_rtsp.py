@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import shutil
+import signal
+from streams.testsource import FakeRTSPServer
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve a timestamped test pattern as a local RTSP camera. '
+        'SIGUSR1 kills/revives it; --cycle UP DOWN makes it flap on its own.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8554)
+        parser.add_argument('--path', default='live')
+        parser.add_argument('--size', default='1280x720')
+        parser.add_argument('--fps', type=int, default=25)
+        parser.add_argument('--cycle', type=float, nargs=2, metavar=('UP', 'DOWN'),
+                            help='Seconds up, then seconds down, repeated')
+
+    def handle(self, *args, **options):
+        if shutil.which('ffmpeg') is None:
+            raise CommandError("ffmpeg is required for the fake camera")
+        try:
+            asyncio.run(self.run(options))
+        except KeyboardInterrupt:
+            pass
+
+    async def run(self, options):
+        server = FakeRTSPServer(options['host'], options['port'], options['path'], options['size'], options['fps'])
+        await server.start()
+        self.stdout.write(f"Fake camera up at {server.url} (pid signals: kill -USR1 to toggle)")
+
+        loop = asyncio.get_running_loop()
+        toggles = asyncio.Queue()
+        loop.add_signal_handler(signal.SIGUSR1, toggles.put_nowait, None)
+
+        try:
+            while True:
+                if options['cycle']:
+                    up, down = options['cycle']
+                    try:
+                        await asyncio.wait_for(toggles.get(), up if server.alive else down)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await toggles.get()
+
+                if server.alive:
+                    await server.kill()
+                    self.stdout.write(self.style.WARNING("Fake camera killed"))
+                else:
+                    await server.revive()
+                    self.stdout.write(self.style.SUCCESS("Fake camera revived"))
+        finally:
+            await server.kill()
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 import asyncio
 from streams.health_service import health_service
+from streams.redis_service import redis_service
 
 class Command(BaseCommand):
     help = 'Test system components'
@@ -9,7 +10,10 @@ class Command(BaseCommand):
         async def run_tests():
             self.stdout.write("🔍 Testing system components...")
             
-            status = await health_service.get_system_status()
+            # One sample of what the health endpoint serves
+            await health_service.sample()
+            status = health_service.health
+            await redis_service.close()
             
             # Redis test
             if status['redis']['status']:
@@ -24,7 +28,7 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR(f"❌ FFmpeg: {status['ffmpeg']['message']}"))
             
             # Overall status
-            if status['overall_health']:
+            if health_service.is_ready():
                 self.stdout.write(self.style.SUCCESS("🎉 All systems operational!"))
             else:
                 self.stdout.write(self.style.ERROR("⚠️ Some systems need attention"))
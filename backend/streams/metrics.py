@@ -0,0 +1,241 @@
+import os
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+# Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans a LAN Redis round trip up to a stalled multi-second segment
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+INTERVAL_BUCKETS = (0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 4.0, 6.0, 10.0, 30.0)
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+class _Value:
+    """A labelled counter or gauge sample; the hot path touches only ``value``"""
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _Buckets:
+    """A labelled histogram sample: per-bucket counts, made cumulative at scrape time"""
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Metric:
+    """One metric family.
+
+    ``labels(...)`` returns a child that callers bind once (per stream, per
+    command) and keep, so recording a sample is an attribute update with no
+    lookups or allocations. Everything runs on the event loop, so there are
+    no locks. A metric without labels records through itself.
+    """
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+        registry.register(self)
+
+    def _new_child(self):
+        return _Value()
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def remove(self, *values):
+        """Forget a child, e.g. the series of a stream that stopped"""
+        self._children.pop(tuple(str(v) for v in values), None)
+
+    def clear(self):
+        self._children.clear()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {child.value!r}"
+            for key, child in self._children.items()
+        ]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), key + (le,))} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {child.sum!r}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Every metric of this process, plus callbacks that refresh gauges at scrape time"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric):
+        self._metrics.append(metric)
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Run ``collector`` before every scrape; for values too costly to track live"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+def process_usage(pid: int):
+    """(CPU seconds, RSS bytes) of a child process from /proc, or None once it is gone"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # Fields after the parenthesised command name; utime and stime are 14th and 15th
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    cpu = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    return cpu, resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+registry = Registry()
+
+SEGMENT_INTERVAL = Histogram(
+    'streamviewer_segment_interval_seconds',
+    'Time between consecutive segments FFmpeg finalized for one output',
+    buckets=INTERVAL_BUCKETS,
+)
+SEGMENT_BROADCAST_LATENCY = Histogram(
+    'streamviewer_segment_broadcast_latency_seconds',
+    'From FFmpeg finalizing a segment to its broadcast reaching the channel layer',
+)
+GROUP_SEND_DURATION = Histogram(
+    'streamviewer_group_send_seconds',
+    'Duration of channel layer group_send calls for media broadcasts',
+)
+VIEWER_SEND_LATENCY = Histogram(
+    'streamviewer_viewer_send_latency_seconds',
+    'From a media event entering a viewer\'s send queue to its frame being written',
+)
+FIRST_FRAME_LATENCY = Histogram(
+    'streamviewer_first_frame_seconds',
+    'From a viewer joining a stream to its first segment or part being sent',
+)
+REDIS_LATENCY = Histogram(
+    'streamviewer_redis_command_seconds',
+    'Redis command round trips; pipelines count as one PIPELINE command',
+    ('command',),
+)
+BYTES_BROADCAST = Counter(
+    'streamviewer_broadcast_bytes_total',
+    'Segment and part bytes broadcast to viewers',
+    ('stream_id',),
+)
+FFMPEG_RESTARTS = Counter(
+    'streamviewer_ffmpeg_restarts_total',
+    'FFmpeg restarts by the supervisor after an unplanned exit',
+    ('stream_id',),
+)
+FFMPEG_CPU = Counter(
+    'streamviewer_ffmpeg_cpu_seconds_total',
+    'CPU time used by the running FFmpeg process of a stream; starts over when FFmpeg restarts',
+    ('stream_id',),
+)
+FFMPEG_RSS = Gauge(
+    'streamviewer_ffmpeg_resident_memory_bytes',
+    'Resident memory of the running FFmpeg process of a stream',
+    ('stream_id',),
+)
+FFMPEG_SPEED = Gauge(
+    'streamviewer_ffmpeg_speed_ratio',
+    'Media seconds FFmpeg produced per wall-clock second over the progress window',
+    ('stream_id',),
+)
+ACTIVE_STREAMS = Gauge(
+    'streamviewer_active_streams',
+    'Streams this worker runs FFmpeg for',
+)
+CONNECTED_VIEWERS = Gauge(
+    'streamviewer_connected_viewers',
+    'WebSocket viewers connected to this worker',
+)
@@ -3,15 +3,22 @@ from dataclasses import dataclass
 from typing import List, Optional
 from datetime import datetime
 
+# Desired state kept with each registry entry in Redis: 'running' while the stream
+# has viewers, 'stopped' once its owner stops it. Restarts re-warm running ones.
+DESIRED_RUNNING = 'running'
+DESIRED_STOPPED = 'stopped'
+
 @dataclass
 class StreamInfo:
     """Stream data structure"""
     id: str
     url: str
     title: str
-    status: str  # 'starting', 'active', 'error', 'stopped'
+    status: str  # 'starting', 'queued', 'active', 'reconnecting', 'error', 'stopped'
     created_at: datetime
     viewers: List[str]
+    profile: str = 'auto'  # requested or resolved transcode profile
+    mode: str = 'hls'  # 'hls' or 'll-hls'
     
     def to_dict(self):
         return {
@@ -20,7 +27,9 @@ class StreamInfo:
             'title': self.title,
             'status': self.status,
             'created_at': self.created_at.isoformat(),
-            'viewer_count': len(self.viewers)
+            'viewer_count': len(self.viewers),
+            'profile': self.profile,
+            'mode': self.mode
         }
 
 @dataclass 
@@ -0,0 +1,123 @@
+import math
+from typing import Dict, List, Optional
+from urllib.parse import quote, unquote
+from django.conf import settings
+from .transcode import DECODE_COST, TranscodeProfile
+
+MOSAIC = 'mosaic'
+MOSAIC_SCHEME = 'mosaic:'
+MAX_MOSAIC_TILES = 16
+
+
+def is_mosaic_url(url: Optional[str]) -> bool:
+    return bool(url) and url.startswith(MOSAIC_SCHEME)
+
+
+class MosaicLayout:
+    """Several cameras composited into one picture with the xstack filter.
+
+    Exposes the same interface as TranscodeProfile, like AbrLadder, so
+    FFmpegProcessor runs a mosaic as one more stream. The layout is named
+    by a canonical URL (see to_url) that stands in for the camera URL
+    everywhere, so identical layouts share a stream id and survive
+    restore and takeover like any other stream.
+    """
+    name = MOSAIC
+    is_passthrough = False
+
+    def __init__(self, urls: List[str], columns: Optional[int] = None):
+        urls = [url.strip() if isinstance(url, str) else '' for url in urls]
+        if not 2 <= len(urls) <= MAX_MOSAIC_TILES:
+            raise ValueError(f"A mosaic needs 2-{MAX_MOSAIC_TILES} cameras")
+        if any(not url.startswith('rtsp://') for url in urls):
+            raise ValueError("Invalid RTSP URL format")
+        columns = columns or math.ceil(math.sqrt(len(urls)))
+        if not 1 <= columns <= len(urls):
+            raise ValueError(f"A mosaic of {len(urls)} cameras needs 1-{len(urls)} columns")
+        self.urls = urls
+        self.columns = columns
+        # Tiles share a fixed canvas, so the output costs the same whatever the count
+        tile_width = settings.MOSAIC_WIDTH // columns // 2 * 2
+        tile_height = settings.MOSAIC_HEIGHT // self.rows // 2 * 2
+        self.output = TranscodeProfile(
+            MOSAIC, tile_width * columns, tile_height * self.rows, settings.MOSAIC_FPS, settings.MOSAIC_BITRATE
+        )
+
+    @classmethod
+    def from_request(cls, data) -> 'MosaicLayout':
+        """Layout from an add_stream request: a list of URLs or {'urls': [...], 'columns': n}"""
+        if isinstance(data, dict):
+            urls, columns = data.get('urls'), data.get('columns')
+        else:
+            urls, columns = data, None
+        if not isinstance(urls, list):
+            raise ValueError("A mosaic needs a list of camera URLs")
+        if columns is not None and not isinstance(columns, int):
+            raise ValueError("Mosaic columns must be an integer")
+        return cls(urls, columns)
+
+    @classmethod
+    def from_url(cls, url: str) -> 'MosaicLayout':
+        try:
+            columns, _, tiles = url[len(MOSAIC_SCHEME):].partition(':')
+            return cls([unquote(tile) for tile in tiles.split(',')], int(columns))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid mosaic URL") from None
+
+    def to_url(self) -> str:
+        """``mosaic:<columns>:<url>,<url>,...``; tile order is part of the layout"""
+        return f"{MOSAIC_SCHEME}{self.columns}:" + ','.join(quote(url, safe='') for url in self.urls)
+
+    @property
+    def rows(self) -> int:
+        return math.ceil(len(self.urls) / self.columns)
+
+    @property
+    def tile_size(self):
+        return self.output.width // self.columns, self.output.height // self.rows
+
+    @property
+    def cost(self) -> float:
+        """One decode per camera plus a single encode of the canvas"""
+        return DECODE_COST * len(self.urls) + self.output.cost - DECODE_COST
+
+    def input_args(self) -> List[str]:
+        args = []
+        for url in self.urls:
+            args += ['-rtsp_transport', 'tcp', '-i', url]
+        return args
+
+    def codec_args(self, probe: Optional[dict] = None) -> List[str]:
+        width, height = self.tile_size
+        fps = self.output.fps
+        graph = [
+            # Letterbox each camera into its tile and put all of them on one clock
+            f"[{i}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:-1:-1,setsar=1,fps={fps}[t{i}]"
+            for i in range(len(self.urls))
+        ]
+        positions = '|'.join(
+            f"{i % self.columns * width}_{i // self.columns * height}" for i in range(len(self.urls))
+        )
+        graph.append(
+            ''.join(f"[t{i}]" for i in range(len(self.urls)))
+            + f"xstack=inputs={len(self.urls)}:layout={positions}:fill=black[v]"
+        )
+        # Audio of many cameras at once is noise; the mosaic is video only
+        return [
+            '-filter_complex', ';'.join(graph),
+            '-map', '[v]', '-an',
+            '-c:v', 'libx264',
+            '-preset', 'ultrafast',
+            '-tune', 'zerolatency',
+            '-sc_threshold', '0',
+            *self.output.rate_args(),
+        ]
+
+    def to_dict(self) -> Dict:
+        return {
+            **self.output.to_dict(),
+            'tiles': len(self.urls),
+            'columns': self.columns,
+            'rows': self.rows,
+        }
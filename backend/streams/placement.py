@@ -0,0 +1,72 @@
+import bisect
+import hashlib
+import os
+from typing import Dict, List, Optional, Tuple
+
+# Ring points per unit of weight (one core of headroom); enough for a few
+# percent imbalance without making rebuilds noticeable
+VNODES_PER_WEIGHT = 64
+
+# Headroom is reported in steps of this many cores so load jitter doesn't reshuffle the ring
+WEIGHT_STEP = 0.5
+MIN_WEIGHT = WEIGHT_STEP
+
+
+def _position(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+def cpu_headroom() -> float:
+    """Idle cores on this machine (1-minute load average), quantized to WEIGHT_STEP"""
+    cores = os.cpu_count() or 1
+    try:
+        load = os.getloadavg()[0]
+    except OSError:
+        load = 0.0
+    headroom = max(0.0, cores - load)
+    return max(MIN_WEIGHT, round(headroom / WEIGHT_STEP) * WEIGHT_STEP)
+
+
+class HashRing:
+    """Weighted consistent-hash ring mapping stream ids to transcoder nodes.
+
+    Each node owns ``weight * VNODES_PER_WEIGHT`` points; a key belongs to
+    the first point clockwise from its hash. Adding or removing a node (or
+    changing its weight) only moves the keys on the points that changed.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        self.weights: Dict[str, float] = dict(weights or {})
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._rebuild()
+
+    def __len__(self):
+        return len(self.weights)
+
+    def __contains__(self, node: str):
+        return node in self.weights
+
+    def set_node(self, node: str, weight: float = 1.0):
+        if self.weights.get(node) != weight:
+            self.weights[node] = weight
+            self._rebuild()
+
+    def remove_node(self, node: str):
+        if self.weights.pop(node, None) is not None:
+            self._rebuild()
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _position(key)) % len(self._points)
+        return self._owners[index]
+
+    def _rebuild(self):
+        ring: List[Tuple[int, str]] = []
+        for node, weight in self.weights.items():
+            for i in range(max(1, round(weight * VNODES_PER_WEIGHT))):
+                ring.append((_position(f"{node}#{i}"), node))
+        ring.sort()
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
@@ -0,0 +1,29 @@
+import time
+from typing import Dict, Optional, Tuple
+from django.conf import settings
+
+
+class ProbeCache:
+    """ffprobe results per RTSP URL, so re-adding a known camera skips probing"""
+
+    def __init__(self):
+        self.ttl = settings.PROBE_CACHE_TTL
+        self._entries: Dict[str, Tuple[float, dict]] = {}  # url: (expires_at, probe)
+
+    def get(self, rtsp_url: str) -> Optional[dict]:
+        entry = self._entries.get(rtsp_url)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[rtsp_url]
+            return None
+        return entry[1]
+
+    def put(self, rtsp_url: str, probe: dict):
+        self._entries[rtsp_url] = (time.monotonic() + self.ttl, probe)
+
+    def invalidate(self, rtsp_url: str):
+        self._entries.pop(rtsp_url, None)
+
+
+probe_cache = ProbeCache()
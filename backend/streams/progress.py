@@ -0,0 +1,132 @@
+import time
+from collections import deque
+from typing import Dict, Optional
+from django.conf import settings
+
+# Keys of FFmpeg's -progress blocks; each block ends with progress=continue|end
+PROGRESS_KEYS = {
+    'frame', 'fps', 'bitrate', 'total_size', 'out_time_us', 'out_time_ms', 'out_time',
+    'dup_frames', 'drop_frames', 'speed', 'progress',
+}
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    """FFmpeg progress value as a float; N/A and units like 'kbits/s' or 'x' are handled"""
+    if value is None:
+        return None
+    value = value.strip().rstrip('x')
+    if value.endswith('kbits/s'):
+        value = value[:-len('kbits/s')]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class ProgressTracker:
+    """Rolling fps, bitrate and speed of one FFmpeg run, from its -progress output.
+
+    FFmpeg's own fps, bitrate and speed are averages since the process
+    started, so a transcode that falls behind an hour in barely moves
+    them. The tracker keeps the last ``window`` seconds of blocks and
+    derives the rates from the deltas instead.
+    """
+
+    def __init__(self, window: Optional[float] = None):
+        self.window = window or settings.FFMPEG_PROGRESS_WINDOW
+        self._block: Dict[str, str] = {}
+        self._samples = deque()  # (monotonic, frame, out_time_us, total_size)
+        self.frames = 0
+        self.dup_frames = 0
+        self.drop_frames = 0
+        self.reported_bitrate = None  # kbit/s, FFmpeg's running average
+        self.ended = False
+
+    def feed(self, line: str) -> bool:
+        """Consume one stderr line; returns True when it completed a progress block"""
+        key, sep, value = line.partition('=')
+        if not sep or (key not in PROGRESS_KEYS and not key.startswith('stream_')):
+            return False
+        if key != 'progress':
+            self._block[key] = value
+            return False
+        self._complete(self._block, ended=value.strip() == 'end')
+        self._block = {}
+        return True
+
+    def _complete(self, block, ended):
+        now = time.monotonic()
+        frame = _number(block.get('frame'))
+        out_time = _number(block.get('out_time_us'))
+        total_size = _number(block.get('total_size'))
+        self.frames = int(frame or 0)
+        self.dup_frames = int(_number(block.get('dup_frames')) or 0)
+        self.drop_frames = int(_number(block.get('drop_frames')) or 0)
+        self.reported_bitrate = _number(block.get('bitrate'))
+        self.ended = ended
+
+        self._samples.append((now, frame, out_time, total_size))
+        while len(self._samples) > 2 and self._samples[1][0] <= now - self.window:
+            self._samples.popleft()
+
+    def _delta(self, index: int) -> Optional[float]:
+        if len(self._samples) < 2:
+            return None
+        first, last = self._samples[0], self._samples[-1]
+        if first[index] is None or last[index] is None:
+            return None
+        return last[index] - first[index]
+
+    @property
+    def updated_at(self) -> Optional[float]:
+        """Monotonic time of the last progress block"""
+        return self._samples[-1][0] if self._samples else None
+
+    @property
+    def span(self) -> float:
+        """Seconds of wall time the rolling window covers"""
+        if len(self._samples) < 2:
+            return 0.0
+        return self._samples[-1][0] - self._samples[0][0]
+
+    @property
+    def fps(self) -> Optional[float]:
+        frames = self._delta(1)
+        return frames / self.span if frames is not None and self.span else None
+
+    @property
+    def speed(self) -> Optional[float]:
+        """Media time produced per wall-clock second; a live transcode keeping up sits at 1.0"""
+        out_time = self._delta(2)
+        return out_time / 1_000_000 / self.span if out_time is not None and self.span else None
+
+    @property
+    def bitrate(self) -> Optional[float]:
+        """Output kbit/s over the window, or FFmpeg's running average where size is N/A"""
+        size, out_time = self._delta(3), self._delta(2)
+        if size is not None and out_time:
+            return size * 8 / 1000 / (out_time / 1_000_000)
+        return self.reported_bitrate
+
+    def is_behind(self, min_speed: float) -> bool:
+        """True once a full window shows frames flowing slower than real time"""
+        speed = self.speed
+        return bool(
+            speed is not None
+            and self.span >= self.window * 0.9
+            and self._delta(1)
+            and speed < min_speed
+        )
+
+    def to_dict(self) -> dict:
+        def rounded(value, digits):
+            return round(value, digits) if value is not None else None
+
+        return {
+            'fps': rounded(self.fps, 1),
+            'bitrate_kbps': rounded(self.bitrate, 1),
+            'speed': rounded(self.speed, 3),
+            'frames': self.frames,
+            'dup_frames': self.dup_frames,
+            'drop_frames': self.drop_frames,
+        }
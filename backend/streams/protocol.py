@@ -0,0 +1,126 @@
+import base64
+import json
+import struct
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+DELIVERY_JSON = 'json'
+DELIVERY_BINARY = 'binary'
+DELIVERY_MODES = (DELIVERY_JSON, DELIVERY_BINARY)
+
+FRAME_VERSION = 1
+PART_FRAME_VERSION = 2
+
+# version, stream id, sequence, timestamp (epoch seconds), payload size
+SEGMENT_HEADER = struct.Struct('!B12sQdI')
+
+# LL-HLS parts: segment header plus part index and flags
+PART_HEADER = struct.Struct('!B12sQdIHB')
+PART_INDEPENDENT = 0x01
+
+
+def pack_segment_frame(stream_id: str, sequence: int, timestamp: float, data: bytes) -> bytes:
+    """Binary WebSocket frame: fixed header followed by the raw TS bytes"""
+    header = SEGMENT_HEADER.pack(FRAME_VERSION, stream_id.encode('ascii'), sequence, timestamp, len(data))
+    return header + data
+
+
+def unpack_segment_frame(frame: bytes) -> Tuple[str, int, float, memoryview]:
+    version, stream_id, sequence, timestamp, size = SEGMENT_HEADER.unpack_from(frame)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+    payload = memoryview(frame)[SEGMENT_HEADER.size:SEGMENT_HEADER.size + size]
+    return stream_id.decode('ascii'), sequence, timestamp, payload
+
+
+def pack_part_frame(stream_id: str, sequence: int, part: int, independent: bool,
+                    timestamp: float, data: bytes) -> bytes:
+    """Binary WebSocket frame for one fMP4 part of an LL-HLS segment"""
+    flags = PART_INDEPENDENT if independent else 0
+    header = PART_HEADER.pack(
+        PART_FRAME_VERSION, stream_id.encode('ascii'), sequence, timestamp, len(data), part, flags
+    )
+    return header + data
+
+
+def unpack_part_frame(frame: bytes) -> Tuple[str, int, int, bool, float, memoryview]:
+    version, stream_id, sequence, timestamp, size, part, flags = PART_HEADER.unpack_from(frame)
+    if version != PART_FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+    payload = memoryview(frame)[PART_HEADER.size:PART_HEADER.size + size]
+    return stream_id.decode('ascii'), sequence, part, bool(flags & PART_INDEPENDENT), timestamp, payload
+
+
+def json_segment_message(event: dict, data: bytes) -> str:
+    """Legacy base64-in-JSON text frame"""
+    return json.dumps({
+        'type': 'stream_data',
+        'stream_id': event['stream_id'],
+        'rendition': event.get('rendition'),
+        'chunk': base64.b64encode(data).decode('ascii'),
+        'timestamp': datetime.fromtimestamp(event['timestamp']).isoformat(),
+        'segment_name': event.get('segment_name', 'unknown'),
+        'chunk_size': event.get('chunk_size', 0)
+    })
+
+
+def json_part_message(event: dict, data: bytes) -> str:
+    return json.dumps({
+        'type': 'stream_part',
+        'stream_id': event['stream_id'],
+        'sequence': event['sequence'],
+        'part': event['part'],
+        'independent': event['independent'],
+        'duration': event['duration'],
+        'chunk': base64.b64encode(data).decode('ascii'),
+        'timestamp': datetime.fromtimestamp(event['timestamp']).isoformat(),
+        'chunk_size': event.get('chunk_size', 0)
+    })
+
+
+class FrameCache:
+    """Encodes each segment once per process and delivery mode.
+
+    Every viewer's consumer receives the same group_send event, so the
+    latest encoded frame per stream is shared instead of re-encoding it
+    for each connection.
+    """
+
+    def __init__(self):
+        self._frames: Dict[Tuple[str, Optional[str], str], Tuple[tuple, object]] = {}
+
+    @staticmethod
+    def _key(event: dict, mode: str):
+        return event['stream_id'], event.get('rendition'), mode
+
+    @staticmethod
+    def _position(event: dict):
+        return event['sequence'], event.get('part')
+
+    def get(self, event: dict, mode: str):
+        cached = self._frames.get(self._key(event, mode))
+        if cached is not None and cached[0] == self._position(event):
+            return cached[1]
+        return None
+
+    def encode(self, event: dict, mode: str, data: bytes):
+        sequence = event['sequence']
+        if 'part' in event:
+            if mode == DELIVERY_BINARY:
+                frame = pack_part_frame(event['stream_id'], sequence, event['part'],
+                                        event['independent'], event['timestamp'], data)
+            else:
+                frame = json_part_message(event, data)
+        elif mode == DELIVERY_BINARY:
+            frame = pack_segment_frame(event['stream_id'], sequence, event['timestamp'], data)
+        else:
+            frame = json_segment_message(event, data)
+        self._frames[self._key(event, mode)] = (self._position(event), frame)
+        return frame
+
+    def discard(self, stream_id: str):
+        for key in [k for k in self._frames if k[0] == stream_id]:
+            del self._frames[key]
+
+
+frame_cache = FrameCache()
@@ -1,46 +1,113 @@
 import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
 import os
+import time
 #import json
-from .models import StreamInfo
+from .models import DESIRED_RUNNING, StreamInfo
+from .metrics import REDIS_LATENCY
+
+# Command name: pre-bound latency histogram
+_command_latency = {}
+
+
+def command_latency(command):
+    child = _command_latency.get(command)
+    if child is None:
+        name = command.decode() if isinstance(command, bytes) else str(command)
+        child = _command_latency[command] = REDIS_LATENCY.labels(name.upper())
+    return child
+
+
+class InstrumentedRedis(redis.Redis):
+    """Client that records each command's round trip in the Redis latency histogram"""
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            command_latency(args[0]).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class InstrumentedPipeline(Pipeline):
+    """A pipeline is one round trip, so it is timed as a single PIPELINE command"""
+
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            command_latency('PIPELINE').observe(time.perf_counter() - start)
+
 
 class RedisService:
-    """Handles all Redis operations"""
-    
+    """Handles all Redis operations through one pooled client per process"""
+
     def __init__(self):
         self.redis_url = os.environ.get('REDIS_URL', 'redis://redis:6379')
-    
-    async def get_redis(self):
-        return redis.from_url(self.redis_url)
-    
+        self.max_connections = int(os.environ.get('REDIS_MAX_CONNECTIONS', 50))
+        self._pool = None
+        self._client = None
+
+    def get_redis(self) -> redis.Redis:
+        """Shared client, created lazily on first use"""
+        if self._client is None:
+            self._pool = redis.ConnectionPool.from_url(self.redis_url, max_connections=self.max_connections)
+            self._client = InstrumentedRedis(connection_pool=self._pool)
+        return self._client
+
+    async def close(self):
+        """Release pooled connections (ASGI lifespan shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            await self._pool.disconnect()
+            self._client = None
+            self._pool = None
+
     async def add_user_to_group(self, user_id: str, channel_name: str):
-        r = await self.get_redis()
-        await r.sadd(f"user_group:{user_id}", channel_name)
-        await r.close()
-    
+        await self.get_redis().sadd(f"user_group:{user_id}", channel_name)
+
     async def add_user_to_stream_group(self, stream_id: str, channel_name: str):
-        r = await self.get_redis()
-        await r.sadd(f"stream_group:{stream_id}", channel_name)
-        await r.close()
-    
+        await self.get_redis().sadd(f"stream_group:{stream_id}", channel_name)
+
     async def remove_user_from_stream_group(self, stream_id: str, channel_name: str):
-        r = await self.get_redis()
-        await r.srem(f"stream_group:{stream_id}", channel_name)
-        await r.close()
-    
+        await self.get_redis().srem(f"stream_group:{stream_id}", channel_name)
+
+    async def join_stream(self, stream_id: str, channel_name: str, stream_info: StreamInfo):
+        """Add a viewer to a stream group and register the stream cluster-wide in one round trip"""
+        async with self.get_redis().pipeline(transaction=False) as pipe:
+            self.queue_join_stream(pipe, stream_id, channel_name, stream_info)
+            await pipe.execute()
+
+    def queue_join_stream(self, pipe, stream_id: str, channel_name: str, stream_info: StreamInfo):
+        """Queue join_stream's commands on a caller's pipeline.
+
+        Status and viewer counts are left to the owning worker and the
+        per-worker viewer counts, so a joining worker never overwrites them.
+        The entry is marked desired-running so a restart re-warms it.
+        """
+        registry = {k: v for k, v in stream_info.to_dict().items() if k not in ('status', 'viewer_count')}
+        registry['desired'] = DESIRED_RUNNING
+        pipe.sadd(f"stream_group:{stream_id}", channel_name)
+        pipe.sadd("cluster_streams", stream_id)
+        pipe.hset(f"stream:{stream_id}", mapping=registry)
+
+    def queue_leave_stream(self, pipe, stream_id: str, channel_name: str):
+        pipe.srem(f"stream_group:{stream_id}", channel_name)
+
+    def queue_remove_user_from_group(self, pipe, user_id: str, channel_name: str):
+        pipe.srem(f"user_group:{user_id}", channel_name)
+
     async def store_stream_info(self, stream_id: str, stream_info: StreamInfo):
-        r = await self.get_redis()
-        await r.hset(f"stream:{stream_id}", mapping=stream_info.to_dict())
-        await r.close()
-    
+        await self.get_redis().hset(f"stream:{stream_id}", mapping=stream_info.to_dict())
+
     async def get_stream_info(self, stream_id: str):
-        r = await self.get_redis()
-        data = await r.hgetall(f"stream:{stream_id}")
-        await r.close()
-        return data
-    
+        return await self.get_redis().hgetall(f"stream:{stream_id}")
+
     async def remove_user_from_group(self, user_id: str, channel_name: str):
-        r = await self.get_redis()
-        await r.srem(f"user_group:{user_id}", channel_name)
-        await r.close()
+        await self.get_redis().srem(f"user_group:{user_id}", channel_name)
 
 redis_service = RedisService()
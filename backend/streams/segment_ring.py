@@ -0,0 +1,136 @@
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from .segment_store import segment_store
+from .segment_watcher import parse_playlist
+
+
+class SegmentRing:
+    """The most recent segments of every stream this worker serves, in memory.
+
+    A viewer joining a running stream otherwise sees nothing until the next
+    segment is finalized, up to a full segment later. Each stream (and
+    rendition) keeps its last SEGMENT_RING_SIZE segments, or for LL-HLS the
+    parts since the latest independent one, so every window starts on a
+    keyframe and a joiner can decode it at once.
+
+    All streams share one SEGMENT_RING_BYTES budget; past it the oldest
+    entries are evicted first, whichever stream they belong to.
+    """
+
+    def __init__(self):
+        self.size = settings.SEGMENT_RING_SIZE
+        self.max_bytes = settings.SEGMENT_RING_BYTES
+        self.max_age = settings.SEGMENT_STORE_TTL
+        self._rings: Dict[tuple, deque] = {}  # (stream_id, rendition): entry keys, oldest first
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()  # entry key: (added_at, event, data)
+        self.bytes = 0
+        self.evicted = 0
+
+    @staticmethod
+    def _position(event: dict) -> Tuple[int, int]:
+        return event['sequence'], event.get('part', -1)
+
+    def add(self, event: dict, data: bytes):
+        """Remember a broadcast segment or part with its bytes; duplicates are ignored"""
+        if len(data) > self.max_bytes:
+            return
+        ring_key = (event['stream_id'], event.get('rendition'))
+        key = ring_key + (self._position(event),)
+        if key in self._entries:
+            return
+
+        ring = self._rings.get(ring_key)
+        if ring is None:
+            ring = self._rings[ring_key] = deque()
+        elif ring and key[2] < ring[-1][2]:
+            self._clear(ring)  # A restarted FFmpeg numbers from scratch
+
+        if 'part' in event:
+            if event['independent']:
+                self._clear(ring)
+            elif not ring:
+                return  # Mid-GOP; a window has to start on a keyframe
+        else:
+            while len(ring) >= self.size:
+                self._drop(ring.popleft())
+
+        ring.append(key)
+        self._entries[key] = (time.monotonic(), event, data)
+        self.bytes += len(data)
+        while self.bytes > self.max_bytes:
+            self._evict()
+
+    def window(self, stream_id: str, rendition: Optional[str] = None) -> List[Tuple[dict, bytes]]:
+        """(event, data) of the current window, oldest first; empty if the stream went quiet"""
+        ring = self._rings.get((stream_id, rendition))
+        if not ring or self._entries[ring[-1]][0] < time.monotonic() - self.max_age:
+            return []
+        return [self._entries[key][1:] for key in ring]
+
+    async def recent(self, stream_id: str, rendition: Optional[str] = None) -> List[Tuple[dict, bytes]]:
+        """The current window, filled from the shared store on a worker that hasn't seen the stream yet"""
+        window = self.window(stream_id, rendition)
+        if window or self.max_bytes <= 0:
+            return window
+
+        # Only the owner's HLS playlists are mirrored; LL-HLS joiners wait for the next part
+        content = await segment_store.get_playlist(stream_id, 'playlist.m3u8', rendition)
+        if content is None:
+            return []
+        for segment in parse_playlist(content, '')[-self.size:]:
+            key = segment_store.segment_key(stream_id, segment.sequence, rendition)
+            data = await segment_store.get(key)
+            if data is None:
+                continue
+            self.add({
+                'type': 'stream_data',
+                'stream_id': stream_id,
+                'rendition': rendition,
+                'segment_key': key,
+                'sequence': segment.sequence,
+                'timestamp': time.time(),
+                'segment_name': segment.name,
+                'chunk_size': len(data)
+            }, data)
+        return self.window(stream_id, rendition)
+
+    def discard(self, stream_id: str):
+        for ring_key in [k for k in self._rings if k[0] == stream_id]:
+            self._clear(self._rings.pop(ring_key))
+
+    def stats(self) -> dict:
+        return {
+            'streams': len({ring_key[0] for ring_key in self._rings}),
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'evicted': self.evicted
+        }
+
+    def _clear(self, ring: deque):
+        while ring:
+            self._drop(ring.popleft())
+
+    def _drop(self, key: tuple):
+        _, _, data = self._entries.pop(key)
+        self.bytes -= len(data)
+
+    def _evict(self):
+        """Drop the oldest entry across all streams"""
+        key = next(iter(self._entries))
+        ring_key = key[:2]
+        ring = self._rings[ring_key]
+        if key[2][1] >= 0:
+            # Parts after the keyframe can't be decoded without it
+            self.evicted += len(ring)
+            self._clear(ring)
+        else:
+            ring.remove(key)
+            self._drop(key)
+            self.evicted += 1
+        if not ring:
+            del self._rings[ring_key]
+
+
+segment_ring = SegmentRing()
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from django.conf import settings
+from .redis_service import redis_service
+
+
+class SegmentStore:
+    """Shared segment storage so the channel layer only carries references.
+
+    Each segment is written once to a binary Redis key that expires with the
+    HLS window. Consumers resolve the key through a per-process cache, and
+    concurrent lookups for the same key share one fetch, so N viewers on a
+    worker cost a single Redis GET per segment.
+    """
+
+    def __init__(self):
+        self.ttl = settings.SEGMENT_STORE_TTL
+        self.cache_bytes = settings.SEGMENT_CACHE_BYTES
+        self._cache: 'OrderedDict[str, tuple]' = OrderedDict()  # key: (expires_at, data)
+        self._cached_bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def segment_key(stream_id: str, sequence: int, rendition: Optional[str] = None,
+                    part: Optional[int] = None) -> str:
+        key = f"segment:{stream_id}:{rendition}:{sequence}" if rendition else f"segment:{stream_id}:{sequence}"
+        if part is not None:
+            key = f"{key}.{part}"
+        return key
+
+    async def put(self, stream_id: str, sequence: int, data: bytes, rendition: Optional[str] = None,
+                  part: Optional[int] = None) -> str:
+        """Store segment (or LL-HLS part) bytes once and return the reference key"""
+        key = self.segment_key(stream_id, sequence, rendition, part)
+        await redis_service.get_redis().set(key, data, ex=self.ttl)
+        self._remember(key, data)
+        return key
+
+    @staticmethod
+    def playlist_key(stream_id: str, name: str, rendition: Optional[str] = None) -> str:
+        return f"playlist:{stream_id}:{rendition}:{name}" if rendition else f"playlist:{stream_id}:{name}"
+
+    async def put_playlists(self, stream_id: str, playlists: Dict[str, str], rendition: Optional[str] = None):
+        """Publish the owner's playlists so other workers can serve HLS for the stream"""
+        async with redis_service.get_redis().pipeline(transaction=False) as pipe:
+            for name, content in playlists.items():
+                pipe.set(self.playlist_key(stream_id, name, rendition), content, ex=self.ttl)
+            await pipe.execute()
+
+    async def get_playlist(self, stream_id: str, name: str, rendition: Optional[str] = None) -> Optional[str]:
+        content = await redis_service.get_redis().get(self.playlist_key(stream_id, name, rendition))
+        return content.decode() if content is not None else None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Resolve a reference, or None if the segment already expired"""
+        cached = self._cache.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                return cached[1]
+            self._forget(key)
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await pending
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            data = await redis_service.get_redis().get(key)
+            if data is not None:
+                self._remember(key, data)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody else awaited is not logged
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.cache_bytes:
+            return
+        if key in self._cache:
+            self._forget(key)
+        self._cache[key] = (time.monotonic() + self.ttl, data)
+        self._cached_bytes += len(data)
+        while self._cached_bytes > self.cache_bytes:
+            self._forget(next(iter(self._cache)))
+
+    def _forget(self, key: str):
+        _, data = self._cache.pop(key)
+        self._cached_bytes -= len(data)
+
+
+segment_store = SegmentStore()
@@ -0,0 +1,240 @@
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import logging
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+POLL_INTERVAL = 0.25
+
+
+class Segment(NamedTuple):
+    """A finalized HLS segment as listed by the playlist"""
+    sequence: int
+    name: str
+    path: str
+    duration: float
+
+
+def _load_libc():
+    # glibc has a soname to find; musl (Alpine) may not, but its libc is
+    # already mapped into the interpreter, which CDLL(None) reaches
+    for name in (ctypes.util.find_library('c'), 'libc.so.6', None):
+        try:
+            libc = ctypes.CDLL(name, use_errno=True)
+            libc.inotify_init1
+            libc.inotify_add_watch
+            return libc
+        except (OSError, AttributeError):
+            continue
+    return None
+
+
+_libc = _load_libc()
+
+
+def inotify_available() -> bool:
+    return _libc is not None
+
+
+def parse_playlist(content: str, directory: str) -> List[Segment]:
+    """Parse a media playlist into the segments it lists, in order"""
+    media_sequence = 0
+    duration = 0.0
+    segments = []
+    for line in content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+            media_sequence = int(line.split(':', 1)[1])
+        elif line.startswith('#EXTINF:'):
+            duration = float(line.split(':', 1)[1].split(',', 1)[0])
+        elif not line.startswith('#'):
+            name = os.path.basename(line)
+            segments.append(Segment(
+                sequence=media_sequence + len(segments),
+                name=name,
+                path=os.path.join(directory, name),
+                duration=duration
+            ))
+            duration = 0.0
+    return segments
+
+
+class SegmentWatcher:
+    """Yields HLS segments the moment FFmpeg finalizes them.
+
+    Uses inotify (IN_CLOSE_WRITE / IN_MOVED_TO) on the output directory and
+    falls back to stat-polling the playlist when inotify is unavailable. A
+    segment is only reported once the rewritten playlist lists it, so a
+    half-written ``.ts`` is never broadcast. With the ``manual`` backend
+    nothing is watched; whoever writes the playlist calls ``notify()``.
+    """
+
+    def __init__(self, directory: str, playlist_name: str = 'playlist.m3u8',
+                 backend: str = 'auto', poll_interval: float = POLL_INTERVAL):
+        self.directory = directory
+        self.playlist_name = playlist_name
+        self.playlist_path = os.path.join(directory, playlist_name)
+        self.poll_interval = poll_interval
+        self.last_sequence = -1
+        self.closed = False
+
+        self._changed = asyncio.Event()
+        self._fd = None
+        self._poll_task = None
+        self._last_stat = None
+
+        if backend not in ('auto', 'inotify', 'poll', 'manual'):
+            raise ValueError(f"Unknown segment watcher backend: {backend}")
+        self.backend = 'poll'
+        if backend == 'manual':
+            self.backend = 'manual'
+        elif backend in ('auto', 'inotify') and self._start_inotify():
+            self.backend = 'inotify'
+        elif backend == 'inotify':
+            raise OSError("inotify is not available")
+        else:
+            if backend == 'auto':
+                logger.warning(
+                    f"inotify unavailable; polling {self.playlist_path} every {poll_interval}s, "
+                    f"which adds up to that much segment latency"
+                )
+            self._poll_task = asyncio.create_task(self._poll_playlist())
+
+        # Pick up anything written before the watch was installed
+        self._changed.set()
+
+    def _start_inotify(self) -> bool:
+        if _libc is None:
+            return False
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.warning(f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+            return False
+        wd = _libc.inotify_add_watch(fd, os.fsencode(self.directory), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            logger.warning(f"inotify_add_watch failed: {os.strerror(ctypes.get_errno())}")
+            os.close(fd)
+            return False
+        self._fd = fd
+        asyncio.get_running_loop().add_reader(fd, self._on_inotify_event)
+        return True
+
+    def _on_inotify_event(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            if e.errno != errno.EINTR:
+                logger.warning(f"inotify read failed for {self.directory}: {e}")
+            return
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+            offset += length
+
+            if mask & IN_IGNORED:
+                # Directory was removed underneath us
+                self.close()
+                return
+            if name == self.playlist_name:
+                self._changed.set()
+
+    async def _poll_playlist(self):
+        while not self.closed:
+            try:
+                st = os.stat(self.playlist_path)
+                key = (st.st_ino, st.st_mtime_ns, st.st_size)
+                if key != self._last_stat:
+                    self._last_stat = key
+                    self._changed.set()
+            except FileNotFoundError:
+                if not os.path.isdir(self.directory):
+                    self.close()
+                    return
+            await asyncio.sleep(self.poll_interval)
+
+    def notify(self):
+        """The playlist was rewritten"""
+        self._changed.set()
+
+    def _read_playlist(self) -> Optional[str]:
+        try:
+            with open(self.playlist_path, 'r') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _read_new_segments(self) -> List[Segment]:
+        content = self._read_playlist()
+        if content is None:
+            return []
+
+        segments = parse_playlist(content, self.directory)
+        if segments and segments[-1].sequence < self.last_sequence:
+            # Sequence went backwards: FFmpeg restarted without append_list
+            self.last_sequence = -1
+
+        new_segments = [s for s in segments if s.sequence > self.last_sequence]
+        if new_segments:
+            self.last_sequence = new_segments[-1].sequence
+        return new_segments
+
+    async def wait_for_segments(self) -> List[Segment]:
+        """Block until the playlist lists new segments; empty list once closed"""
+        while not self.closed:
+            await self._changed.wait()
+            self._changed.clear()
+            if self.closed:
+                break
+            new_segments = self._read_new_segments()
+            if new_segments:
+                return new_segments
+        return []
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        while True:
+            segments = await self.wait_for_segments()
+            if not segments:
+                return
+            for segment in segments:
+                yield segment
+
+    def close(self):
+        """Stop watching; pending iterators finish"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._fd is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(self._fd)
+            except RuntimeError:
+                pass
+            os.close(self._fd)
+            self._fd = None
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        self._changed.set()
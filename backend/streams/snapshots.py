@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+from django.conf import settings
+from .redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+JPEG_END = b'\xff\xd9'  # EOI; entropy-coded data escapes 0xff, so it only ends an image
+
+
+class Snapshot(NamedTuple):
+    data: bytes
+    taken_at: float  # epoch seconds
+    etag: str
+
+
+def snapshot_key(stream_id: str) -> str:
+    return f"snapshot:{stream_id}"
+
+
+def snapshot_output_args(fd: int) -> List[str]:
+    """Second FFmpeg output: a scaled JPEG of a keyframe at most every SNAPSHOT_INTERVAL, on ``fd``"""
+    interval = settings.SNAPSHOT_INTERVAL
+    select = f"select='eq(pict_type\\,I)*(isnan(prev_selected_t)+gte(t-prev_selected_t\\,{interval}))'"
+    return [
+        '-map', '0:v:0', '-an', '-sn',
+        '-vf', f"{select},scale='min({settings.SNAPSHOT_WIDTH}\\,iw)':-2",
+        '-fps_mode', 'vfr',
+        '-c:v', 'mjpeg', '-q:v', str(settings.SNAPSHOT_QUALITY),
+        '-f', 'image2pipe',
+        f'pipe:{fd}'
+    ]
+
+
+async def read_jpegs(reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+    """Split FFmpeg's image2pipe output into individual JPEGs"""
+    buffer = bytearray()
+    scanned = 0
+    while True:
+        chunk = await reader.read(64 * 1024)
+        if not chunk:
+            return
+        buffer += chunk
+        while True:
+            end = buffer.find(JPEG_END, scanned)
+            if end < 0:
+                scanned = max(len(buffer) - 1, 0)
+                break
+            yield bytes(buffer[:end + 2])
+            del buffer[:end + 2]
+            scanned = 0
+
+
+class SnapshotCache:
+    """Latest keyframe of each stream as a JPEG, for grid overviews.
+
+    The owner's FFmpeg encodes the snapshots as a side output of the
+    running process; they are kept here and published to Redis so any
+    worker can serve them. A worker remembers what it fetched for one
+    SNAPSHOT_INTERVAL, so many clients polling a wall of cameras cost at
+    most one Redis round trip per interval.
+    """
+
+    def __init__(self):
+        self.interval = settings.SNAPSHOT_INTERVAL
+        self.ttl = max(int(self.interval * 5), 10)
+        self._local: Dict[str, Snapshot] = {}  # Streams this worker runs
+        self._fetched: Dict[str, Tuple[float, Optional[Snapshot]]] = {}  # stream_id: (monotonic, snapshot)
+        self._publishing: Dict[str, asyncio.Task] = {}
+
+    def put(self, stream_id: str, data: bytes):
+        """Keep a new snapshot and publish it in the background; never waits on Redis"""
+        taken_at = time.time()
+        self._local[stream_id] = Snapshot(data, taken_at, f'"{stream_id}-{int(taken_at * 1000):x}"')
+        if stream_id not in self._publishing:
+            self._publishing[stream_id] = asyncio.create_task(self._publish(stream_id))
+
+    async def _publish(self, stream_id: str):
+        """Write the newest snapshot to Redis; ones superseded while a write was in flight are skipped"""
+        try:
+            while True:
+                snapshot = self._local.get(stream_id)
+                if snapshot is None:
+                    return
+                async with redis_service.get_redis().pipeline(transaction=False) as pipe:
+                    pipe.hset(snapshot_key(stream_id), mapping={
+                        'data': snapshot.data, 'taken_at': snapshot.taken_at, 'etag': snapshot.etag
+                    })
+                    pipe.expire(snapshot_key(stream_id), self.ttl)
+                    await pipe.execute()
+                if self._local.get(stream_id) is snapshot:
+                    return
+        except Exception as e:
+            logger.debug(f"Could not publish snapshot for {stream_id}: {e}")
+        finally:
+            if self._publishing.get(stream_id) is asyncio.current_task():
+                del self._publishing[stream_id]
+
+    async def get(self, stream_id: str) -> Optional[Snapshot]:
+        return (await self.get_many([stream_id])).get(stream_id)
+
+    async def get_many(self, stream_ids: List[str]) -> Dict[str, Snapshot]:
+        """Snapshots of the given streams that exist; one Redis round trip for those not held here"""
+        now = time.monotonic()
+        found, missing = {}, []
+        for stream_id in stream_ids:
+            snapshot = self._local.get(stream_id)
+            if snapshot is None:
+                fetched = self._fetched.get(stream_id)
+                if fetched is None or now - fetched[0] >= self.interval:
+                    missing.append(stream_id)
+                    continue
+                snapshot = fetched[1]
+            if snapshot is not None:
+                found[stream_id] = snapshot
+
+        if missing:
+            async with redis_service.get_redis().pipeline(transaction=False) as pipe:
+                for stream_id in missing:
+                    pipe.hgetall(snapshot_key(stream_id))
+                results = await pipe.execute()
+            for stream_id, fields in zip(missing, results):
+                snapshot = None
+                if fields:
+                    snapshot = Snapshot(fields[b'data'], float(fields[b'taken_at']), fields[b'etag'].decode())
+                    found[stream_id] = snapshot
+                self._fetched[stream_id] = (now, snapshot)
+            self._expire(now)
+        return found
+
+    async def discard(self, stream_id: str):
+        """The stream stopped here; don't serve its last frame as if it were live"""
+        self._local.pop(stream_id, None)
+        self._fetched.pop(stream_id, None)
+        task = self._publishing.pop(stream_id, None)
+        if task is not None:
+            task.cancel()
+        await redis_service.get_redis().unlink(snapshot_key(stream_id))
+
+    def _expire(self, now: float):
+        for stream_id in [s for s, (at, _) in self._fetched.items() if now - at >= self.ttl]:
+            del self._fetched[stream_id]
+
+    def stats(self) -> dict:
+        return {
+            'local': len(self._local),
+            'fetched': len(self._fetched),
+            'bytes': sum(len(s.data) for s in self._local.values())
+        }
+
+
+snapshot_cache = SnapshotCache()
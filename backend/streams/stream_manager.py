@@ -33,7 +33,8 @@ class StreamManager:
             return len(self.streams[stream_id].viewers) == 0
         return False
     
-    def create_stream(self, rtsp_url: str, title: str, user_id: str) -> StreamInfo:
+    def create_stream(self, rtsp_url: str, title: str, user_id: Optional[str], profile: str = 'auto',
+                      mode: str = 'hls') -> StreamInfo:
         """Create new stream"""
         stream_id = self.generate_stream_id(rtsp_url)
         stream = StreamInfo(
@@ -42,7 +43,9 @@ class StreamManager:
             title=title or f"Stream {stream_id[:6]}",
             status='starting',
             created_at=datetime.now(),
-            viewers=[user_id]
+            viewers=[user_id] if user_id else [],
+            profile=profile,
+            mode=mode
         )
         self.streams[stream_id] = stream
         return stream
@@ -0,0 +1,79 @@
+import random
+import time
+from typing import Dict, Optional
+from django.conf import settings
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+
+class Backoff:
+    """Exponential backoff with full jitter between FFmpeg restarts"""
+
+    def __init__(self, base: Optional[float] = None, cap: Optional[float] = None):
+        self.base = base or settings.FFMPEG_RESTART_BASE_DELAY
+        self.cap = cap or settings.FFMPEG_RESTART_MAX_DELAY
+        self.attempt = 0
+
+    def next_delay(self) -> float:
+        ceiling = min(self.cap, self.base * (2 ** self.attempt))
+        self.attempt += 1
+        # Full jitter keeps cameras behind one failed switch from reconnecting in lockstep
+        return random.uniform(0, ceiling)
+
+    def reset(self):
+        self.attempt = 0
+
+
+class CircuitBreaker:
+    """Stops restarting a flapping camera after repeated short-lived runs.
+
+    Closed: failures are counted. Open: no restarts until the cooldown has
+    passed. Half-open: one trial run; a stable run closes the circuit, a
+    failure reopens it with a doubled cooldown.
+    """
+
+    def __init__(self, threshold: Optional[int] = None, cooldown: Optional[float] = None):
+        self.threshold = threshold or settings.FFMPEG_CIRCUIT_THRESHOLD
+        self.base_cooldown = cooldown or settings.FFMPEG_CIRCUIT_COOLDOWN
+        self.cooldown = self.base_cooldown
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+
+    def record_success(self):
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == CIRCUIT_HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, settings.FFMPEG_CIRCUIT_MAX_COOLDOWN)
+            self._open()
+        elif self.failures >= self.threshold:
+            self._open()
+
+    def _open(self):
+        self.state = CIRCUIT_OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+
+    def retry_in(self) -> float:
+        """Seconds until a trial run is allowed; 0 when not open"""
+        if self.state != CIRCUIT_OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def allow_trial(self):
+        self.state = CIRCUIT_HALF_OPEN
+
+    def to_dict(self) -> Dict:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'trips': self.trips,
+            'retry_in': round(self.retry_in(), 1),
+        }
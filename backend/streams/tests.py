@@ -0,0 +1,252 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from .admission import (
+    PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, AdmissionCancelled, AdmissionController, admission
+)
+from .archive import (
+    FLAG_DISCONTINUITY, TS_PACKET_SIZE, ArchivedSegment, SegmentArchive, _ChunkIndex, _ChunkWriter, chunk_name,
+    first_pts, render_playlist
+)
+from .ffmpeg_processor import ffmpeg_processor
+from .ingest import INGEST_DISK
+from .redis_service import redis_service
+from .transcode import PASSTHROUGH, PROFILES
+
+STREAM_ID = 'spawn-fails'
+RTSP_URL = 'rtsp://camera.invalid/stream'
+
+
+@override_settings(HLS_INGEST=INGEST_DISK)
+class FailedSpawnTests(SimpleTestCase):
+    """A start whose FFmpeg never spawns must not leave the stream half registered"""
+
+    def setUp(self):
+        for patcher in (
+            mock.patch.object(ffmpeg_processor, 'update_stream_status', mock.AsyncMock()),
+            mock.patch.object(redis_service, 'get_redis', return_value=mock.AsyncMock()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(admission.release, STREAM_ID)
+        self.addCleanup(ffmpeg_processor.active_processes.pop, STREAM_ID, None)
+
+    async def test_failed_spawn_is_cleaned_up_and_retried(self):
+        temp_dirs = []
+
+        async def missing_ffmpeg(stream_id, restart=False):
+            temp_dirs.append(ffmpeg_processor.active_processes[stream_id]['temp_dir'])
+            raise FileNotFoundError("ffmpeg")
+
+        with mock.patch.object(ffmpeg_processor, 'spawn_ffmpeg', side_effect=missing_ffmpeg) as spawn:
+            with self.assertRaises(Exception):
+                await ffmpeg_processor.start_stream_processing(STREAM_ID, RTSP_URL, PASSTHROUGH)
+            self.assertNotIn(STREAM_ID, ffmpeg_processor.active_processes)
+            self.assertFalse(os.path.exists(temp_dirs[0]))
+            self.assertEqual(admission.stats()['slots_used'], 0)
+
+            # The next start spawns again instead of reporting the stream as already running
+            with self.assertRaises(Exception):
+                await ffmpeg_processor.start_stream_processing(STREAM_ID, RTSP_URL, PASSTHROUGH)
+            self.assertEqual(spawn.call_count, 2)
+            self.assertNotIn(STREAM_ID, ffmpeg_processor.active_processes)
+
+    async def test_stream_without_process_can_be_inspected_and_stopped(self):
+        temp_dirs = []
+
+        async def stopped_while_spawning(stream_id, restart=False):
+            info = await ffmpeg_processor.get_stream_info(stream_id)
+            self.assertFalse(info['is_running'])
+            temp_dirs.append(info['temp_dir'])
+            await ffmpeg_processor.stop_stream_processing(stream_id, announce=False)
+            raise FileNotFoundError("ffmpeg")
+
+        with mock.patch.object(ffmpeg_processor, 'spawn_ffmpeg', side_effect=stopped_while_spawning):
+            with self.assertRaises(Exception):
+                await ffmpeg_processor.start_stream_processing(STREAM_ID, RTSP_URL, PASSTHROUGH)
+        self.assertNotIn(STREAM_ID, ffmpeg_processor.active_processes)
+        self.assertFalse(os.path.exists(temp_dirs[0]))
+
+
+def pes_packet(stream_id, pts, adaptation=b''):
+    """One TS packet starting a PES packet with a PTS, optionally after an adaptation field"""
+    pts_bytes = bytes([
+        0x21 | (pts >> 29) & 0x0e, (pts >> 22) & 0xff, (pts >> 14) & 0xfe | 1, (pts >> 7) & 0xff, (pts << 1) & 0xfe | 1
+    ])
+    pes = b'\x00\x00\x01' + bytes([stream_id]) + b'\x00\x00\x80\x80\x05' + pts_bytes
+    field = bytes([len(adaptation)]) + adaptation if adaptation else b''
+    header = b'\x47\x41\x00' + bytes([0x30 if adaptation else 0x10])
+    packet = header + field + pes
+    return packet + b'\xff' * (TS_PACKET_SIZE - len(packet))
+
+
+class FirstPtsTests(SimpleTestCase):
+    def test_video_pts_is_preferred(self):
+        data = pes_packet(0xc0, 1000) + pes_packet(0xe0, 2 ** 32 + 12345)
+        self.assertEqual(first_pts(data), 2 ** 32 + 12345)
+
+    def test_falls_back_to_any_pes(self):
+        self.assertEqual(first_pts(pes_packet(0xc0, 90000)), 90000)
+
+    def test_skips_adaptation_field(self):
+        self.assertEqual(first_pts(pes_packet(0xe0, 4500, adaptation=b'\x50' + b'\xff' * 7)), 4500)
+
+    def test_no_pts(self):
+        self.assertEqual(first_pts(b''), -1)
+        self.assertEqual(first_pts(b'\x47\x01\x00\x10' + b'\xff' * (TS_PACKET_SIZE - 4)), -1)
+        self.assertEqual(first_pts(b'\x00' * TS_PACKET_SIZE), -1)  # Not TS
+
+
+class ArchiveTests(SimpleTestCase):
+    """Seeking and retention over chunks written the way recording writes them"""
+
+    def setUp(self):
+        self.archive = SegmentArchive()
+        self.archive.root = tempfile.mkdtemp(prefix='test_archive_')
+        self.addCleanup(shutil.rmtree, self.archive.root, ignore_errors=True)
+        self.directory = self.archive.track_dir('cam')
+
+    def write_chunk(self, chunk, count, duration_ms=2000):
+        writer = _ChunkWriter(self.directory, chunk)
+        for i in range(count):
+            writer.append(b'\x47' * TS_PACKET_SIZE, chunk + i * duration_ms, i, duration_ms, 0)
+        writer.close()
+
+    def test_find(self):
+        self.write_chunk(10000, 5)
+        with _ChunkIndex(os.path.join(self.directory, chunk_name(10000, '.idx'))) as index:
+            self.assertEqual(index.count, 5)
+            self.assertEqual(index.find(0), 0)  # Before the first segment
+            self.assertEqual(index.find(10000), 0)
+            self.assertEqual(index.find(13999), 1)
+            self.assertEqual(index.find(14000), 2)
+            self.assertEqual(index.find(99999), 4)
+
+    def test_seek_across_chunk_boundary(self):
+        self.write_chunk(0, 10)       # 0-20 s
+        self.write_chunk(20000, 10)   # 20-40 s
+        segments = self.archive.segments('cam', None, 17000, 24000, 100)
+        self.assertEqual([(s.chunk, s.start_ms) for s in segments], [(0, 16000), (0, 18000), (20000, 20000),
+                                                                    (20000, 22000)])
+        self.assertEqual(self.archive.locate('cam', None, 19999).start_ms, 18000)
+        self.assertEqual(self.archive.locate('cam', None, 20000).chunk, 20000)
+        self.assertEqual(len(self.archive.segments('cam', None, 0, None, 3)), 3)
+        self.assertEqual(self.archive.extent('cam'), (0, 40000))
+        self.assertIsNone(self.archive.locate('cam', None, 40000))
+
+    def test_retention_keeps_the_open_chunk(self):
+        for chunk in (0, 20000, 40000):
+            self.write_chunk(chunk, 10)
+        removed = self.archive._expire(10 ** 15, 100, {(self.directory, 40000)})
+        self.assertEqual(removed, 2)
+        self.assertEqual(self.archive.chunks(self.directory), [40000])
+        self.assertTrue(os.path.exists(os.path.join(self.directory, chunk_name(40000, '.ts'))))
+
+    def test_retention_stops_at_the_cutoff_and_batch(self):
+        for chunk in (0, 20000, 40000, 60000):
+            self.write_chunk(chunk, 10)
+        self.assertEqual(self.archive._expire(40000, 100, set()), 2)  # Chunks that ended by 40 s
+        self.assertEqual(self.archive.chunks(self.directory), [40000, 60000])
+        self.assertEqual(self.archive._expire(10 ** 15, 1, set()), 1)
+        self.assertEqual(self.archive.chunks(self.directory), [60000])
+
+    def test_render_playlist(self):
+        segments = [
+            ArchivedSegment(0, 0, 0, 0, 188, 2000, 0),
+            ArchivedSegment(0, 2000, 0, 188, 188, 2500, 0),
+            ArchivedSegment(0, 9000, 0, 376, 188, 2000, FLAG_DISCONTINUITY),
+        ]
+        playlist = render_playlist(segments, ended=True)
+        self.assertIn('#EXT-X-TARGETDURATION:3\n', playlist)
+        self.assertIn('#EXT-X-BYTERANGE:188@188\n', playlist)
+        self.assertEqual(playlist.count('#EXT-X-DISCONTINUITY\n'), 1)
+        self.assertEqual(playlist.count('#EXT-X-PROGRAM-DATE-TIME'), 2)
+        self.assertTrue(playlist.endswith('#EXT-X-ENDLIST\n'))
+
+        empty = render_playlist([], ended=False)
+        self.assertIn('#EXT-X-PLAYLIST-TYPE:EVENT', empty)
+        self.assertNotIn('#EXTINF', empty)
+
+
+class AdmissionTests(SimpleTestCase):
+    """Slot accounting and queue order, with the machine itself never under pressure"""
+
+    def setUp(self):
+        for patcher in (
+            mock.patch('streams.admission.cpu_load', return_value=0.0),
+            mock.patch('streams.admission.memory_available', return_value=None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.controller = AdmissionController()
+
+    def queue(self, stream_id, profile, priority=PRIORITY_NORMAL):
+        return asyncio.create_task(self.controller.wait(stream_id, profile, priority))
+
+    def test_downgrades_to_a_cheaper_profile_that_fits(self):
+        self.controller.max_slots = 0.8
+        admitted = self.controller.try_admit('a', PROFILES['high'])
+        self.assertEqual(admitted.name, 'low')  # high -> medium -> low
+        self.assertEqual(self.controller.running['a'], PROFILES['low'].cost)
+        self.assertEqual(self.controller.downgraded, 1)
+        self.assertIsNone(self.controller.try_admit('b', PROFILES['medium']))
+
+    async def test_admits_by_priority(self):
+        self.controller.max_slots = 0.5
+        self.controller.try_admit('busy', PROFILES['low'])
+        low = self.queue('low-priority', PROFILES['low'], PRIORITY_LOW)
+        await asyncio.sleep(0)
+        high = self.queue('high-priority', PROFILES['low'], PRIORITY_HIGH)
+        await asyncio.sleep(0)
+        self.assertIsNone(self.controller.try_admit('newcomer', PASSTHROUGH))  # Nobody bypasses the queue
+
+        self.controller.release('busy')
+        self.assertEqual((await high).name, 'low')
+        self.assertFalse(low.done())
+        self.controller.release('high-priority')
+        self.assertEqual((await low).name, 'low')
+
+    async def test_head_of_line_waiter_is_not_jumped(self):
+        self.controller.max_slots = 1.5
+        big = SimpleNamespace(name='big', cost=1.0)  # Has no cheaper form
+        self.controller.try_admit('busy', big)
+        head = self.queue('head', big, PRIORITY_HIGH)
+        await asyncio.sleep(0)
+        behind = self.queue('behind', PROFILES['low'])
+        await asyncio.sleep(0)
+        # 'behind' would fit in the free 0.5 slots, but 'head' is first in line
+        self.assertFalse(behind.done())
+        self.assertNotIn('behind', self.controller.running)
+
+        self.controller.release('busy')
+        self.assertIs(await head, big)
+        self.assertEqual((await behind).name, 'low')
+        self.assertEqual(self.controller.used, 1.0 + PROFILES['low'].cost)
+
+    async def test_cancel_releases_an_admitted_start(self):
+        self.controller.max_slots = 0.5
+        self.controller.try_admit('busy', PROFILES['low'])
+        waiting = self.queue('gone', PROFILES['low'])
+        await asyncio.sleep(0)
+        self.controller.release('busy')  # Admits 'gone' before its task resumes
+        self.assertIn('gone', self.controller.running)
+        self.assertTrue(self.controller.cancel('gone'))
+        with self.assertRaises(AdmissionCancelled):
+            await waiting
+        self.assertEqual(self.controller.running, {})
+        self.assertFalse(self.controller.is_waiting('gone'))
+
+    async def test_cancelled_wait_releases_an_admitted_start(self):
+        self.controller.max_slots = 0.5
+        self.controller.try_admit('busy', PROFILES['low'])
+        waiting = self.queue('abandoned', PROFILES['low'])
+        await asyncio.sleep(0)
+        self.controller.release('busy')
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(self.controller.running, {})
@@ -0,0 +1,183 @@
+import asyncio
+import struct
+from typing import Dict, List, Optional, Tuple
+
+# Wall clock and media time burned into the picture, for glass-to-glass checks against a clock
+TIMESTAMP_OVERLAY = (
+    "drawtext=text='%{localtime\\:%T} pts %{pts\\:hms}'"
+    ":fontsize=48:fontcolor=white:box=1:boxcolor=black@0.6:x=20:y=20"
+)
+
+
+def test_source_args(size: str = '1280x720', fps: int = 25, realtime: bool = True,
+                     timestamp: bool = True) -> List[str]:
+    """FFmpeg input arguments for a local camera stand-in (lavfi test pattern + tone)"""
+    video = f"testsrc2=size={size}:rate={fps}"
+    if timestamp:
+        video = f"{video},{TIMESTAMP_OVERLAY}"
+    pace = ['-re'] if realtime else []
+    return [
+        *pace, '-f', 'lavfi', '-i', video,
+        *pace, '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+    ]
+
+
+class FakeRTSPServer:
+    """Minimal RTSP relay standing in for a camera.
+
+    An FFmpeg publisher pushes the timestamped test source to it with
+    ANNOUNCE/RECORD over TCP-interleaved RTP; readers DESCRIBE/SETUP/PLAY and
+    get the same packets. kill() drops every connection and stops listening,
+    like a camera losing power; revive() brings it back.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8554, path: str = 'live',
+                 size: str = '1280x720', fps: int = 25):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.size = size
+        self.fps = fps
+        self.sdp: Optional[bytes] = None
+        self.controls: List[str] = []
+        self._server = None
+        self._publisher = None
+        self._publisher_channels: Dict[int, Tuple[int, int]] = {}  # channel: (track, is_rtcp)
+        self._readers: Dict[asyncio.StreamWriter, Dict[int, Tuple[int, int]]] = {}
+        self._connections = set()
+
+    @property
+    def url(self) -> str:
+        return f'rtsp://{self.host}:{self.port}/{self.path}'
+
+    @property
+    def alive(self) -> bool:
+        return self._server is not None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self._publisher = await asyncio.create_subprocess_exec(
+            'ffmpeg', '-loglevel', 'error',
+            *test_source_args(self.size, self.fps),
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency',
+            '-g', str(self.fps * 2), '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-b:a', '64k',
+            '-f', 'rtsp', '-rtsp_transport', 'tcp', self.url,
+            stdin=asyncio.subprocess.DEVNULL
+        )
+
+    async def kill(self):
+        if self._server is None:
+            return
+        self._server.close()
+        self._server = None
+        if self._publisher.returncode is None:
+            self._publisher.terminate()
+        await self._publisher.wait()
+        for writer in list(self._connections):
+            writer.close()
+        self._connections.clear()
+        self._readers.clear()
+        self._publisher_channels.clear()
+        self.sdp = None
+
+    async def revive(self):
+        if self._server is None:
+            await self.start()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        channel_map: Dict[int, Tuple[int, int]] = {}
+        try:
+            while True:
+                first = await reader.readexactly(1)
+                if first == b'$':
+                    channel = (await reader.readexactly(1))[0]
+                    size = struct.unpack('>H', await reader.readexactly(2))[0]
+                    payload = await reader.readexactly(size)
+                    if channel in self._publisher_channels:
+                        self._relay(self._publisher_channels[channel], payload)
+                    continue  # Readers' RTCP receiver reports are ignored
+
+                request_line = (first + await reader.readline()).decode().strip()
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode().strip()
+                    if not line:
+                        break
+                    key, _, value = line.partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = b''
+                if 'content-length' in headers:
+                    body = await reader.readexactly(int(headers['content-length']))
+
+                method, uri, _ = request_line.split(' ', 2)
+                if not self._respond(writer, method, uri, headers, body, channel_map):
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            self._readers.pop(writer, None)
+            writer.close()
+
+    def _respond(self, writer, method, uri, headers, body, channel_map) -> bool:
+        reply = {'CSeq': headers.get('cseq', '0')}
+        status = '200 OK'
+        content = b''
+        if method == 'OPTIONS':
+            reply['Public'] = 'OPTIONS, DESCRIBE, ANNOUNCE, SETUP, PLAY, RECORD, GET_PARAMETER, TEARDOWN'
+        elif method == 'ANNOUNCE':
+            self.sdp = body
+            self.controls = [
+                line.split(':', 1)[1].strip() for line in body.decode().splitlines()
+                if line.startswith('a=control:') and not line.strip().endswith('*')
+            ]
+        elif method == 'DESCRIBE':
+            if self.sdp is None:
+                status = '404 Not Found'
+            else:
+                reply['Content-Base'] = uri.rstrip('/') + '/'
+                reply['Content-Type'] = 'application/sdp'
+                content = self.sdp
+        elif method == 'SETUP':
+            transport = headers.get('transport', '')
+            track = next((i for i, c in enumerate(self.controls) if uri.rstrip('/').endswith(c)), None)
+            interleaved = [p for p in transport.split(';') if p.startswith('interleaved=')]
+            if track is None or not interleaved:
+                status = '461 Unsupported Transport'
+            else:
+                rtp, rtcp = (int(c) for c in interleaved[0].split('=', 1)[1].split('-'))
+                if 'mode=record' in transport.lower():
+                    self._publisher_channels[rtp] = (track, 0)
+                    self._publisher_channels[rtcp] = (track, 1)
+                else:
+                    channel_map[track] = (rtp, rtcp)
+                reply['Transport'] = transport
+                reply['Session'] = f'{id(writer):x};timeout=60'
+        elif method == 'PLAY':
+            self._readers[writer] = channel_map
+            reply['Session'] = headers.get('session', '')
+        elif method in ('RECORD', 'GET_PARAMETER', 'SET_PARAMETER'):
+            reply['Session'] = headers.get('session', '')
+        elif method == 'TEARDOWN':
+            writer.write(b'RTSP/1.0 200 OK\r\nCSeq: ' + reply['CSeq'].encode() + b'\r\n\r\n')
+            return False
+        else:
+            status = '501 Not Implemented'
+
+        if content:
+            reply['Content-Length'] = str(len(content))
+        head = ''.join(f'{key}: {value}\r\n' for key, value in reply.items())
+        writer.write(f'RTSP/1.0 {status}\r\n{head}\r\n'.encode() + content)
+        return True
+
+    def _relay(self, source: Tuple[int, int], payload: bytes):
+        track, is_rtcp = source
+        for writer, channel_map in list(self._readers.items()):
+            channels = channel_map.get(track)
+            # Slow readers drop packets instead of stalling the publisher, like a real camera
+            if channels is None or writer.transport.get_write_buffer_size() > 4 * 1024 * 1024:
+                continue
+            writer.write(b'$' + bytes([channels[is_rtcp]]) + struct.pack('>H', len(payload)) + payload)
@@ -0,0 +1,209 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from django.conf import settings
+
+PASSTHROUGH = 'passthrough'
+AUTO = 'auto'
+ABR = 'abr'
+
+# Admission cost of a stream, in 720p25 ultrafast x264 encodes (see cost)
+REFERENCE_PIXEL_RATE = 1280 * 720 * 25
+PASSTHROUGH_COST = 0.05  # Demux/remux only
+DECODE_COST = 0.25  # One decode shared by every ABR rendition
+
+# Codecs every HLS-capable browser decodes without re-encoding
+BROWSER_VIDEO_CODECS = {'h264'}
+BROWSER_H264_PROFILES = {'Constrained Baseline', 'Baseline', 'Main', 'High'}
+BROWSER_PIX_FMTS = {'yuv420p', 'yuvj420p'}
+BROWSER_AUDIO_CODECS = {'aac'}
+
+
+@dataclass(frozen=True)
+class TranscodeProfile:
+    """Named FFmpeg output settings; passthrough remuxes without decoding"""
+    name: str
+    width: int = 0
+    height: int = 0
+    fps: int = 0
+    video_bitrate: int = 0  # kbit/s
+    audio_bitrate: int = 64  # kbit/s
+
+    @property
+    def is_passthrough(self) -> bool:
+        return self.name == PASSTHROUGH
+
+    @property
+    def cost(self) -> float:
+        """Relative CPU cost; encoding scales roughly with output pixel rate"""
+        if self.is_passthrough:
+            return PASSTHROUGH_COST
+        return DECODE_COST + self.width * self.height * self.fps / REFERENCE_PIXEL_RATE
+
+    def rate_args(self, spec: str = 'v') -> List[str]:
+        """x264 profile, GOP and rate control for the stream(s) matching spec"""
+        gop = str(self.fps * settings.HLS_SEGMENT_DURATION)
+        return [
+            f'-profile:{spec}', 'baseline' if self.height <= 480 else 'main',
+            f'-g:{spec}', gop,                   # One GOP per segment
+            f'-keyint_min:{spec}', gop,
+            f'-b:{spec}', f'{self.video_bitrate}k',
+            f'-maxrate:{spec}', f'{self.video_bitrate * 6 // 5}k',
+            f'-bufsize:{spec}', f'{self.video_bitrate * 12 // 5}k',
+        ]
+
+    def video_args(self) -> List[str]:
+        if self.is_passthrough:
+            return ['-c:v', 'copy']
+        return [
+            '-c:v', 'libx264',
+            '-preset', 'ultrafast',
+            '-tune', 'zerolatency',
+            '-sc_threshold', '0',
+            *self.rate_args(),
+            '-s', f'{self.width}x{self.height}',
+            '-r', str(self.fps),
+        ]
+
+    def audio_args(self, probe: Optional[dict] = None) -> List[str]:
+        audio = _first_stream(probe, 'audio')
+        if self.is_passthrough and audio and audio.get('codec_name') in BROWSER_AUDIO_CODECS:
+            return ['-c:a', 'copy']
+        return ['-c:a', 'aac', '-b:a', f'{self.audio_bitrate}k', '-ac', '1']
+
+    def codec_args(self, probe: Optional[dict] = None) -> List[str]:
+        return self.video_args() + self.audio_args(probe)
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'resolution': f'{self.width}x{self.height}' if self.width else 'source',
+            'fps': self.fps or 'source',
+            'video_bitrate': f'{self.video_bitrate}k' if self.video_bitrate else 'source',
+        }
+
+
+PROFILES: Dict[str, TranscodeProfile] = {
+    PASSTHROUGH: TranscodeProfile(PASSTHROUGH),
+    'low': TranscodeProfile('low', 640, 480, 15, 500),
+    'medium': TranscodeProfile('medium', 1280, 720, 25, 1500),
+    'high': TranscodeProfile('high', 1920, 1080, 30, 3000),
+}
+
+
+class AbrLadder:
+    """Several renditions from one decode via the split filter and -var_stream_map.
+
+    Exposes the same interface as TranscodeProfile, so FFmpegProcessor
+    treats the ladder as one more profile.
+    """
+    name = ABR
+    is_passthrough = False
+
+    def __init__(self, renditions: List[TranscodeProfile]):
+        if not 2 <= len(renditions) <= 4:
+            raise ValueError("ABR ladder needs 2-4 renditions")
+        if any(r.is_passthrough for r in renditions):
+            raise ValueError("ABR renditions must be re-encoded profiles")
+        self.renditions = renditions
+
+    @property
+    def rendition_names(self) -> List[str]:
+        return [r.name for r in self.renditions]
+
+    @property
+    def cost(self) -> float:
+        return DECODE_COST + sum(r.cost - DECODE_COST for r in self.renditions)
+
+    @property
+    def default_rendition(self) -> str:
+        """Lowest rung, so new viewers on poor links start without stalling"""
+        return min(self.renditions, key=lambda r: r.video_bitrate).name
+
+    def codec_args(self, probe: Optional[dict] = None) -> List[str]:
+        count = len(self.renditions)
+        graph = [f"[0:v]split={count}" + "".join(f"[s{i}]" for i in range(count))]
+        for i, rendition in enumerate(self.renditions):
+            graph.append(f"[s{i}]scale={rendition.width}:{rendition.height},fps={rendition.fps}[v{i}]")
+
+        # A hard audio map fails on cameras without audio, so only map it when probed
+        has_audio = _first_stream(probe, 'audio') is not None
+        args = ['-filter_complex', ';'.join(graph)]
+        for i in range(count):
+            args += ['-map', f'[v{i}]']
+            if has_audio:
+                args += ['-map', '0:a:0']
+
+        args += ['-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency', '-sc_threshold', '0']
+        for i, rendition in enumerate(self.renditions):
+            args += rendition.rate_args(f'v:{i}')
+        if has_audio:
+            args += ['-c:a', 'aac', '-b:a', '64k', '-ac', '1']
+
+        stream_map = ' '.join(
+            f"v:{i},a:{i},name:{r.name}" if has_audio else f"v:{i},name:{r.name}"
+            for i, r in enumerate(self.renditions)
+        )
+        return args + ['-var_stream_map', stream_map]
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'renditions': [r.to_dict() for r in self.renditions],
+        }
+
+
+def abr_ladder() -> AbrLadder:
+    return AbrLadder([PROFILES[name] for name in settings.ABR_LADDER])
+
+
+# Everything add_stream accepts as a profile
+PROFILE_CHOICES = (AUTO, ABR, *PROFILES)
+
+
+def cheaper_profile(profile):
+    """Next cheaper profile to shed load with, or None if there is none.
+
+    ABR ladders collapse to their lowest rung; single encodes step down in
+    pixel rate. Passthrough is never offered, since it depends on the camera,
+    and other layouts such as mosaics have no cheaper form.
+    """
+    if isinstance(profile, AbrLadder):
+        return min(profile.renditions, key=lambda r: r.cost)
+    if not isinstance(profile, TranscodeProfile):
+        return None
+    cheaper = [p for p in PROFILES.values() if not p.is_passthrough and p.cost < profile.cost]
+    return max(cheaper, key=lambda p: p.cost) if cheaper else None
+
+
+def _first_stream(probe: Optional[dict], codec_type: str) -> Optional[dict]:
+    if not probe:
+        return None
+    for stream in probe.get('streams', []):
+        if stream.get('codec_type') == codec_type:
+            return stream
+    return None
+
+
+def is_browser_compatible(probe: Optional[dict]) -> bool:
+    """True if the camera's video can be remuxed into HLS as-is"""
+    video = _first_stream(probe, 'video')
+    if video is None:
+        return False
+    return (
+        video.get('codec_name') in BROWSER_VIDEO_CODECS
+        and video.get('profile') in BROWSER_H264_PROFILES
+        and video.get('pix_fmt', 'yuv420p') in BROWSER_PIX_FMTS
+    )
+
+
+def select_profile(probe: Optional[dict], requested: Optional[str] = None):
+    """Resolve the profile for a stream: explicit request, else remux when possible"""
+    if requested == ABR:
+        return abr_ladder()
+    if requested and requested != AUTO:
+        if requested not in PROFILES:
+            raise ValueError(f"Unknown transcode profile: {requested}")
+        return PROFILES[requested]
+    if is_browser_compatible(probe):
+        return PROFILES[PASSTHROUGH]
+    return PROFILES[settings.DEFAULT_TRANSCODE_PROFILE]
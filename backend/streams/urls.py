@@ -4,8 +4,21 @@ from . import views
 urlpatterns = [
     path('streams/', views.list_streams, name='list_streams'),
     path('streams/<str:stream_id>/', views.stream_detail, name='stream_detail'),
+    path('streams/<str:stream_id>/snapshot.jpg', views.stream_snapshot, name='stream_snapshot'),
+    path('snapshots/', views.stream_snapshots, name='stream_snapshots'),
     path('health/', views.health_check, name='health_check'),
+    path('health/live/', views.health_live, name='health_live'),
+    path('health/ready/', views.health_ready, name='health_ready'),
     path('stats/', views.system_stats, name='system_stats'),
+    path('viewers/', views.viewer_stats, name='viewer_stats'),
+    path('recordings/<str:stream_id>/', views.recording_detail, name='recording_detail'),
+    path('recordings/<str:stream_id>/playlist.m3u8', views.recording_playlist, name='recording_playlist'),
+    path('recordings/<str:stream_id>/<str:chunk>', views.recording_chunk, name='recording_chunk'),
+    path('recordings/<str:stream_id>/<str:rendition>/playlist.m3u8', views.recording_playlist, name='recording_rendition_playlist'),
+    path('recordings/<str:stream_id>/<str:rendition>/<str:chunk>', views.recording_chunk, name='recording_rendition_chunk'),
     path('hls/<str:stream_id>/playlist.m3u8', views.serve_hls_playlist, name='hls_playlist'),
+    path('hls/<str:stream_id>/master.m3u8', views.serve_hls_master_playlist, name='hls_master_playlist'),
     path('hls/<str:stream_id>/<str:segment_name>', views.serve_hls_segment, name='hls_segment'),
+    path('hls/<str:stream_id>/<str:rendition>/playlist.m3u8', views.serve_hls_rendition_playlist, name='hls_rendition_playlist'),
+    path('hls/<str:stream_id>/<str:rendition>/<str:segment_name>', views.serve_hls_rendition_segment, name='hls_rendition_segment'),
 ]
@@ -1,122 +1,598 @@
-from rest_framework.decorators import api_view
-from rest_framework.response import Response
+from django.conf import settings
 from django.http import JsonResponse
-from django.http import FileResponse, Http404, HttpResponse
-from django.views.decorators.csrf import csrf_exempt
-import os
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from datetime import datetime, timezone
 import asyncio
-from .stream_manager import stream_manager
+import base64
+import hashlib
+import os
+import time
 from .health_service import health_service
 from .ffmpeg_processor import ffmpeg_processor
+from .cluster import cluster
+from .segment_store import segment_store
+from .segment_watcher import parse_playlist
+from .ingest import file_etag
+from .snapshots import snapshot_cache
+from .archive import archive, chunk_name, is_safe_name, render_playlist
+from .backpressure import viewer_outboxes
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry
+from .ll_hls import INIT_NAME, MODE_LL_HLS, PART_NAME, SEGMENT_NAME
 
-@api_view(['GET'])
-def list_streams(request):
-    """GET /api/streams/ - List all active streams"""
-    streams = [stream.to_dict() for stream in stream_manager.streams.values()]
-    return Response({'streams': streams})
+async def list_streams(request):
+    """GET /api/streams/ - List all active streams across the cluster"""
+    streams = await cluster.list_streams()
+    return JsonResponse({'streams': streams})
 
-@api_view(['GET'])
-def stream_detail(request, stream_id):
-    """GET /api/streams/{id}/ - Get specific stream details"""
-    stream = stream_manager.get_stream(stream_id)
+async def stream_detail(request, stream_id):
+    """GET /api/streams/{id}/ - Get specific stream details, whichever worker owns it"""
+    stream = await cluster.get_stream(stream_id)
     if stream:
-        return Response(stream.to_dict())
-    return Response({'error': 'Stream not found'}, status=404)
+        return JsonResponse(stream)
+    return JsonResponse({'error': 'Stream not found'}, status=404)
+
+# Most thumbnails one /api/snapshots/ request may ask for
+MAX_SNAPSHOT_BATCH = 256
+
+# Snapshots change every SNAPSHOT_INTERVAL; clients revalidate with If-None-Match
+SNAPSHOT_CACHE_CONTROL = 'no-cache'
+
+async def stream_snapshot(request, stream_id):
+    """GET /api/streams/{id}/snapshot.jpg - Latest keyframe of a running stream as a JPEG"""
+    snapshot = await snapshot_cache.get(stream_id)
+    if snapshot is None:
+        raise Http404("No snapshot for this stream")
+    last_modified = int(snapshot.taken_at)
+    response = get_conditional_response(request, etag=snapshot.etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(snapshot.data, content_type='image/jpeg')
+    response['ETag'] = snapshot.etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = SNAPSHOT_CACHE_CONTROL
+    return _add_cors_headers(response)
+
+async def stream_snapshots(request):
+    """GET /api/snapshots/?ids=a,b - Latest keyframes of many streams in one response.
+
+    Without ids, every stream in the cluster. The ETag covers all of them, so
+    an overview polling with If-None-Match gets a 304 until any camera changes.
+    """
+    ids = request.GET.get('ids')
+    stream_ids = list(dict.fromkeys(s for s in ids.split(',') if s)) if ids else await cluster.stream_ids()
+    if len(stream_ids) > MAX_SNAPSHOT_BATCH:
+        return _bad_request(f"At most {MAX_SNAPSHOT_BATCH} streams per request")
+    
+    snapshots = await snapshot_cache.get_many(stream_ids)
+    etag = '"{}"'.format(hashlib.md5(
+        ','.join(f"{s}={snapshots[s].etag if s in snapshots else ''}" for s in stream_ids).encode()
+    ).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse({
+            'snapshots': {
+                stream_id: {
+                    'etag': snapshot.etag,
+                    'taken_at': snapshot.taken_at,
+                    'jpeg': base64.b64encode(snapshot.data).decode('ascii')
+                }
+                for stream_id, snapshot in snapshots.items()
+            },
+            'missing': [s for s in stream_ids if s not in snapshots],
+            'interval': settings.SNAPSHOT_INTERVAL
+        })
+    response['ETag'] = etag
+    response['Cache-Control'] = SNAPSHOT_CACHE_CONTROL
+    return _add_cors_headers(response)
+
+def _snapshot_response(body, status=200):
+    """Pre-encoded health/stats snapshot; Age tells probes how old it is"""
+    response = HttpResponse(body, content_type='application/json', status=status)
+    response['Age'] = str(int(health_service.age or 0))
+    return response
+
+async def health_check(request):
+    """GET /api/health/ - Component health from the background sampler's last snapshot"""
+    await health_service.ensure_started()
+    return _snapshot_response(health_service.health_json)
+
+async def health_live(request):
+    """GET /api/health/live/ - Liveness: the event loop is running the sampler on schedule"""
+    await health_service.ensure_started()
+    live = health_service.is_live()
+    return JsonResponse({'live': live}, status=200 if live else 503)
+
+async def health_ready(request):
+    """GET /api/health/ready/ - Readiness: Redis reachable and, on transcoders, FFmpeg usable"""
+    await health_service.ensure_started()
+    ready = health_service.is_ready()
+    return JsonResponse({'ready': ready}, status=200 if ready else 503)
 
-@api_view(['GET'])
-def health_check(request):
-    """GET /api/health/ - Synchronous health check"""
-    try:
-        # Run async health check in sync context
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        status = loop.run_until_complete(health_service.get_system_status())
-        loop.close()
-        
-        return JsonResponse(status)
-    except Exception as e:
-        return JsonResponse({
-            'error': str(e),
-            'overall_health': False
-        }, status=500)
-
-@api_view(['GET'])
 async def system_stats(request):
-    """GET /api/stats/ - System statistics"""
+    """GET /api/stats/ - System statistics, as of the last health sample"""
+    await health_service.ensure_started()
+    return _snapshot_response(health_service.stats_json)
+
+async def viewer_stats(request):
+    """GET /api/viewers/ - Send queue depth and drop counters of each viewer on this worker"""
+    return JsonResponse({'viewers': {user_id: outbox.stats() for user_id, outbox in viewer_outboxes.items()}})
+
+async def metrics(request):
+    """GET /metrics - Prometheus scrape endpoint for this worker"""
+    return HttpResponse(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+HLS_CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+
+LL_CONTENT_TYPES = {
+    'playlist': 'application/vnd.apple.mpegurl',
+    'init': 'video/mp4',
+    'media': 'video/iso.segment',
+}
+
+PLAYLIST_CACHE_CONTROL = 'public, max-age=1'
+SEGMENT_CACHE_CONTROL = 'public, max-age=86400, immutable'
+
+
+class HLSFileResponse(FileResponse):
+    """FileResponse that streams natively under ASGI.
+
+    Chunks are read in a thread per block and yielded by an async iterator
+    instead of letting Django buffer the whole sync iterator in a worker
+    thread; a slow disk then holds up this response, not the event loop.
+    """
+    block_size = 256 * 1024
+
+    def _set_streaming_content(self, value):
+        super()._set_streaming_content(value)
+        if self.file_to_stream is not None:
+            self._iterator = self._read_chunks(self.file_to_stream)
+            self.is_async = True
+
+    async def _read_chunks(self, filelike):
+        while True:
+            chunk = await asyncio.to_thread(filelike.read, self.block_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _add_cors_headers(response):
+    response['Access-Control-Allow-Origin'] = '*'
+    response['Access-Control-Allow-Methods'] = 'GET, HEAD, OPTIONS'
+    response['Access-Control-Allow-Headers'] = '*'
+    return response
+
+
+def _open_file(path):
+    """Open a file for reading with its stat; blocking, so run it in a thread"""
+    f = open(path, 'rb')
+    return f, os.fstat(f.fileno())
+
+
+async def _serve_hls_file(request, path, cache_control):
+    """Serve an HLS file with validators, honouring conditional requests"""
     try:
-        stats = {
-            'streams': {
-                'total': len(stream_manager.streams),
-                'by_status': {}
-            },
-            'processes': {
-                'ffmpeg_active': len(ffmpeg_processor.active_processes)
+        f, st = await asyncio.to_thread(_open_file, path)
+    except (FileNotFoundError, IsADirectoryError):
+        raise Http404("File not found")
+
+    etag = file_etag(st)
+    last_modified = int(st.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type = HLS_CONTENT_TYPES[os.path.splitext(path)[1]]
+        response = HLSFileResponse(f, content_type=content_type)
+    else:
+        f.close()
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    return _add_cors_headers(response)
+
+
+def _serve_ingested_file(request, ingested, name, cache_control):
+    """Serve an HLS file FFmpeg uploaded, straight from its in-memory buffer"""
+    if ingested is None:
+        raise Http404("File not found")
+    last_modified = int(ingested.finalized_at)
+    response = get_conditional_response(request, etag=ingested.etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(ingested.data, content_type=HLS_CONTENT_TYPES[os.path.splitext(name)[1]])
+    response['ETag'] = ingested.etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    return _add_cors_headers(response)
+
+
+async def _serve_local_file(request, stream_id, name, cache_control, rendition=None):
+    """HLS file of a stream this worker runs, from memory under HTTP ingest or from its temp directory"""
+    if ffmpeg_processor.get_ingest_output(stream_id) is None:
+        return await _serve_hls_file(request, _hls_path(stream_id, name, rendition), cache_control)
+    _check_hls_name(name)
+    return _serve_ingested_file(
+        request, await ffmpeg_processor.read_hls_file(stream_id, name, rendition), name, cache_control
+    )
+
+
+def _check_hls_name(name):
+    if os.path.basename(name) != name or os.path.splitext(name)[1] not in HLS_CONTENT_TYPES:
+        raise Http404("Invalid file name")
+
+
+def _hls_path(stream_id, name, rendition=None):
+    output_dir = ffmpeg_processor.get_output_dir(stream_id, rendition)
+    if output_dir is None:
+        raise Http404("Stream not found")
+    _check_hls_name(name)
+    return os.path.join(output_dir, name)
+
+
+def _check_segment_name(segment_name):
+    if os.path.splitext(segment_name)[1] == '.m3u8':
+        raise Http404("Invalid segment name")
+
+
+async def _not_mirrored(stream_id):
+    """No mirrored playlist: 404, or 409 naming the owner of an LL-HLS stream.
+
+    LL-HLS parts and blocking playlist reloads are served from the owner's
+    memory and not mirrored, so other workers can't relay them; players
+    have to reach the owner (e.g. by sticky sessions).
+    """
+    info = await cluster.get_stream(stream_id)
+    if info is None:
+        raise Http404("Stream not found")
+    if info.get('mode') != MODE_LL_HLS:
+        raise Http404("File not found")
+    return _add_cors_headers(JsonResponse({
+        'error': 'LL-HLS is only served by the worker transcoding the stream',
+        'owner': info['owner']
+    }, status=409))
+
+
+async def _serve_cluster_file(request, stream_id, name, rendition=None):
+    """HLS for a stream transcoded by another worker, from the playlists and segments it publishes"""
+    extension = os.path.splitext(name)[1]
+    if os.path.basename(name) != name or extension not in HLS_CONTENT_TYPES:
+        raise Http404("Invalid file name")
+    if extension == '.m3u8':
+        content = await segment_store.get_playlist(stream_id, name, rendition)
+        if content is None:
+            return await _not_mirrored(stream_id)
+        data, cache_control = content.encode(), PLAYLIST_CACHE_CONTROL
+        # A few hundred bytes that change every segment; hashing them is cheap
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+    else:
+        content = await segment_store.get_playlist(stream_id, 'playlist.m3u8', rendition)
+        if content is None:
+            return await _not_mirrored(stream_id)
+        segment = next((s for s in parse_playlist(content, '') if s.name == name), None)
+        if segment is None:
+            raise Http404("File not found")
+        key = segment_store.segment_key(stream_id, segment.sequence, rendition)
+        data = await segment_store.get(key)
+        if data is None:
+            raise Http404("File not found")
+        cache_control = SEGMENT_CACHE_CONTROL
+        # Segments are written once under their sequence; the size tells a restarted
+        # stream's reused sequence apart without hashing megabytes per request
+        etag = f'"{key}-{len(data)}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(data, content_type=HLS_CONTENT_TYPES[extension])
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return _add_cors_headers(response)
+
+
+def _bad_request(message):
+    return _add_cors_headers(HttpResponse(message, status=400, content_type='text/plain'))
+
+
+async def _serve_ll_playlist(request, packager):
+    """LL-HLS playlist, holding the request open for _HLS_msn/_HLS_part"""
+    msn = request.GET.get('_HLS_msn')
+    part = request.GET.get('_HLS_part')
+    if msn is not None:
+        try:
+            msn = int(msn)
+            part = int(part) if part is not None else None
+        except ValueError:
+            return _bad_request("Invalid _HLS_msn/_HLS_part")
+        last_msn = packager.last_msn
+        # The spec has servers reject requests too far beyond the live edge
+        if last_msn is not None and msn > last_msn + 2:
+            return _bad_request("_HLS_msn is too far ahead of the live edge")
+        if not await packager.wait_until(msn, part):
+            return _add_cors_headers(HttpResponse("Playlist update timed out", status=503, content_type='text/plain'))
+    elif part is not None:
+        return _bad_request("_HLS_part requires _HLS_msn")
+
+    response = HttpResponse(packager.render_playlist(), content_type=LL_CONTENT_TYPES['playlist'])
+    response['Cache-Control'] = PLAYLIST_CACHE_CONTROL
+    return _add_cors_headers(response)
+
+
+async def _serve_ll_media(request, packager, name):
+    """Init segment, segment or part from the in-memory LL-HLS window"""
+    init_match = INIT_NAME.match(name)
+    if init_match:
+        # init.mp4 is the current run's; init_<n>.mp4 is what EXT-X-MAP references
+        generation = int(init_match.group(1)) if init_match.group(1) else None
+        if not await packager.wait_for_init():
+            raise Http404("Init segment not ready")
+        init = packager.get_init(generation)
+        if init is None:
+            raise Http404("Init segment expired")
+        data, etag = init
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(data, content_type=LL_CONTENT_TYPES['init'])
+        response['ETag'] = etag
+        response['Cache-Control'] = SEGMENT_CACHE_CONTROL if generation is not None else PLAYLIST_CACHE_CONTROL
+        return _add_cors_headers(response)
+
+    part_match = PART_NAME.match(name)
+    segment_match = SEGMENT_NAME.match(name)
+    if part_match:
+        msn, index = int(part_match.group(1)), int(part_match.group(2))
+        data = packager.get_part(msn, index)
+        if data is None and packager.last_msn is not None and msn <= packager.last_msn + 1:
+            # Preload-hinted part: hold the request until FFmpeg produces it
+            if await packager.wait_until(msn, index):
+                data = packager.get_part(msn, index)
+    elif segment_match:
+        data = packager.get_segment(int(segment_match.group(1)))
+    else:
+        raise Http404("Invalid file name")
+
+    if data is None:
+        raise Http404("File not found")
+    response = HttpResponse(data, content_type=LL_CONTENT_TYPES['media'])
+    response['ETag'] = f'"{name}"'
+    response['Cache-Control'] = SEGMENT_CACHE_CONTROL
+    return _add_cors_headers(response)
+
+
+async def serve_hls_playlist(request, stream_id):
+    """Serve HLS playlist with comprehensive CORS headers; ABR streams get the master"""
+    packager = ffmpeg_processor.get_ll_packager(stream_id)
+    if packager is not None:
+        return await _serve_ll_playlist(request, packager)
+    if stream_id not in ffmpeg_processor.active_processes:
+        info = await cluster.get_stream(stream_id) or {}
+        name = 'master.m3u8' if info.get('renditions') else 'playlist.m3u8'
+        return await _serve_cluster_file(request, stream_id, name)
+    name = 'master.m3u8' if ffmpeg_processor.get_renditions(stream_id) else 'playlist.m3u8'
+    return await _serve_local_file(request, stream_id, name, PLAYLIST_CACHE_CONTROL)
+
+
+async def serve_hls_master_playlist(request, stream_id):
+    """Serve the ABR master playlist listing every rendition"""
+    if stream_id not in ffmpeg_processor.active_processes:
+        return await _serve_cluster_file(request, stream_id, 'master.m3u8')
+    if not ffmpeg_processor.get_renditions(stream_id):
+        raise Http404("Stream has no renditions")
+    return await _serve_local_file(request, stream_id, 'master.m3u8', PLAYLIST_CACHE_CONTROL)
+
+
+async def serve_hls_rendition_playlist(request, stream_id, rendition):
+    """Serve the media playlist of one ABR rendition"""
+    if stream_id not in ffmpeg_processor.active_processes:
+        return await _serve_cluster_file(request, stream_id, 'playlist.m3u8', rendition)
+    return await _serve_local_file(request, stream_id, 'playlist.m3u8', PLAYLIST_CACHE_CONTROL, rendition)
+
+
+async def serve_hls_segment(request, stream_id, segment_name):
+    """Serve immutable HLS segment with long-lived cache headers"""
+    packager = ffmpeg_processor.get_ll_packager(stream_id)
+    if packager is not None:
+        return await _serve_ll_media(request, packager, segment_name)
+    if stream_id not in ffmpeg_processor.active_processes:
+        return await _serve_cluster_file(request, stream_id, segment_name)
+    _check_segment_name(segment_name)
+    return await _serve_local_file(request, stream_id, segment_name, SEGMENT_CACHE_CONTROL)
+
+
+async def serve_hls_rendition_segment(request, stream_id, rendition, segment_name):
+    """Serve an immutable segment of one ABR rendition"""
+    if stream_id not in ffmpeg_processor.active_processes:
+        return await _serve_cluster_file(request, stream_id, segment_name, rendition)
+    _check_segment_name(segment_name)
+    return await _serve_local_file(request, stream_id, segment_name, SEGMENT_CACHE_CONTROL, rendition)
+
+
+# Longest archive playlist one request returns (12 hours of 2 s segments);
+# players page through longer ranges with start/end
+MAX_ARCHIVE_PLAYLIST_SEGMENTS = 21600
+
+# Past footage only changes when retention removes it
+ARCHIVE_PLAYLIST_CACHE_CONTROL = 'public, max-age=60'
+
+
+def _parse_time(value):
+    """Epoch milliseconds from epoch seconds or ISO 8601 (UTC unless it says otherwise); None if absent"""
+    if not value:
+        return None
+    try:
+        return int(float(value) * 1000)
+    except (ValueError, OverflowError):
+        pass
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid time: {value}")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def _check_recording_names(stream_id, rendition=None):
+    if not is_safe_name(stream_id) or (rendition is not None and not is_safe_name(rendition)):
+        raise Http404("Invalid recording name")
+
+
+def _parse_byte_range(header, size):
+    """(first, last) byte of a single ``bytes=`` range, or None to ignore the header.
+
+    Raises ValueError for a range that starts past the end of the file.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        return None  # Multiple ranges: answering with the whole file is allowed
+    first, _, last = spec.strip().partition('-')
+    try:
+        if not first:
+            length = int(last)
+            return (max(size - length, 0), size - 1) if length > 0 and size else None
+        first, last = int(first), int(last) if last else size - 1
+    except ValueError:
+        return None
+    if first >= size:
+        raise ValueError("Range not satisfiable")
+    return (first, min(last, size - 1)) if last >= first else None
+
+
+async def _read_range(f, first, last, block_size=HLSFileResponse.block_size):
+    try:
+        offset = first
+        while offset <= last:
+            chunk = await asyncio.to_thread(os.pread, f.fileno(), min(block_size, last - offset + 1), offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+async def _serve_byte_ranges(request, path):
+    """Serve a growing archive chunk; players request the byte range of each segment"""
+    try:
+        f, st = await asyncio.to_thread(_open_file, path)
+    except FileNotFoundError:
+        raise Http404("File not found")
+    size = st.st_size
+    try:
+        byte_range = _parse_byte_range(request.headers.get('Range', ''), size)
+    except ValueError:
+        f.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return _add_cors_headers(response)
+
+    if byte_range is None:
+        response = HLSFileResponse(f, content_type=HLS_CONTENT_TYPES['.ts'])
+        response['Cache-Control'] = 'no-cache'  # The chunk grows while the stream is recorded
+    else:
+        first, last = byte_range
+        response = StreamingHttpResponse(_read_range(f, first, last), status=206, content_type=HLS_CONTENT_TYPES['.ts'])
+        # The generator only closes the file once iterated; a client that leaves first must not leak it
+        response._resource_closers.append(f.close)
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+        response['Content-Length'] = str(last - first + 1)
+        response['Cache-Control'] = SEGMENT_CACHE_CONTROL  # Written segments never change
+    response['Accept-Ranges'] = 'bytes'
+    return _add_cors_headers(response)
+
+
+def _recorded_renditions(stream_id, at_ms=None):
+    """Extent of each archived rendition and, given a time, the segment playing at it"""
+    renditions = []
+    for rendition in archive.tracks(stream_id):
+        extent = archive.extent(stream_id, rendition)
+        if extent is None:
+            continue
+        base = f"/api/recordings/{stream_id}/" + (f"{rendition}/" if rendition else '')
+        entry = {'rendition': rendition, 'start': extent[0] / 1000, 'end': extent[1] / 1000,
+                 'playlist': f"{base}playlist.m3u8"}
+        if at_ms is not None:
+            segment = archive.locate(stream_id, rendition, at_ms)
+            entry['at'] = segment and {
+                'start': segment.start_ms / 1000,
+                'duration': segment.duration_ms / 1000,
+                'pts': segment.pts,
+                'uri': f"{base}{chunk_name(segment.chunk, '.ts')}",
+                'byte_range': [segment.offset, segment.size]
             }
-        }
-        
-        # Count streams by status
-        for stream in stream_manager.streams.values():
-            status = stream.status
-            stats['streams']['by_status'][status] = stats['streams']['by_status'].get(status, 0) + 1
-        
-        return Response(stats)
-    except Exception as e:
-        return Response({'error': str(e)}, status=500)
-
-@csrf_exempt
-def serve_hls_playlist(request, stream_id):
-    """Serve HLS playlist with comprehensive CORS headers"""
+        renditions.append(entry)
+    return renditions
+
+
+async def recording_detail(request, stream_id):
+    """GET /api/recordings/{id}/ - Footage archived for a stream; POST starts recording it, DELETE stops.
+
+    With ``?at=`` (epoch seconds or ISO 8601) each rendition also reports
+    the archived segment playing at that moment.
+    """
+    _check_recording_names(stream_id)
+    archive.ensure_started()
+    if request.method == 'POST':
+        await archive.start_recording(stream_id)
+    elif request.method == 'DELETE':
+        await archive.stop_recording(stream_id)
+    elif request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD', 'POST', 'DELETE'])
     try:
-        print(f"🔍 Serving playlist for stream: {stream_id}")
-        
-        for process_info in ffmpeg_processor.active_processes.values():
-            temp_dir = process_info.get('temp_dir', '')
-            if stream_id in temp_dir or temp_dir.endswith(stream_id):
-                playlist_path = os.path.join(temp_dir, 'playlist.m3u8')
-                
-                if os.path.exists(playlist_path):
-                    with open(playlist_path, 'r') as f:
-                        content = f.read()
-                    
-                    response = HttpResponse(content, content_type='application/vnd.apple.mpegurl')
-                    response['Access-Control-Allow-Origin'] = '*'
-                    response['Access-Control-Allow-Methods'] = 'GET, HEAD, OPTIONS'
-                    response['Access-Control-Allow-Headers'] = '*'
-                    response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-                    response['Pragma'] = 'no-cache'
-                    response['Expires'] = '0'
-                    
-                    print(f"✅ Served playlist for {stream_id}")
-                    return response
-        
-        print(f"❌ Playlist not found for {stream_id}")
-        raise Http404("Playlist not found")
-    except Exception as e:
-        print(f"❌ Error serving playlist: {e}")
-        raise Http404(f"Error: {e}")
-
-@csrf_exempt 
-def serve_hls_segment(request, stream_id, segment_name):
-    """Serve HLS segment with comprehensive CORS headers"""
+        at_ms = _parse_time(request.GET.get('at'))
+    except ValueError as e:
+        return _bad_request(str(e))
+
+    response = JsonResponse({
+        'stream_id': stream_id,
+        'recording': await archive.is_recording(stream_id),
+        'retention_hours': settings.RECORDING_RETENTION_HOURS,
+        # Lists directories and maps indexes, so it runs in a thread
+        'renditions': await asyncio.to_thread(_recorded_renditions, stream_id, at_ms)
+    })
+    _add_cors_headers(response)
+    response['Access-Control-Allow-Methods'] = 'GET, HEAD, POST, DELETE, OPTIONS'
+    return response
+
+recording_detail.csrf_exempt = True  # An API for players and scripts, not a form
+
+
+async def recording_playlist(request, stream_id, rendition=None):
+    """GET /api/recordings/{id}[/{rendition}]/playlist.m3u8?start=&end= - Archived footage over a time range.
+
+    Times are epoch seconds or ISO 8601; start defaults to the oldest footage.
+    A range that is over is a VOD playlist. An open one on a stream still
+    being recorded is an EVENT playlist that grows as segments are archived.
+    """
+    _check_recording_names(stream_id, rendition)
     try:
-        for process_info in ffmpeg_processor.active_processes.values():
-            temp_dir = process_info.get('temp_dir', '')
-            if stream_id in temp_dir or temp_dir.endswith(stream_id):
-                segment_path = os.path.join(temp_dir, segment_name)
-                
-                if os.path.exists(segment_path):
-                    with open(segment_path, 'rb') as f:
-                        content = f.read()
-                    
-                    response = HttpResponse(content, content_type='video/mp2t')
-                    response['Access-Control-Allow-Origin'] = '*'
-                    response['Access-Control-Allow-Methods'] = 'GET, HEAD, OPTIONS'
-                    response['Access-Control-Allow-Headers'] = '*'
-                    response['Cache-Control'] = 'no-cache'
-                    
-                    return response
-        
-        raise Http404("Segment not found")
-    except Exception as e:
-        print(f"❌ Error serving segment {segment_name}: {e}")
-        raise Http404(f"Error: {e}")
+        start_ms = _parse_time(request.GET.get('start'))
+        end_ms = _parse_time(request.GET.get('end'))
+    except ValueError as e:
+        return _bad_request(str(e))
+    if start_ms is not None and end_ms is not None and end_ms <= start_ms:
+        return _bad_request("end must be after start")
+
+    segments = await asyncio.to_thread(
+        archive.segments, stream_id, rendition, start_ms or 0, end_ms, MAX_ARCHIVE_PLAYLIST_SEGMENTS
+    )
+    if not segments:
+        raise Http404("No footage in this range")
+    live = (
+        len(segments) < MAX_ARCHIVE_PLAYLIST_SEGMENTS
+        and (end_ms is None or end_ms > time.time() * 1000)
+        and await archive.is_recording(stream_id)
+    )
+    response = HttpResponse(render_playlist(segments, ended=not live), content_type=HLS_CONTENT_TYPES['.m3u8'])
+    response['Cache-Control'] = PLAYLIST_CACHE_CONTROL if live else ARCHIVE_PLAYLIST_CACHE_CONTROL
+    return _add_cors_headers(response)
+
+
+async def recording_chunk(request, stream_id, chunk, rendition=None):
+    """GET /api/recordings/{id}[/{rendition}]/{chunk}.ts - Archived segments, served by byte range"""
+    path = archive.chunk_path(stream_id, rendition, chunk)
+    if path is None:
+        raise Http404("Invalid chunk name")
+    return await _serve_byte_ranges(request, path)
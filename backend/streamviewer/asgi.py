@@ -3,11 +3,13 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import streams.routing
+from streams.lifespan import LifespanApp
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'streamviewer.settings')
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
+    "lifespan": LifespanApp(),
     "websocket": AuthMiddlewareStack(
         URLRouter(
             streams.routing.websocket_urlpatterns
@@ -115,18 +115,31 @@ CORS_ALLOW_METHODS = [
     'HEAD',  # Important for video streaming
 ]
 
+# Stream server log level, and 'json' for one JSON object per line (log shippers)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'text': {
+            'format': '%(asctime)s %(levelname)s %(name)s: %(message)s',
+        },
+        'json': {
+            '()': 'streams.log_format.JsonFormatter',
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
+            'formatter': LOG_FORMAT,
         },
     },
     'loggers': {
         'streams': {
             'handlers': ['console'],
-            'level': 'INFO',
+            'level': LOG_LEVEL,
         },
     },
 }
@@ -134,6 +147,127 @@ LOGGING = {
 CHANNEL_LAYERS['default']['CONFIG']['capacity'] = 1500
 CHANNEL_LAYERS['default']['CONFIG']['expiry'] = 60
 
+# HLS window. Segments live in the shared segment store for the window plus
+# a margin, so a relaying worker still has the oldest listed segment while a
+# player fetches it. Passthrough cuts on the camera's keyframes, so segments
+# can run as long as its GOP; HLS_MAX_SEGMENT_DURATION is the longest expected.
+HLS_SEGMENT_DURATION = 2
+HLS_LIST_SIZE = 3
+HLS_MAX_SEGMENT_DURATION = int(os.environ.get('HLS_MAX_SEGMENT_DURATION', 5))
+SEGMENT_STORE_TTL = int(os.environ.get(
+    'SEGMENT_STORE_TTL', (HLS_LIST_SIZE + 2) * max(HLS_SEGMENT_DURATION, HLS_MAX_SEGMENT_DURATION)
+))
+SEGMENT_CACHE_BYTES = int(os.environ.get('SEGMENT_CACHE_BYTES', 64 * 1024 * 1024))
+
+# Late joiners: segments per stream (and rendition) kept in memory and sent to
+# a viewer the moment it joins, under one byte budget shared by all streams.
+# SEGMENT_RING_BYTES=0 turns the ring off.
+SEGMENT_RING_SIZE = int(os.environ.get('SEGMENT_RING_SIZE', 2))
+SEGMENT_RING_BYTES = int(os.environ.get('SEGMENT_RING_BYTES', 128 * 1024 * 1024))
+
+# HLS ingest: 'disk' has FFmpeg write segments to a temp directory that is
+# watched and read back; 'http' has it PUT them to a loopback endpoint in this
+# process, so segments stay in memory. Port 0 picks a free one.
+HLS_INGEST = os.environ.get('HLS_INGEST', 'disk')
+HLS_INGEST_HOST = os.environ.get('HLS_INGEST_HOST', '127.0.0.1')
+HLS_INGEST_PORT = int(os.environ.get('HLS_INGEST_PORT', 0))
+
+# Snapshots: FFmpeg also writes a JPEG of a keyframe at most every
+# SNAPSHOT_INTERVAL seconds, scaled to at most SNAPSHOT_WIDTH pixels wide, for
+# the snapshot.jpg endpoints. Quality is mjpeg's -q:v (2 best, 31 worst).
+SNAPSHOT_ENABLED = os.environ.get('SNAPSHOT_ENABLED', '1') == '1'
+SNAPSHOT_INTERVAL = float(os.environ.get('SNAPSHOT_INTERVAL', 2))
+SNAPSHOT_WIDTH = int(os.environ.get('SNAPSHOT_WIDTH', 640))
+SNAPSHOT_QUALITY = int(os.environ.get('SNAPSHOT_QUALITY', 5))
+
+# Recording (DVR): segments of streams marked for recording are archived under
+# RECORDINGS_DIR in chunks of RECORDING_CHUNK_SECONDS and kept for
+# RECORDING_RETENTION_HOURS. Every RECORDING_CLEANUP_INTERVAL seconds a
+# background pass removes at most RECORDING_CLEANUP_BATCH expired chunks.
+# Workers on several hosts need RECORDINGS_DIR on shared storage.
+RECORDINGS_DIR = os.environ.get('RECORDINGS_DIR', str(DATA_DIR / 'recordings'))
+RECORDING_RETENTION_HOURS = float(os.environ.get('RECORDING_RETENTION_HOURS', 72))
+RECORDING_CHUNK_SECONDS = int(os.environ.get('RECORDING_CHUNK_SECONDS', 3600))
+RECORDING_CLEANUP_INTERVAL = float(os.environ.get('RECORDING_CLEANUP_INTERVAL', 60))
+RECORDING_CLEANUP_BATCH = int(os.environ.get('RECORDING_CLEANUP_BATCH', 200))
+
+# Low-latency HLS: fMP4 parts of this length (seconds), announced via EXT-X-PART
+LL_HLS_PART_DURATION = float(os.environ.get('LL_HLS_PART_DURATION', 0.333))
+
+# FFmpeg supervisor: restart backoff (seconds), and the circuit breaker that
+# parks flapping cameras. A run shorter than FFMPEG_STABLE_RUN counts as a failure.
+FFMPEG_RESTART_BASE_DELAY = float(os.environ.get('FFMPEG_RESTART_BASE_DELAY', 1))
+FFMPEG_RESTART_MAX_DELAY = float(os.environ.get('FFMPEG_RESTART_MAX_DELAY', 30))
+FFMPEG_STABLE_RUN = float(os.environ.get('FFMPEG_STABLE_RUN', 30))
+FFMPEG_CIRCUIT_THRESHOLD = int(os.environ.get('FFMPEG_CIRCUIT_THRESHOLD', 5))
+FFMPEG_CIRCUIT_COOLDOWN = float(os.environ.get('FFMPEG_CIRCUIT_COOLDOWN', 60))
+FFMPEG_CIRCUIT_MAX_COOLDOWN = float(os.environ.get('FFMPEG_CIRCUIT_MAX_COOLDOWN', 600))
+
+# Warm pool: seconds FFmpeg keeps running after the last viewer leaves, and
+# RTSP URLs (comma-separated) that stay up permanently regardless of viewers
+STREAM_LINGER_SECONDS = float(os.environ.get('STREAM_LINGER_SECONDS', 30))
+PINNED_STREAMS = [url for url in os.environ.get('PINNED_STREAMS', '').split(',') if url]
+
+# Slow viewers: media messages queued per WebSocket before stale ones are
+# dropped, and how many such overflows within the window trigger a rendition
+# downgrade and then a disconnect
+VIEWER_QUEUE_DEPTH = int(os.environ.get('VIEWER_QUEUE_DEPTH', 8))
+VIEWER_SLOW_WINDOW = float(os.environ.get('VIEWER_SLOW_WINDOW', 30))
+VIEWER_DOWNGRADE_AFTER = int(os.environ.get('VIEWER_DOWNGRADE_AFTER', 3))
+VIEWER_DISCONNECT_AFTER = int(os.environ.get('VIEWER_DISCONNECT_AFTER', 10))
+
+# Cluster ownership lease per stream (ms); heartbeats renew it every third of that
+CLUSTER_LEASE_MS = int(os.environ.get('CLUSTER_LEASE_MS', 10000))
+
+# 'transcoder' workers run FFmpeg for the streams the hash ring places on them,
+# 'frontend' workers only relay to WebSocket/HTTP viewers, 'all' does both
+CLUSTER_ROLE = os.environ.get('CLUSTER_ROLE', 'all')
+
+# Admission control: total FFmpeg cost (in 720p25 encodes; passthrough is
+# ~0.05) this worker runs at once, and the load (per core) and free memory
+# past which new starts wait. Waiting starts are queued by priority.
+MAX_TRANSCODE_SLOTS = float(os.environ.get('MAX_TRANSCODE_SLOTS', os.cpu_count() or 1))
+ADMISSION_MAX_LOAD = float(os.environ.get('ADMISSION_MAX_LOAD', 0.9))
+ADMISSION_MIN_MEMORY_MB = int(os.environ.get('ADMISSION_MIN_MEMORY_MB', 256))
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 64))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 120))
+
+# Per-child limits: FFmpeg's nice value, and a cgroup v2 directory (created
+# by the operator with cpu.max/memory.max set) that every child joins
+FFMPEG_NICE = int(os.environ.get('FFMPEG_NICE', 10))
+FFMPEG_CGROUP = os.environ.get('FFMPEG_CGROUP', '')
+
+# FFmpeg -progress: rolling window (seconds) for fps, bitrate and speed, how often
+# viewers get it in stream_status, and the speed below which a transcode has fallen
+# behind real time and is stepped down to a cheaper profile
+FFMPEG_PROGRESS_WINDOW = float(os.environ.get('FFMPEG_PROGRESS_WINDOW', 10))
+FFMPEG_PROGRESS_REPORT_INTERVAL = float(os.environ.get('FFMPEG_PROGRESS_REPORT_INTERVAL', 5))
+FFMPEG_MIN_SPEED = float(os.environ.get('FFMPEG_MIN_SPEED', 0.9))
+FFMPEG_AUTO_DOWNGRADE = os.environ.get('FFMPEG_AUTO_DOWNGRADE', '1') == '1'
+
+# Health sampler: how often /api/health/ and /api/stats/ snapshots refresh (seconds),
+# the Redis ping timeout, and how long a running stream may produce nothing before
+# it is reported as stalled
+HEALTH_SAMPLE_INTERVAL = float(os.environ.get('HEALTH_SAMPLE_INTERVAL', 5))
+HEALTH_REDIS_TIMEOUT = float(os.environ.get('HEALTH_REDIS_TIMEOUT', 1))
+HEALTH_STALL_SECONDS = float(os.environ.get('HEALTH_STALL_SECONDS', 15))
+
+# Seconds an ffprobe result is reused for the same RTSP URL
+PROBE_CACHE_TTL = float(os.environ.get('PROBE_CACHE_TTL', 3600))
+
+# Re-encode profile used when a camera cannot be remuxed as-is
+DEFAULT_TRANSCODE_PROFILE = os.environ.get('DEFAULT_TRANSCODE_PROFILE', 'low')
+
+# Renditions produced by the 'abr' profile, highest first
+ABR_LADDER = os.environ.get('ABR_LADDER', 'high,medium,low').split(',')
+
+# Mosaics: up to 16 cameras tiled onto one canvas of this size, encoded once
+# at MOSAIC_FPS and MOSAIC_BITRATE (kbit/s) and shared by every viewer
+MOSAIC_WIDTH = int(os.environ.get('MOSAIC_WIDTH', 1920))
+MOSAIC_HEIGHT = int(os.environ.get('MOSAIC_HEIGHT', 1080))
+MOSAIC_FPS = int(os.environ.get('MOSAIC_FPS', 15))
+MOSAIC_BITRATE = int(os.environ.get('MOSAIC_BITRATE', 4000))
+
 # Memory optimization for FFmpeg
 if not DEBUG:
     # Production optimizations
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
+from streams import views as stream_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('streams.urls')),  
+    path('metrics', stream_views.metrics, name='metrics'),
 ]
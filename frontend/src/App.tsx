@@ -8,6 +8,20 @@ import { StreamPlayer } from './components/StreamPlayer'
 const WS_URL = import.meta.env.VITE_WS_URL || "wss://rtsp-backend-88322650503.us-central1.run.app/ws/stream/"
 const BACKEND_URL = import.meta.env.VITE_BACKEND_URL || "https://rtsp-backend-88322650503.us-central1.run.app"
 
+function decodeBase64(encoded: string): Uint8Array | null {
+  try {
+    const binaryString = atob(encoded)
+    const bytes = new Uint8Array(binaryString.length)
+    for (let i = 0; i < binaryString.length; i++) {
+      bytes[i] = binaryString.charCodeAt(i)
+    }
+    return bytes
+  } catch (error) {
+    console.error('Failed to decode stream chunk:', error)
+    return null
+  }
+}
+
 function App() {
   const [rtspUrl, setRtspUrl] = useState('')
   const [notification, setNotification] = useState<{type: 'success' | 'error', message: string} | null>(null)
@@ -17,6 +31,7 @@ function App() {
     addStream: addStreamToStore, 
     updateStreamStatus, 
     addStreamChunk, 
+    setStreamInit,
     setConnectionStatus,
     getActiveStreams,
     removeStream: removeStreamFromStore
@@ -46,17 +61,21 @@ function App() {
         break
         
       case 'stream_data':
-        if (lastMessage.stream_id && lastMessage.chunk) {
-          try {
-            // Decode base64 chunk to Uint8Array
-            const binaryString = atob(lastMessage.chunk)
-            const chunk = new Uint8Array(binaryString.length)
-            for (let i = 0; i < binaryString.length; i++) {
-              chunk[i] = binaryString.charCodeAt(i)
-            }
-            addStreamChunk(lastMessage.stream_id, chunk)
-          } catch (error) {
-            console.error('Failed to decode stream chunk:', error)
+      case 'stream_part': {
+        // LL-HLS parts arrive like segments, just more often and smaller
+        const chunk = lastMessage.data ?? (lastMessage.chunk ? decodeBase64(lastMessage.chunk) : null)
+        if (lastMessage.stream_id && chunk) {
+          addStreamChunk(lastMessage.stream_id, chunk)
+        }
+        break
+      }
+
+      case 'stream_init':
+        // fMP4 init segment an LL-HLS stream sends ahead of its first part
+        if (lastMessage.stream_id && lastMessage.init) {
+          const init = decodeBase64(lastMessage.init)
+          if (init) {
+            setStreamInit(lastMessage.stream_id, init)
           }
         }
         break
@@ -84,7 +103,7 @@ function App() {
       default:
         console.log('Unhandled message type:', lastMessage.type)
     }
-  }, [lastMessage, addStreamToStore, updateStreamStatus, addStreamChunk, removeStreamFromStore])
+  }, [lastMessage, addStreamToStore, updateStreamStatus, addStreamChunk, setStreamInit, removeStreamFromStore])
 
   // Auto-hide notifications
   useEffect(() => {
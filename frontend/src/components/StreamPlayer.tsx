@@ -30,13 +30,14 @@ export function StreamPlayer({ streamId, onRemove }: StreamPlayerProps) {
 
   // Update the HLS URL to use the backend environment variable
   useEffect(() => {
-    if (stream && stream.chunks.length > 0) {
+    // An LL-HLS stream is playable once its init segment arrives
+    if (stream && (stream.chunks.length > 0 || stream.init)) {
       const backendUrl = import.meta.env.VITE_BACKEND_URL || "https://rtsp-backend-88322650503.us-central1.run.app"
       const url = `${backendUrl}/api/hls/${streamId}/playlist.m3u8`
       setHlsUrl(url)
       console.log(`🎬 HLS URL: ${url}`)
     }
-  }, [stream?.chunks.length, streamId])
+  }, [stream?.chunks.length, stream?.init, streamId])
 
   // Initialize HLS.js with optimized live streaming config
   useEffect(() => {
@@ -4,6 +4,8 @@ interface StreamMessage {
   type: string
   stream_id?: string
   chunk?: string
+  data?: Uint8Array
+  sequence?: number
   timestamp?: string
   segment_name?: string
   chunk_size?: number
@@ -11,6 +13,45 @@ interface StreamMessage {
   title?: string
   message?: string
   user_id?: string
+  delivery_modes?: string[]
+  profile?: string
+  rendition?: string
+  renditions?: string[]
+  mode?: string
+  part?: number
+  independent?: boolean
+  init?: string
+}
+
+// Binary segment frame header: version, stream id, sequence, timestamp, size
+const FRAME_HEADER_SIZE = 33
+// LL-HLS part frames (version 2) append part index and flags
+const PART_FRAME_VERSION = 2
+const PART_HEADER_SIZE = 36
+
+function parseSegmentFrame(buffer: ArrayBuffer): StreamMessage {
+  const view = new DataView(buffer)
+  const streamId = new TextDecoder().decode(new Uint8Array(buffer, 1, 12))
+  const sequence = Number(view.getBigUint64(13))
+  const timestamp = view.getFloat64(21)
+  const size = view.getUint32(29)
+  const message: StreamMessage = {
+    type: 'stream_data',
+    stream_id: streamId,
+    sequence,
+    timestamp: new Date(timestamp * 1000).toISOString(),
+    chunk_size: size
+  }
+  if (view.getUint8(0) === PART_FRAME_VERSION) {
+    return {
+      ...message,
+      type: 'stream_part',
+      data: new Uint8Array(buffer, PART_HEADER_SIZE, size),
+      part: view.getUint16(33),
+      independent: (view.getUint8(35) & 1) === 1
+    }
+  }
+  return { ...message, data: new Uint8Array(buffer, FRAME_HEADER_SIZE, size) }
 }
 
 interface UseWebSocketReturn {
@@ -19,6 +60,7 @@ interface UseWebSocketReturn {
   lastMessage: StreamMessage | null
   addStream: (url: string, title?: string) => void
   removeStream: (streamId: string) => void
+  selectRendition: (streamId: string, rendition: string) => void
 }
 
 export function useWebSocket(url: string): UseWebSocketReturn {
@@ -30,6 +72,7 @@ export function useWebSocket(url: string): UseWebSocketReturn {
   const connect = useCallback(() => {
     try {
       ws.current = new WebSocket(url)
+      ws.current.binaryType = 'arraybuffer'
       
       ws.current.onopen = () => {
         console.log('WebSocket connected')
@@ -38,7 +81,15 @@ export function useWebSocket(url: string): UseWebSocketReturn {
       
       ws.current.onmessage = (event) => {
         try {
+          if (event.data instanceof ArrayBuffer) {
+            setLastMessage(parseSegmentFrame(event.data))
+            return
+          }
           const message = JSON.parse(event.data) as StreamMessage
+          // Opt in to binary segment frames when the server offers them
+          if (message.type === 'connection_established' && message.delivery_modes?.includes('binary')) {
+            ws.current?.send(JSON.stringify({ action: 'set_delivery', mode: 'binary' }))
+          }
           setLastMessage(message)
         } catch (error) {
           console.error('Failed to parse WebSocket message:', error)
@@ -101,11 +152,20 @@ export function useWebSocket(url: string): UseWebSocketReturn {
     })
   }, [sendMessage])
 
+  const selectRendition = useCallback((streamId: string, rendition: string) => {
+    sendMessage({
+      action: 'select_rendition',
+      stream_id: streamId,
+      rendition
+    })
+  }, [sendMessage])
+
   return {
     isConnected,
     sendMessage,
     lastMessage,
     addStream,
-    removeStream
+    removeStream,
+    selectRendition
   }
 }
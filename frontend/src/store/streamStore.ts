@@ -6,6 +6,7 @@ interface StreamData {
   title: string
   status: 'connecting' | 'active' | 'error' | 'paused'
   chunks: Uint8Array[]
+  init?: Uint8Array  // fMP4 init segment of an LL-HLS stream
   lastUpdate: number
   playing: boolean
 }
@@ -18,6 +19,7 @@ interface StreamStore {
   addStream: (id: string, url: string, title: string) => void
   updateStreamStatus: (id: string, status: StreamData['status']) => void
   addStreamChunk: (id: string, chunk: Uint8Array) => void
+  setStreamInit: (id: string, init: Uint8Array) => void
   toggleStreamPlayback: (id: string) => void
   removeStream: (id: string) => void
   setConnectionStatus: (status: StreamStore['connectionStatus']) => void
@@ -70,6 +72,15 @@ export const useStreamStore = create<StreamStore>((set, get) => ({
     return { streams: newStreams }
   }),
 
+  setStreamInit: (id, init) => set((state) => {
+    const newStreams = new Map(state.streams)
+    const stream = newStreams.get(id)
+    if (stream) {
+      newStreams.set(id, { ...stream, init, lastUpdate: Date.now(), status: 'active' })
+    }
+    return { streams: newStreams }
+  }),
+
   toggleStreamPlayback: (id) => set((state) => {
     const newStreams = new Map(state.streams)
     const stream = newStreams.get(id)